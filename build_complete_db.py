@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 import json
-import re
-import subprocess
 import os
+import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from pdf_pool import PdfJob, map_pdfs
+from pdf_text import as_lines
+from scadi_patterns import classify_line, RE_PLAIN_NUMBER, ROW, SAFRA_ROW
+import agrodb
+import profiling
+import raw_store
+import tables
+
 # Mapeamento: ID Drive -> (safra, tipo)
 PDF_MAP = {
     # SOJA
@@ -19,63 +27,55 @@ PDF_MAP = {
 }
 
 DOWNLOAD_DIR = "./data/raw/drive"
+CARGA = "build_complete_db"
 
 def get_local_file(file_id):
-    """Encontra arquivo local pelo ID"""
-    for f in os.listdir(DOWNLOAD_DIR):
-        if file_id in f:
-            return os.path.join(DOWNLOAD_DIR, f)
-    return None
-
-def extract_text(pdf_path):
-    """Extrai texto do PDF"""
-    result = subprocess.run(['pdftotext', '-layout', pdf_path, '-'], 
-                          capture_output=True, text=True)
-    return result.stdout
+    """Encontra arquivo local pelo ID (catálogo do raw_store; sem catálogo, pelo nome na pasta)"""
+    return raw_store.locate(file_id, DOWNLOAD_DIR)
 
 def parse_produtividade(text, safra, cultura):
     """Parse produtividade do PDF"""
     prods = []
-    lines = text.split('\n')
+    lines = as_lines(text)
     
     for line in lines:
         # Padrão típico: TALHÃO  FAZENDA  VARIEDADE  AREA  PRODUTIVIDADE
-        # Procura por padrões de números
-        if 'ha' in line.lower() and 'sc' in line.lower():
-            # Tenta extrair dados
-            parts = line.split()
-            try:
-                # Simplificado: pega padrão com números
-                for i, p in enumerate(parts):
-                    if re.match(r'^\d+\.?\d*$', p):
-                        # Pode ser área
-                        if i + 1 < len(parts):
-                            try:
-                                area = float(p)
-                                # Próximo número é produtividade?
-                                for j in range(i+1, min(i+5, len(parts))):
-                                    if re.match(r'^\d+\.?\d*$', parts[j]):
-                                        prod = float(parts[j])
-                                        if 50 < prod < 250:  # Filtro sanidade
-                                            prods.append({
-                                                'safra': safra,
-                                                'cultura': cultura,
-                                                'talhao': 'TALHAO',
-                                                'area': area,
-                                                'prod_sc_ha': prod
-                                            })
-                                        break
-                            except:
-                                pass
-            except:
-                pass
+        # Cabeçalhos/totais saem pelo classificador; só linhas com ha e sc
+        if classify_line(line) not in (ROW, SAFRA_ROW):
+            continue
+        low = line.lower()
+        if 'ha' not in low or 'sc' not in low:
+            continue
+        
+        # Uma passada só: posições dos tokens numéricos da linha
+        parts = line.split()
+        nums = [(i, float(p)) for i, p in enumerate(parts) if RE_PLAIN_NUMBER.fullmatch(p)]
+        
+        # Cada número pode ser área; o próximo número (até 4 colunas depois)
+        # é candidato a produtividade
+        found = 0
+        for (i, area), (j, prod) in zip(nums, nums[1:]):
+            if j < i + 5 and 50 < prod < 250:  # Filtro sanidade
+                prods.append({
+                    'safra': safra,
+                    'cultura': cultura,
+                    'talhao': 'TALHAO',
+                    'area': area,
+                    'prod_sc_ha': prod
+                })
+                found += 1
+        if found:
+            profiling.accept("prod_sc_ha")
+        else:
+            profiling.reject("prod_sc_ha", line, "sem par área/produtividade entre 50 e 250")
     
     return prods
 
 def main():
     print("Processando PDFs do Drive...")
     
-    all_prods = []
+    all_prods = tables.Table("produtividade")
+    jobs = []
     
     for file_id, (safra, cultura, tipo) in PDF_MAP.items():
         pdf_path = get_local_file(file_id)
@@ -83,19 +83,27 @@ def main():
             print(f"⚠️  {safra} {cultura} {tipo} não encontrado")
             continue
         
-        print(f"Processando {safra} {cultura} ({tipo})...")
-        
         if tipo == "PRODUTIVIDADE":
-            text = extract_text(pdf_path)
-            prods = parse_produtividade(text, safra, cultura)
-            all_prods.extend(prods)
-            print(f"  ✅ {len(prods)} registros")
+            jobs.append(PdfJob(pdf_path, parse_produtividade, (safra, cultura), raw_store.sha_of(pdf_path)))
+    
+    # Extração + parse em paralelo; resultados chegam na ordem do PDF_MAP
+    for job, prods in map_pdfs(jobs):
+        safra, cultura = job.args
+        print(f"Processando {safra} {cultura} (PRODUTIVIDADE)...")
+        all_prods.extend(prods)
+        print(f"  ✅ {len(prods)} registros")
     
     print(f"\n✅ Total: {len(all_prods)} produtividades extraídas")
     
-    # Salvar
-    with open('./data/produtividade_novo.json', 'w') as f:
-        json.dump(all_prods, f, indent=2)
+    # Salvar no AgroDB; produtividade_novo.json é exportado do banco
+    with profiling.stage("write"):
+        conn = agrodb.connect()
+        agrodb.replace_load(conn, "produtividade_real", CARGA, all_prods)
+        rows = agrodb.select(conn, "produtividade_real", carga=CARGA)
+        conn.close()
+        with open('./data/produtividade_novo.json', 'w') as f:
+            json.dump([agrodb.to_json("produtividade_real", row) for row in rows], f, indent=2)
 
 if __name__ == "__main__":
-    main()
+    with profiling.run("build_complete_db"):
+        main()
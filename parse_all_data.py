@@ -1,10 +1,20 @@
 #!/usr/bin/env python3
-import json
-import re
-import subprocess
 import os
+import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from pdf_pool import PdfJob, map_pdfs
+from pdf_text import as_lines
+from scadi_patterns import (
+    classify_line, custo_aplicacao_fields, custo_aplicacao_cells, parse_br_number,
+    RE_BR_NUMBER, RE_FAZENDA, RE_PROD_TALHAO, BLANK, TOTAL, ROW, SAFRA_ROW,
+)
+import layouts
+import agrodb
+import profiling
+import raw_store
+
 # Mapeamento de PDFs
 PDF_MAP = {
     "18gXBDawVhOTx4eGla5yf4I8sD1NeY7UD": ("23/24", "SOJA", "PROD"),
@@ -18,35 +28,35 @@ PDF_MAP = {
 }
 
 DRIVE_DIR = "./data/raw/drive"
+CARGA = "parse_all_data"
 
 def get_pdf_path(file_id):
-    for f in os.listdir(DRIVE_DIR):
-        if file_id in f:
-            return os.path.join(DRIVE_DIR, f)
-    return None
-
-def extract_text(pdf_path):
-    result = subprocess.run(['pdftotext', '-layout', pdf_path, '-'], 
-                          capture_output=True, text=True)
-    return result.stdout
+    return raw_store.locate(file_id, DRIVE_DIR)
 
 def parse_produtividade(text, safra, cultura):
     prods = []
-    lines = text.split('\n')
+    lines = as_lines(text)
     
     current_fazenda = None
     
     for line in lines:
+        kind = classify_line(line)
+        if kind == BLANK or kind == TOTAL:
+            continue
+        
         # Detectar fazenda
         if 'FAZENDA' in line and '-' in line:
-            match = re.search(r'FAZENDA ([A-ZÁÉÍÓÚ\s]+?)(?:\s*$|(?=\d))', line)
+            match = RE_FAZENDA.search(line)
             if match:
                 current_fazenda = match.group(1).strip()
         
+        if kind != ROW and kind != SAFRA_ROW:
+            continue
+        
         # Parse de linha de dados: TALHÃO VARIEDADE AREA ... PRODUTIVIDADE
         # Padrão: começa com texto (talhão), depois espaços, depois números
         # Procura pela última coluna: Produt. (Scs/Ha) que tem formato XXX,XX
-        match = re.match(r'^\s*([A-Z0-9\s]+?)\s{2,}([A-Z0-9\s]+?)\s{2,}([\d.]+)\s+([\d.]+)\s+100', line)
+        match = RE_PROD_TALHAO.match(line)
         if match:
             try:
                 talhao = match.group(1).strip()
@@ -55,13 +65,13 @@ def parse_produtividade(text, safra, cultura):
                 
                 # Procura pela produtividade na linha (última coluna numérica antes de %Descontos)
                 # Padrão: números com vírgula (formato brasileiro)
-                numeros = re.findall(r'(\d{1,3}(?:\.\d{3})*,\d+|\d+,\d+)', line)
+                numeros = RE_BR_NUMBER.findall(line)
                 
                 if len(numeros) >= 2:
                     # A produtividade em sc/ha é tipicamente um número menor (40-200)
                     # Procura pelo número que faz sentido como sc/ha
                     for num_str in numeros[-5:]:  # Procura nos últimos números
-                        val = float(num_str.replace('.', '').replace(',', '.'))
+                        val = parse_br_number(num_str)
                         if 30 < val < 250:  # Range típico de produtividade
                             prods.append({
                                 'safra': safra,
@@ -72,46 +82,50 @@ def parse_produtividade(text, safra, cultura):
                                 'area': area,
                                 'prod_sc_ha': val
                             })
+                            profiling.accept("prod_talhao")
                             break
-            except:
-                pass
+                    else:
+                        profiling.reject("prod_talhao", line, "sem produtividade entre 30 e 250 sc/ha")
+                else:
+                    profiling.reject("prod_talhao", line, "menos de 2 números")
+            except ValueError as e:
+                profiling.reject("prod_talhao", line, e)
+        elif profiling.ENABLED and RE_BR_NUMBER.search(line):
+            # Só conta as linhas com números: título/rodapé não são candidatas
+            profiling.reject("prod_talhao", line, "fora do padrão talhão/variedade/área")
     
     return prods
 
-def parse_custos(text, safra, cultura):
+def parse_custos(text, safra, cultura, fp=None):
     custos = []
-    lines = text.split('\n')
+    lines = as_lines(text)
     
-    for line in lines:
-        # Padrão: APLICAÇÃO SAFRA FAZENDA R$ XXX.XXX,XX ... R$ XXX,XX
-        match = re.match(r'^\s*(\w+(?:\s+\w+)?)\s+(\d{4}/\d{4}|\d{4})\s+([A-ZÁÉÍÓÚ\s]+?)\s+R\$\s+([\d.]+,\d+)\s+', line)
+    # Padrão: APLICAÇÃO SAFRA FAZENDA R$ XXX.XXX,XX ... R$ XXX,XX
+    # Com fingerprint as linhas vêm fatiadas nas colunas fixas; o regex
+    # fica só para as linhas que não couberem nos cortes
+    for kind, value in layouts.iter_cells(lines, fp):
+        if kind == ROW:
+            fields = custo_aplicacao_cells(value)
+        elif kind is None:
+            fields = custo_aplicacao_fields(value)
+        else:
+            continue
         
-        if match:
-            try:
-                categoria = match.group(1).strip()
-                safra_pdf = match.group(2)
-                fazenda = match.group(3).strip()
-                valor_str = match.group(4)
-                
-                valor = float(valor_str.replace('.', '').replace(',', '.'))
-                
-                # Procura custo_ha (última coluna R$)
-                valores = re.findall(r'R\$\s+([\d.]+,\d+)', line)
-                custo_ha = 0
-                if len(valores) >= 2:
-                    custo_ha = float(valores[-1].replace('.', '').replace(',', '.'))
-                
-                custos.append({
-                    'safra': safra,
-                    'cultura': cultura,
-                    'categoria': categoria,
-                    'item': categoria,
-                    'fazenda': fazenda,
-                    'valor': valor,
-                    'custo_ha': custo_ha
-                })
-            except:
-                pass
+        pattern = "custo_aplicacao/colunas" if kind == ROW else "custo_aplicacao/regex"
+        if not fields:
+            profiling.reject(pattern, value if kind is None else "  ".join(value), "campos não reconhecidos")
+        else:
+            profiling.accept(pattern)
+            categoria, safra_pdf, fazenda, valor, custo_ha = fields
+            custos.append({
+                'safra': safra,
+                'cultura': cultura,
+                'categoria': categoria,
+                'item': categoria,
+                'fazenda': fazenda,
+                'valor': valor,
+                'custo_ha': custo_ha
+            })
     
     return custos
 
@@ -121,28 +135,37 @@ def main():
     
     print("Processando PDFs...")
     
+    jobs = []
     for file_id, (safra, cultura, tipo) in PDF_MAP.items():
         pdf_path = get_pdf_path(file_id)
         if not pdf_path:
             print(f"⚠️  {safra} {cultura} {tipo} - arquivo não encontrado")
             continue
         
-        print(f"  Processando {safra} {cultura} ({tipo})...")
-        text = extract_text(pdf_path)
-        
-        if tipo == "PROD":
-            data = parse_produtividade(text, safra, cultura)
+        # O parser sai do layout detectado no conteúdo (o tipo do PDF_MAP só desempata)
+        # Blob do catálogo: o SHA-256 vem do nome, sem re-hashear o PDF
+        sha = raw_store.sha_of(pdf_path)
+        fp = layouts.fingerprint(pdf_path, sha)
+        if fp["layout"] == layouts.PRODUTIVIDADE or (fp["layout"] == layouts.DESCONHECIDO and tipo == "PROD"):
+            jobs.append(PdfJob(pdf_path, parse_produtividade, (safra, cultura), sha))
+        else:
+            jobs.append(PdfJob(pdf_path, parse_custos, (safra, cultura, fp), sha))
+    layouts.save_cache()
+    
+    # Extração + parse em paralelo; resultados chegam na ordem do PDF_MAP
+    for job, data in map_pdfs(jobs):
+        safra, cultura = job.args[:2]
+        if job.parser is parse_produtividade:
+            print(f"  Processando {safra} {cultura} (PROD)...")
             all_prods.extend(data)
             print(f"    ✅ {len(data)} registros")
-        elif tipo == "CUSTO":
-            data = parse_custos(text, safra, cultura)
+        else:
+            print(f"  Processando {safra} {cultura} (CUSTO)...")
             all_custos.extend(data)
             print(f"    ✅ {len(data)} itens")
     
-    # Montar banco completo
-    db = {
-        'custos': all_custos,
-        'produtividade': all_prods,
+    # Montar banco completo: carga no AgroDB e database.json exportado dele
+    extra = {
         'referencias': [
             {'safra': '24/25', 'cultura': 'SOJA', 'ref_custo_ha': 4156.03, 'ref_prod_sc_ha': 62.0, 'detalhes': {}},
             {'safra': '23/24', 'cultura': 'SOJA', 'ref_custo_ha': 3800.0, 'ref_prod_sc_ha': 60.0, 'detalhes': {}},
@@ -152,12 +175,17 @@ def main():
         'metadata': {'updated_at': '2026-02-24', 'version': '5.0'}
     }
     
-    with open('./data/database.json', 'w') as f:
-        json.dump(db, f, indent=2)
+    with profiling.stage("write"):
+        conn = agrodb.connect()
+        agrodb.replace_load(conn, "custos_operacionais", CARGA, all_custos)
+        agrodb.replace_load(conn, "produtividade_real", CARGA, all_prods)
+        agrodb.export_json(conn, './data/database.json', CARGA, extra=extra, indent=2, cube=True, columnar_copy=True, shards=True)
+        conn.close()
     
     print(f"\n✅ Banco criado:")
     print(f"   - {len(all_custos)} custos")
     print(f"   - {len(all_prods)} produtividades")
 
 if __name__ == "__main__":
-    main()
+    with profiling.run("parse_all_data"):
+        main()
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import gzip
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+import agrodb
+from cube import norm_safra
+
+# API local de consulta ao AgroDB (scripts/agrodb.py), em asyncio puro.
+#
+#   GET /api/health
+#   GET /api/<seção>?filtros&limit=N&after=CURSOR     linhas, paginação por chave
+#   GET /api/<seção>/group?by=dim1,dim2&filtros       somas/contagens agrupadas
+#
+# Seções: custos, produtividade, contratos (as do database.json). Filtros:
+# cultura, safra, fazenda, categoria, comprador (os que a tabela tem); cada
+# um pode repetir (?safra=2023/2024&safra=2024/2025). A safra aceita qualquer
+# grafia ("24/25", "2024/2025", "2024.2025") e nos agrupamentos sai
+# normalizada como na página. Linhas saem no formato do database.json.
+#
+# Paginação por chave (rowid): a resposta traz "next" enquanto houver linhas;
+# a página seguinte é ?after=<next>. Sem OFFSET e sem teto fixo: o cliente
+# percorre tudo em páginas de até MAX_PAGE linhas.
+#
+# Cache: ETag fraco = hash do estado do arquivo do banco (+ WAL) e da URL,
+# calculado sem consultar o banco; If-None-Match igual -> 304. As últimas
+# CACHE_SIZE respostas ficam em memória (já comprimidas). gzip quando o
+# cliente aceita e a resposta passa de GZIP_MIN bytes.
+#
+# As consultas rodam no pool de threads do asyncio, uma conexão SQLite
+# somente leitura por thread (WAL: leitura não bloqueia a carga dos scripts).
+#
+# Uso: python3 scripts/agro_api.py [--host H] [--port P]
+
+# Config
+HOST = os.environ.get("TERRA_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("TERRA_API_PORT", "8787"))
+# Carga do AgroDB servida (a do build_db por padrão)
+CARGA = os.environ.get("TERRA_API_CARGA", "csv")
+PAGE_SIZE = 500
+MAX_PAGE = 5000
+CACHE_SIZE = 256
+GZIP_MIN = 1024
+GZIP_LEVEL = 6
+
+# Filtro da API -> coluna, por tabela
+FILTERS = {
+    "custos_operacionais": {"cultura": "cultura", "safra": "safra", "fazenda": "fazenda",
+                            "categoria": "categoria_macro"},
+    "produtividade_real": {"cultura": "cultura", "safra": "safra", "fazenda": "fazenda"},
+    "contratos_venda": {"cultura": "cultura", "safra": "safra", "comprador": "comprador"},
+}
+# Colunas somadas nos agrupamentos
+MEASURES = {
+    "custos_operacionais": ("valor_total_brl", "area_aplicada_ha"),
+    "produtividade_real": ("area_ha", "producao_total_sc"),
+    "contratos_venda": ("volume_kg", "valor_total_brl", "provisao_holding"),
+}
+CONTROL_PARAMS = {"limit", "after", "by", "carga"}
+
+STATUS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+          405: "Method Not Allowed", 431: "Request Header Fields Too Large",
+          500: "Internal Server Error"}
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+_local = threading.local()
+_cache = OrderedDict()
+
+def _conn(path):
+    # Uma conexão por thread do pool (sqlite3 não compartilha conexão entre threads)
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != path:
+        conn = agrodb.connect(path, read_only=True)
+        _local.conn, _local.path = conn, path
+    return conn
+
+def safra_variants(safra):
+    """Grafias da mesma safra no banco: '2024/2025' -> 2024/2025, 24/25, 2024.2025."""
+    norm = norm_safra(safra)
+    variants = {safra, norm}
+    if len(norm) == 9 and norm[4] == "/":
+        variants |= {f"{norm[2:4]}/{norm[7:9]}", norm.replace("/", ".")}
+    return sorted(variants)
+
+def db_generation(path):
+    """Estado do arquivo do banco (muda a cada carga gravada), sem abrir o SQLite."""
+    parts = []
+    for suffix in ("", "-wal"):
+        try:
+            st = os.stat(path + suffix)
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except FileNotFoundError:
+            parts.append("-")
+    return "|".join(parts)
+
+def _table(section):
+    table = agrodb.JSON_SECTIONS.get(section)
+    if table is None:
+        raise ApiError(404, f"seção desconhecida: {section} (use {', '.join(agrodb.JSON_SECTIONS)})")
+    return table
+
+def _where(table, params):
+    unknown = set(params) - set(FILTERS[table]) - CONTROL_PARAMS
+    if unknown:
+        raise ApiError(400, f"filtro inválido para {table}: {', '.join(sorted(unknown))} "
+                            f"(use {', '.join(FILTERS[table])})")
+    clauses = ["carga = ?"]
+    args = [params.get("carga", [CARGA])[-1]]
+    for name, col in FILTERS[table].items():
+        values = params.get(name)
+        if not values:
+            continue
+        if name == "safra":
+            values = sorted({v for s in values for v in safra_variants(s)})
+        clauses.append(f"{col} IN ({', '.join('?' * len(values))})")
+        args.extend(values)
+    return " AND ".join(clauses), args
+
+def _int(params, name, default, low, high):
+    try:
+        value = int(params.get(name, [default])[-1])
+    except ValueError:
+        raise ApiError(400, f"{name} precisa ser inteiro")
+    return max(low, min(high, value))
+
+def query_rows(path, section, params):
+    table = _table(section)
+    where, args = _where(table, params)
+    limit = _int(params, "limit", PAGE_SIZE, 1, MAX_PAGE)
+    after = _int(params, "after", 0, 0, 2 ** 63 - 1)
+    # limit + 1: a linha a mais só diz se há próxima página
+    sql = f"SELECT rowid AS _rowid, * FROM {table} WHERE {where} AND rowid > ? ORDER BY rowid LIMIT ?"
+    rows = _conn(path).execute(sql, args + [after, limit + 1]).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    out = []
+    for row in rows:
+        record = agrodb.to_json(table, row)
+        record.pop("_rowid", None)
+        out.append(record)
+    return {"section": section, "count": len(out), "rows": out,
+            "next": str(rows[-1]["_rowid"]) if more else None}
+
+def query_group(path, section, params):
+    table = _table(section)
+    where, args = _where(table, params)
+    by = [d for raw in params.get("by", []) for d in raw.split(",") if d]
+    for dim in by:
+        if dim not in FILTERS[table]:
+            raise ApiError(400, f"agrupamento inválido para {table}: {dim} (use {', '.join(FILTERS[table])})")
+    cols = [FILTERS[table][d] for d in by]
+    measures = MEASURES[table]
+    select = cols + ["COUNT(*)"] + [f"TOTAL({m})" for m in measures]
+    sql = f"SELECT {', '.join(select)} FROM {table} WHERE {where}"
+    if cols:
+        sql += f" GROUP BY {', '.join(cols)}"
+    names = {col: key for key, col in agrodb.JSON_KEYS[table].items()}
+    # Safras com grafias diferentes caem no mesmo grupo (normalizadas como na página)
+    groups = {}
+    for row in _conn(path).execute(sql, args):
+        key = tuple(norm_safra(v) if d == "safra" else v for d, v in zip(by, row[:len(by)]))
+        acc = groups.setdefault(key, [0] + [0.0] * len(measures))
+        for i, v in enumerate(row[len(by):]):
+            acc[i] += v
+    result = []
+    for key in sorted(groups, key=lambda k: tuple("" if v is None else str(v) for v in k)):
+        acc = groups[key]
+        item = dict(zip(by, key))
+        item["n"] = acc[0]
+        item.update({names.get(m, m): round(v, 4) for m, v in zip(measures, acc[1:])})
+        result.append(item)
+    return {"section": section, "by": by, "groups": [g for g in result if g["n"] or not by]}
+
+def query_health(path, params):
+    conn = _conn(path)
+    counts = {}
+    for table in agrodb.TABLES:
+        for carga, n in conn.execute(f"SELECT carga, COUNT(*) FROM {table} GROUP BY carga"):
+            counts[f"{table}/{carga}"] = n
+    return {"ok": True, "carga": CARGA, "tables": counts}
+
+def route(path, method, target):
+    """(função, argumentos) da URL; ApiError se não houver rota."""
+    if method not in ("GET", "HEAD"):
+        raise ApiError(405, "só GET/HEAD")
+    url = urlsplit(target)
+    params = parse_qs(url.query)
+    parts = [p for p in url.path.split("/") if p]
+    if parts == ["api", "health"]:
+        return query_health, (path, params)
+    if len(parts) == 2 and parts[0] == "api":
+        return query_rows, (path, parts[1], params)
+    if len(parts) == 3 and parts[0] == "api" and parts[2] == "group":
+        return query_group, (path, parts[1], params)
+    raise ApiError(404, f"rota desconhecida: {url.path}")
+
+def _etag(path, target):
+    digest = hashlib.sha1(f"{db_generation(path)}|{path}|{target}".encode("utf-8")).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+async def respond(path, method, target, headers):
+    """(status, headers, corpo) da requisição."""
+    loop = asyncio.get_running_loop()
+    try:
+        func, args = route(path, method, target)
+        etag = _etag(path, target)
+        if etag in [t.strip() for t in headers.get("if-none-match", "").split(",")]:
+            return 304, {"ETag": etag}, b""
+        cached = _cache.get(etag)
+        if cached is None:
+            data = await loop.run_in_executor(None, func, *args)
+            raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            packed = gzip.compress(raw, GZIP_LEVEL) if len(raw) >= GZIP_MIN else None
+            cached = (raw, packed)
+            _cache[etag] = cached
+            if len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+        else:
+            _cache.move_to_end(etag)
+        raw, packed = cached
+        out = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding",
+               "Content-Type": "application/json; charset=utf-8"}
+        if packed is not None and "gzip" in headers.get("accept-encoding", ""):
+            out["Content-Encoding"] = "gzip"
+            return 200, out, packed
+        return 200, out, raw
+    except ApiError as e:
+        body = json.dumps({"erro": str(e)}, ensure_ascii=False).encode("utf-8")
+        return e.status, {"Content-Type": "application/json; charset=utf-8"}, body
+    except Exception as e:
+        print(f"❌ {target}: {e}", file=sys.stderr)
+        body = json.dumps({"erro": "falha interna"}).encode("utf-8")
+        return 500, {"Content-Type": "application/json; charset=utf-8"}, body
+
+async def _reject(writer, status, message):
+    """Resposta de erro antes de fechar a conexão (requisição que não dá para ler)."""
+    body = json.dumps({"erro": message}, ensure_ascii=False).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nAccess-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+async def handle(reader, writer, path):
+    """Uma conexão HTTP/1.1 (keep-alive: várias requisições na mesma conexão)."""
+    try:
+        while True:
+            # readline() levanta ValueError quando a linha passa do limite do
+            # StreamReader (64 KiB): responde e fecha em vez de derrubar a task
+            try:
+                line = await reader.readline()
+            except ValueError:
+                await _reject(writer, 400, "linha de requisição grande demais")
+                break
+            if not line:
+                break
+            try:
+                method, target, version = line.decode("latin-1").split()
+            except ValueError:
+                await _reject(writer, 400, "linha de requisição inválida")
+                break
+            headers = {}
+            while True:
+                try:
+                    h = await reader.readline()
+                except ValueError:
+                    h = None
+                    break
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = h.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            if h is None:
+                await _reject(writer, 431, "cabeçalho grande demais")
+                break
+            status, out, body = await respond(path, method, target, headers)
+            keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            out["Content-Length"] = str(len(body))
+            out["Access-Control-Allow-Origin"] = "*"
+            out["Connection"] = "keep-alive" if keep else "close"
+            head = f"HTTP/1.1 {status} {STATUS[status]}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in out.items())
+            writer.write(head.encode("latin-1") + b"\r\n" + (body if method != "HEAD" else b""))
+            await writer.drain()
+            if not keep:
+                break
+    except (ConnectionError, asyncio.LimitOverrunError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def start(host=None, port=None, path=None):
+    """Sobe o servidor (asyncio.Server) sem bloquear."""
+    path = path or agrodb.DB_FILE
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"AgroDB não encontrado: {path} (rode scripts/build_db.py)")
+    return await asyncio.start_server(lambda r, w: handle(r, w, path), host or HOST, PORT if port is None else port)
+
+async def serve(host=None, port=None, path=None):
+    server = await start(host, port, path)
+    addr = server.sockets[0].getsockname()
+    print(f"🌐 API do AgroDB em http://{addr[0]}:{addr[1]}/api/ (banco: {path or agrodb.DB_FILE}, carga: {CARGA})", flush=True)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    opts = dict(zip(args[::2], args[1::2]))
+    try:
+        asyncio.run(serve(opts.get("--host"), int(opts["--port"]) if "--port" in opts else None))
+    except KeyboardInterrupt:
+        print("👋 API encerrada")
@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import uuid
+import sqlite3
+
+import columnar
+import cube as kpi_cube
+import shards as data_shards
+
+# AgroDB em SQLite: as tabelas do SCHEMA.md (custos_operacionais,
+# produtividade_real, contratos_venda) num arquivo só, em modo WAL.
+#
+# Cada tabela tem a coluna `carga`, que diz qual script gravou a linha
+# ("csv" = build_db a partir dos CSVs do ETL, "parse_all_data",
+# "build_complete_db"): cada carga substitui só as próprias linhas, numa
+# transação, com executemany em lotes. O database.json passa a ser uma
+# exportação do banco (export_json), e consultas filtradas (select) usam os
+# índices em (cultura, safra, fazenda) e (categoria_macro, item) sem ler
+# o JSON inteiro.
+#
+# Uso: python3 scripts/agrodb.py TABELA [coluna=valor ...]   (linhas em JSON)
+
+# Config
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = os.environ.get("TERRA_AGRODB", os.path.join(PROJECT_DIR, "data", "agrodb.sqlite"))
+BATCH_SIZE = int(os.environ.get("TERRA_AGRODB_BATCH", "5000"))
+
+# Colunas de cada tabela (SCHEMA.md + cultura/safra onde faltavam para os índices,
+# arquivo_origem e carga). Tipos do SQLite.
+TABLES = {
+    "custos_operacionais": [
+        ("id", "TEXT PRIMARY KEY"),
+        ("data_referencia", "TEXT"),
+        ("safra", "TEXT"),
+        ("cultura", "TEXT"),
+        ("fonte", "TEXT"),
+        ("fazenda", "TEXT"),
+        ("categoria_macro", "TEXT"),
+        ("item", "TEXT"),
+        ("unidade_medida", "TEXT"),
+        ("valor_total_brl", "REAL"),
+        ("area_aplicada_ha", "REAL"),
+        ("custo_por_ha", "REAL"),
+        ("custo_por_sc", "REAL"),
+        ("arquivo_origem", "TEXT"),
+        ("carga", "TEXT NOT NULL"),
+    ],
+    "produtividade_real": [
+        ("safra", "TEXT"),
+        ("cultura", "TEXT"),
+        ("fazenda", "TEXT"),
+        ("talhao", "TEXT"),
+        ("variedade", "TEXT"),
+        ("area_ha", "REAL"),
+        ("producao_kg", "REAL"),
+        ("produtividade_sc_ha", "REAL"),
+        ("producao_total_sc", "REAL"),
+        ("arquivo_origem", "TEXT"),
+        ("carga", "TEXT NOT NULL"),
+    ],
+    "contratos_venda": [
+        ("contrato_id", "TEXT"),
+        ("safra", "TEXT"),
+        ("cultura", "TEXT"),
+        ("comprador", "TEXT"),
+        ("data_venda", "TEXT"),
+        ("prazo_entrega", "TEXT"),
+        ("volume_kg", "REAL"),
+        ("valor_unitario_brl", "REAL"),
+        ("valor_total_brl", "REAL"),
+        ("status_entrega", "TEXT"),
+        ("provisao_holding", "REAL"),
+        ("arquivo_origem", "TEXT"),
+        ("carga", "TEXT NOT NULL"),
+    ],
+}
+
+INDEXES = [
+    ("idx_custos_csf", "custos_operacionais", ("cultura", "safra", "fazenda")),
+    ("idx_custos_categoria_item", "custos_operacionais", ("categoria_macro", "item")),
+    ("idx_custos_carga", "custos_operacionais", ("carga",)),
+    ("idx_prod_csf", "produtividade_real", ("cultura", "safra", "fazenda")),
+    ("idx_prod_carga", "produtividade_real", ("carga",)),
+    ("idx_contratos_cs", "contratos_venda", ("cultura", "safra")),
+    ("idx_contratos_carga", "contratos_venda", ("carga",)),
+]
+
+# Chaves do database.json <-> colunas (o formato que o index.html já lê)
+JSON_KEYS = {
+    "custos_operacionais": {
+        "categoria": "categoria_macro",
+        "valor": "valor_total_brl",
+        "custo_ha": "custo_por_ha",
+        "custo_sc_ha": "custo_por_sc",
+    },
+    "produtividade_real": {
+        "area": "area_ha",
+        "prod_sc_ha": "produtividade_sc_ha",
+        "total_sc": "producao_total_sc",
+    },
+    "contratos_venda": {
+        "vencimento": "prazo_entrega",
+        "valor_total": "valor_total_brl",
+    },
+}
+JSON_SECTIONS = {"custos": "custos_operacionais", "produtividade": "produtividade_real", "contratos": "contratos_venda"}
+
+# Provisão da holding sobre a receita bruta do contrato (SCHEMA.md)
+PROVISAO_HOLDING = 0.19
+ID_NAMESPACE = uuid.UUID("6f1c3a52-8d0e-4b7a-9c3e-2a1f5d7e9b10")
+
+def connect(path=None, read_only=False):
+    """
+    Abre (e cria, se preciso) o banco em modo WAL. `read_only` abre só para
+    leitura, sem criar nada, e a conexão pode ser usada por outra thread.
+    """
+    path = path or DB_FILE
+    if read_only:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Com WAL, NORMAL só perde a última transação numa queda de energia (o banco não corrompe)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with conn:
+        for table, columns in TABLES.items():
+            cols = ", ".join(f"{name} {kind}" for name, kind in columns)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols})")
+        for name, table, columns in INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    return conn
+
+def columns_of(table):
+    return [name for name, _ in TABLES[table]]
+
+def from_json(table, record):
+    """Registro no formato do database.json/CSV -> {coluna: valor} da tabela."""
+    keys = JSON_KEYS[table]
+    valid = set(columns_of(table))
+    row = {}
+    for key, value in record.items():
+        col = keys.get(key, key)
+        if col in valid and value != "":
+            row[col] = value
+    return row
+
+def to_json(table, row):
+    """Linha do banco -> registro do database.json (colunas vazias e internas ficam de fora)."""
+    keys = {col: key for key, col in JSON_KEYS[table].items()}
+    return {keys.get(col, col): row[col] for col in row.keys()
+            if row[col] is not None and col not in ("carga", "id")}
+
+def _row_id(carga, n, row):
+    raw = "|".join([carga, str(n)] + [str(row.get(c)) for c in ("safra", "cultura", "fazenda", "item", "arquivo_origem")])
+    return str(uuid.uuid5(ID_NAMESPACE, raw))
+
+def replace_load(conn, table, carga, records):
+    """
+    Substitui as linhas da `carga` pelos registros (dicts no formato do
+    database.json/CSV), numa transação só. Retorna o nº de linhas gravadas.
+    """
+    columns = columns_of(table)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    total = 0
+    with conn:
+        conn.execute(f"DELETE FROM {table} WHERE carga = ?", (carga,))
+        batch = []
+        for n, record in enumerate(records):
+            row = from_json(table, record)
+            row["carga"] = carga
+            if table == "custos_operacionais":
+                row.setdefault("id", _row_id(carga, n, row))
+            elif table == "contratos_venda" and row.get("valor_total_brl") is not None:
+                row.setdefault("provisao_holding", round(float(row["valor_total_brl"]) * PROVISAO_HOLDING, 2))
+            batch.append(tuple(row.get(c) for c in columns))
+            if len(batch) >= BATCH_SIZE:
+                conn.executemany(sql, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(sql, batch)
+            total += len(batch)
+    return total
+
+def select(conn, table, carga=None, order=True, **where):
+    """Linhas da tabela com os filtros coluna=valor (None = sem filtro)."""
+    where = {k: v for k, v in where.items() if v is not None}
+    if carga is not None:
+        where["carga"] = carga
+    for col in where:
+        if col not in columns_of(table):
+            raise ValueError(f"coluna desconhecida em {table}: {col}")
+    sql = f"SELECT * FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(f"{col} = ?" for col in where)
+    if order:
+        sql += " ORDER BY rowid"
+    return conn.execute(sql, tuple(where.values())).fetchall()
+
+def export_json(conn, path, carga, extra=None, fields=None, indent=None, cube=False, columnar_copy=False,
+                shards=False):
+    """
+    Exporta as linhas da `carga` no formato do database.json, mais as chaves
+    de `extra` (referencias/metadata). `fields` {seção: [chaves]} limita as
+    chaves de cada registro. contratos só sai se houver linhas. `cube`
+    inclui o cubo de agregados dos KPIs (scripts/cube.py); `columnar_copy`
+    grava também a versão colunar (.col.json + .gz/.br, scripts/columnar.py);
+    `shards` grava as partições por cultura/safra em shards/ ao lado
+    (scripts/shards.py).
+    """
+    db = {}
+    for section, table in JSON_SECTIONS.items():
+        rows = [to_json(table, row) for row in select(conn, table, carga=carga)]
+        keep = (fields or {}).get(section)
+        if keep:
+            rows = [{k: r[k] for k in keep if k in r} for r in rows]
+        if rows or section != "contratos":
+            db[section] = rows
+    db.update(extra or {})
+    if cube:
+        db["cube"] = kpi_cube.build_cube(db)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(db, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp, path)
+    if columnar_copy:
+        columnar.write_export(db, columnar.col_path(path))
+    if shards:
+        data_shards.write_shards(db, os.path.join(os.path.dirname(path), "shards"))
+    return db
+
+def stats(conn):
+    """Nº de linhas por tabela e carga."""
+    out = {}
+    for table in TABLES:
+        for row in conn.execute(f"SELECT carga, COUNT(*) FROM {table} GROUP BY carga"):
+            out[f"{table}/{row[0]}"] = row[1]
+    return out
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in TABLES:
+        print(f"Uso: python3 scripts/agrodb.py {{{'|'.join(TABLES)}}} [coluna=valor ...]")
+        with connect() as conn:
+            for key, n in stats(conn).items():
+                print(f"   {key}: {n} linhas")
+        sys.exit(1)
+    table = sys.argv[1]
+    filters = dict(arg.split("=", 1) for arg in sys.argv[2:])
+    conn = connect()
+    rows = select(conn, table, **filters)
+    json.dump([dict(row) for row in rows], sys.stdout, ensure_ascii=False, indent=1)
+    print(f"\n✅ {len(rows)} linhas", file=sys.stderr)
@@ -1,97 +1,295 @@
 import csv
 import os
-from collections import defaultdict
+import sys
+import json
+import time
+import tempfile
+from itertools import repeat
+from operator import itemgetter
+
+import tables
+from cube import norm_safra
+
+# Comparativo de custos entre safras, para qualquer cultura.
+#
+# Uma passada só sobre as linhas do custos_operacionais.csv soma, para cada
+# agrupamento pedido (qualquer combinação de DIMENSIONS), n e as MEASURES por
+# chave. O CSV é lido numa tables.Table e a soma anda pelos códigos das
+# categorias (a safra é normalizada uma vez por valor distinto); dicts
+# também servem. O relatório agrupa por cultura × safra × `by`, põe as safras lado a
+# lado e calcula a variação de cada safra para a anterior (R$ e %). Custo
+# linear no nº de linhas: cada linha soma em uma célula por agrupamento.
+#
+# Formatos: Markdown (tabelas na tela, como antes), CSV e JSON (um arquivo por
+# cultura em --out).
+#
+# Uso: python3 scripts/analyze_costs.py [--by categoria_macro,item] [--safras 2024,2025]
+#                                      [--measure custo_por_ha] [--out data/reports]
+#      python3 scripts/analyze_costs.py --bench   (mede com o CSV replicado 1x/100x/1000x)
 
 # Config
-DATA_FILE = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data/custos_operacionais.csv"
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = os.environ.get("TERRA_CUSTOS_CSV", os.path.join(PROJECT_DIR, "data", "custos_operacionais.csv"))
+
+DIMENSIONS = ("cultura", "safra", "fazenda", "categoria_macro", "item")
+MEASURES = ("valor_total_brl", "custo_por_ha")
+ICONES = {"SOJA": "🌱", "MILHO": "🌽"}  # também a ordem das tabelas; as demais culturas vêm depois
+ROTULOS = {"fazenda": "Fazenda", "categoria_macro": "Categoria", "item": "Item"}
+
+def _num(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def load_rows(path=None):
+    """Custos do CSV numa tables.Table."""
+    return tables.Table.from_csv(path or DATA_FILE, "custos")
+
+def aggregate(rows, groupings, safras=None):
+    """Soma numa passada só. Devolve {agrupamento: {chave: [n, medida1, medida2, ...]}}.
+
+    `groupings` é uma lista de tuplas de DIMENSIONS; a chave é a tupla dos
+    valores dessas dimensões (safra normalizada). Com `safras`, as outras
+    safras são ignoradas. `rows` é uma tables.Table ou qualquer iterável de dicts.
+    """
+    groupings = [tuple(g) for g in groupings]
+    for g in groupings:
+        unknown = [d for d in g if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"dimensão desconhecida: {', '.join(unknown)} (use {', '.join(DIMENSIONS)})")
+    wanted = {norm_safra(s) for s in safras} if safras else None
+    # Posição de cada dimensão na tupla de coordenadas da linha
+    plans = [(g, tuple(DIMENSIONS.index(d) for d in g), {}) for g in groupings]
+    width = len(MEASURES) + 1
+    if isinstance(rows, tables.Table):
+        return _aggregate_table(rows, plans, wanted, width)
+    for r in rows:
+        safra = norm_safra(r.get("safra")) or ""
+        if wanted is not None and safra not in wanted:
+            continue
+        coords = (r.get("cultura") or "", safra, r.get("fazenda") or "",
+                  r.get("categoria_macro") or "", r.get("item") or "")
+        values = [_num(r.get(m)) for m in MEASURES]
+        for _, idx, cells in plans:
+            key = tuple(coords[i] for i in idx)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0] * width
+            cell[0] += 1
+            for i, v in enumerate(values, 1):
+                cell[i] += v
+    return {g: cells for g, _, cells in plans}
+
+def _aggregate_table(table, plans, wanted, width):
+    """aggregate() sobre a Table: soma por tupla de códigos e traduz as chaves no fim."""
+    code_cols, labels = [], []
+    for d in DIMENSIONS:
+        if d in table.cats:
+            codes, values = table.codes(d)
+            # O rótulo extra no fim atende o código -1 (ausente -> "")
+            labels.append([(norm_safra(v) if d == "safra" else v) or "" for v in values] + [""])
+        else:
+            codes = repeat(-1, len(table))
+            labels.append([""])
+        code_cols.append(codes)
+    measure_cols = [table.nums.get(m) or repeat(0.0, len(table)) for m in MEASURES]
+    keep = None
+    if wanted is not None:
+        safra_labels = labels[DIMENSIONS.index("safra")]
+        keep = {c for c, label in enumerate(safra_labels[:-1]) if label in wanted}
+        if "" in wanted:
+            keep.add(-1)
+    safra_pos = DIMENSIONS.index("safra")
+    dims = len(DIMENSIONS)
+    by_code = [({}, itemgetter(*idx) if idx else (lambda coords: ())) for _, idx, _ in plans]
+    for row in zip(*code_cols, *measure_cols):
+        if keep is not None and row[safra_pos] not in keep:
+            continue
+        values = row[dims:]
+        for cells, key_of in by_code:
+            key = key_of(row)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0] * width
+            cell[0] += 1
+            for i, v in enumerate(values, 1):
+                if v == v:  # NaN = valor vazio no CSV
+                    cell[i] += v
+    out = {}
+    for (g, idx, _), (cells, _) in zip(plans, by_code):
+        decoded = out[g] = {}
+        for key, cell in cells.items():
+            key = key if len(idx) > 1 else (key,) if idx else ()
+            # Códigos diferentes podem virar o mesmo rótulo (ex.: "23/24" e "2023/2024")
+            label = tuple(labels[d][c] for d, c in zip(idx, key))
+            if label in decoded:
+                decoded[label] = [a + b for a, b in zip(decoded[label], cell)]
+            else:
+                decoded[label] = cell
+    return out
+
+def _delta(prev, cur):
+    """Variação de prev para cur: (R$, % ou None se não havia base)."""
+    if prev > 0:
+        return cur - prev, (cur - prev) / prev * 100
+    return cur - prev, 0.0 if cur == prev else None
+
+def compare(cells, by, cultura, safras, measure="valor_total_brl"):
+    """Tabela de uma cultura a partir das células de (cultura, safra, *by).
 
-def analyze_costs():
-    # Estrutura: dados[cultura][safra][categoria] = valor
-    dados = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
-    
+    Cada linha: {"key": {dim: valor}, "values": [por safra], "deltas": [(R$, %) safra a safra]},
+    ordenadas pela chave; o total vem como a última linha, com key None.
+    """
+    m = MEASURES.index(measure) + 1
+    pos = {s: i for i, s in enumerate(safras)}
+    rows = {}
+    for (c, s, *key), cell in cells.items():
+        if c != cultura or s not in pos:
+            continue
+        rows.setdefault(tuple(key), [0.0] * len(safras))[pos[s]] += cell[m]
+    total = [sum(v[i] for v in rows.values()) for i in range(len(safras))]
+    out = []
+    for key, values in sorted(rows.items()) + [(None, total)]:
+        out.append({"key": dict(zip(by, key)) if key is not None else None, "values": values,
+                    "deltas": [_delta(values[i - 1], values[i]) for i in range(1, len(values))]})
+    return out
+
+def reports(rows, by=("categoria_macro",), safras=None, measure="valor_total_brl"):
+    """{cultura: (safras, tabela)} para todas as culturas, numa passada pelas linhas."""
+    by = tuple(by)
+    if "cultura" in by or "safra" in by:
+        raise ValueError("cultura e safra já são as tabelas e as colunas do relatório; agrupe pelas outras dimensões")
+    if measure not in MEASURES:
+        raise ValueError(f"medida desconhecida: {measure} (use {', '.join(MEASURES)})")
+    cells = aggregate(rows, [("cultura", "safra") + by], safras)[("cultura", "safra") + by]
+    present = {}
+    for c, s, *_ in cells:
+        present.setdefault(c, set()).add(s)
+    out = {}
+    for cultura in sorted(present, key=lambda c: (list(ICONES).index(c) if c in ICONES else len(ICONES), c)):
+        # Na ordem pedida, senão cronológica ("2023/2024" e "2024" ordenam como texto)
+        order = [norm_safra(s) for s in safras if norm_safra(s) in present[cultura]] if safras \
+            else sorted(present[cultura])
+        if order:
+            out[cultura] = (order, compare(cells, by, cultura, order, measure))
+    return out
+
+def fmt(val):
+    return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def _short(safra):
+    """"2023/2024" -> "23/24" (rótulo das colunas)."""
+    parts = safra.split("/")
+    return "/".join(p[-2:] for p in parts) if len(parts) == 2 else safra
+
+def _pct(delta):
+    _, pct = delta
+    if pct is None:
+        return "-"
+    icon = "🔺" if pct > 0 else "🔻" if pct < 0 else "➡️"
+    return f"{icon} {pct:+.1f}%"
+
+def render_markdown(cultura, safras, table, by):
+    short = [_short(s) for s in safras]
+    lines = [f"### {ICONES.get(cultura, '🌾')} {cultura}: Evolução de Custos ({' vs '.join(short)})\n"]
+    pairs = [f"{short[i - 1]}→{short[i]}" for i in range(1, len(safras))]
+    var_cols = ["Variação (%)"] if len(pairs) == 1 else [f"Variação {p} (%)" for p in pairs]
+    header = [" / ".join(ROTULOS.get(d, d) for d in by)] + [f"Safra {s}" for s in short] + var_cols
+    lines.append("| " + " | ".join(header) + " |")
+    lines.append("|" + "---|" * len(header))
+    for row in table:
+        if row["key"] is None:
+            cells = ["**TOTAL GERAL**"] + [f"**{fmt(v)}**" for v in row["values"]] + \
+                [f"**{_pct(d).split()[-1]}**" for d in row["deltas"]]
+        else:
+            cells = [f"**{' / '.join(row['key'].values())}**"] + [fmt(v) for v in row["values"]] + \
+                [_pct(d) for d in row["deltas"]]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines) + "\n"
+
+def write_csv(path, cultura, safras, table, by):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        pairs = [f"{safras[i - 1]}->{safras[i]}" for i in range(1, len(safras))]
+        writer.writerow(["cultura", *by, *safras, *(f"delta {p}" for p in pairs), *(f"delta % {p}" for p in pairs)])
+        for row in table:
+            key = list(row["key"].values()) if row["key"] is not None else ["TOTAL"] + [""] * (len(by) - 1)
+            writer.writerow([cultura, *key, *(round(v, 2) for v in row["values"]),
+                             *(round(d[0], 2) for d in row["deltas"]),
+                             *("" if d[1] is None else round(d[1], 2) for d in row["deltas"])])
+
+def write_json(path, cultura, safras, table, by, measure):
+    doc = {"cultura": cultura, "by": list(by), "measure": measure, "safras": safras,
+           "rows": [{"key": row["key"], "values": dict(zip(safras, row["values"])),
+                     "deltas": [{"de": safras[i], "para": safras[i + 1], "abs": d[0], "pct": d[1]}
+                                for i, d in enumerate(row["deltas"])]} for row in table[:-1]],
+           "total": {"values": dict(zip(safras, table[-1]["values"])),
+                     "deltas": [{"de": safras[i], "para": safras[i + 1], "abs": d[0], "pct": d[1]}
+                                for i, d in enumerate(table[-1]["deltas"])]}}
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=2, ensure_ascii=False)
+
+def analyze_costs(path=None, by=("categoria_macro",), safras=None, measure="valor_total_brl", out_dir=None):
+    """Imprime o comparativo de todas as culturas; com out_dir grava também .md/.csv/.json por cultura."""
     try:
-        with open(DATA_FILE, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                cultura = row['cultura']
-                safra = row['safra']
-                categoria = row['categoria_macro']
-                valor = float(row['valor_total_brl'])
-                
-                dados[cultura][safra][categoria] += valor
+        result = reports(load_rows(path), by, safras, measure)
     except FileNotFoundError:
         print("Erro: Banco de dados não encontrado.")
-        return
-
-    # Função auxiliar para formatar moeda
-    def fmt(val):
-        return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-    # Relatório SOJA
-    print("### 🌱 SOJA: Evolução de Custos (23/24 vs 24/25)\n")
-    print("| Categoria | Safra 23/24 | Safra 24/25 | Variação (%) |")
-    print("|---|---|---|---|")
-    
-    safra_ant = "2023/2024"
-    safra_atual = "2024/2025"
-    
-    cats_soja = set(dados['SOJA'][safra_ant].keys()) | set(dados['SOJA'][safra_atual].keys())
-    
-    total_ant_soja = 0
-    total_atual_soja = 0
-
-    for cat in sorted(cats_soja):
-        val_ant = dados['SOJA'][safra_ant][cat]
-        val_atual = dados['SOJA'][safra_atual][cat]
-        
-        total_ant_soja += val_ant
-        total_atual_soja += val_atual
-        
-        diff = 0
-        if val_ant > 0:
-            diff = ((val_atual - val_ant) / val_ant) * 100
-        
-        icon = "🔺" if diff > 0 else "🔻"
-        if diff == 0: icon = "➡️"
-        
-        print(f"| **{cat}** | {fmt(val_ant)} | {fmt(val_atual)} | {icon} {diff:+.1f}% |")
-
-    print(f"| **TOTAL GERAL** | **{fmt(total_ant_soja)}** | **{fmt(total_atual_soja)}** | **{((total_atual_soja - total_ant_soja)/total_ant_soja)*100:+.1f}%** |")
-    print("\n---\n")
-
-    # Relatório MILHO
-    print("### 🌽 MILHO: Evolução de Custos (2024 vs 2025)\n")
-    print("| Categoria | Safra 2024 | Safra 2025 | Variação (%) |")
-    print("|---|---|---|---|")
-    
-    safra_ant_milho = "2024"
-    safra_atual_milho = "2025"
-    
-    cats_milho = set(dados['MILHO'][safra_ant_milho].keys()) | set(dados['MILHO'][safra_atual_milho].keys())
-    
-    total_ant_milho = 0
-    total_atual_milho = 0
-
-    for cat in sorted(cats_milho):
-        val_ant = dados['MILHO'][safra_ant_milho][cat]
-        val_atual = dados['MILHO'][safra_atual_milho][cat]
-        
-        total_ant_milho += val_ant
-        total_atual_milho += val_atual
-        
-        diff = 0
-        if val_ant > 0:
-            diff = ((val_atual - val_ant) / val_ant) * 100
-            
-        icon = "🔺" if diff > 0 else "🔻"
-        if diff == 0: icon = "➡️"
-
-        print(f"| **{cat}** | {fmt(val_ant)} | {fmt(val_atual)} | {icon} {diff:+.1f}% |")
-
-    if total_ant_milho > 0:
-        print(f"| **TOTAL GERAL** | **{fmt(total_ant_milho)}** | **{fmt(total_atual_milho)}** | **{((total_atual_milho - total_ant_milho)/total_ant_milho)*100:+.1f}%** |")
-    else:
-        print(f"| **TOTAL GERAL** | **{fmt(total_ant_milho)}** | **{fmt(total_atual_milho)}** | - |")
+        return None
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    for n, (cultura, (order, table)) in enumerate(result.items()):
+        md = render_markdown(cultura, order, table, by)
+        if n:
+            print("\n---\n")
+        print(md.rstrip("\n"))
+        if out_dir:
+            stem = os.path.join(out_dir, f"custos_{cultura.lower()}")
+            with open(stem + ".md", "w") as f:
+                f.write(md)
+            write_csv(stem + ".csv", cultura, order, table, by)
+            write_json(stem + ".json", cultura, order, table, by, measure)
+    if out_dir:
+        print(f"\n✅ Relatórios de {len(result)} culturas em {out_dir}")
+    return result
+
+def bench(path=None):
+    """Tempo de leitura + agregação + tabelas com o CSV replicado."""
+    with open(path or DATA_FILE, "r", newline="") as f:
+        header, *lines = list(csv.reader(f))
+    tmp = tempfile.mkdtemp(prefix="terra_custos_")
+    try:
+        for factor in (1, 100, 1000):
+            big = os.path.join(tmp, f"custos_{factor}x.csv")
+            with open(big, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                for _ in range(factor):
+                    writer.writerows(lines)
+            start = time.perf_counter()
+            result = reports(load_rows(big), ("fazenda", "categoria_macro", "item"))
+            for cultura, (order, table) in result.items():
+                render_markdown(cultura, order, table, ("fazenda", "categoria_macro", "item"))
+            seconds = time.perf_counter() - start
+            n = len(lines) * factor
+            print(f"   {factor:>5}x: {n:>8} linhas em {seconds:.2f}s ({n / seconds:,.0f} linhas/s)")
+            os.remove(big)
+    finally:
+        os.rmdir(tmp)
 
 if __name__ == "__main__":
-    analyze_costs()
+    args = sys.argv[1:]
+    if "--bench" in args:
+        print(f"⏱️ analyze_costs com {DATA_FILE} replicado:")
+        bench()
+        sys.exit(0)
+    opts = dict(zip(args[::2], args[1::2]))
+    by = tuple(opts.get("--by", "categoria_macro").split(","))
+    safras = opts["--safras"].split(",") if "--safras" in opts else None
+    try:
+        analyze_costs(by=by, safras=safras, measure=opts.get("--measure", "valor_total_brl"),
+                      out_dir=opts.get("--out"))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
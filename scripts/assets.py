@@ -0,0 +1,99 @@
+import os
+import re
+import sys
+import json
+import hashlib
+
+import columnar
+
+# Arquivos de dados com o hash do conteúdo no nome + regras de cache do Vercel.
+#
+# Um asset "<nome>.<sha256[:12]><ext>" nunca muda de conteúdo (mudou o dado,
+# muda o nome), então pode ser servido com cache de um ano e `immutable`:
+# visita repetida não baixa nem revalida. Só a casca (index.html) e os
+# manifestos sem hash no nome ficam com TTL curto / revalidação, e é por
+# eles que a página descobre o nome novo.
+#
+# HEADER_RULES é a lista "headers" do vercel.json (a regra que casa por
+# último vale):
+#   /(.*)                        5 min (o que não tem hash: database.json...)
+#   /, /index.html               revalida sempre (casca pequena, 304 se igual)
+#   /data/shards/manifest.json   revalida sempre
+#   /data/*.<hash>.json(.gz|.br) 1 ano, immutable
+#
+# Uso: python3 scripts/assets.py [vercel.json]   (regrava só a chave "headers")
+
+# Config
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VERCEL_FILE = os.path.join(PROJECT_DIR, "vercel.json")
+HASH_CHARS = 12
+
+DEFAULT_CACHE = "public, max-age=300"
+SHELL_CACHE = "public, max-age=0, must-revalidate"
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+def _rule(source, value):
+    return {"source": source, "headers": [{"key": "Cache-Control", "value": value}]}
+
+HEADER_RULES = [
+    _rule("/(.*)", DEFAULT_CACHE),
+    _rule("/", SHELL_CACHE),
+    _rule("/index.html", SHELL_CACHE),
+    _rule("/data/shards/manifest.json", SHELL_CACHE),
+    _rule(f"/data/(.*\\.[0-9a-f]{{{HASH_CHARS}}}\\.(?:col\\.)?json(?:\\.gz|\\.br)?)", IMMUTABLE_CACHE),
+]
+
+def hashed_name(stem, data, ext=".json"):
+    """'dashboard', bytes -> 'dashboard.<sha256[:12]>.json'"""
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_CHARS]}{ext}"
+
+def hashed_pattern(stem, ext=".json"):
+    """Regex dos nomes gerados por hashed_name (com .gz/.br opcionais)."""
+    return re.compile(rf"^{re.escape(stem)}\.[0-9a-f]{{{HASH_CHARS}}}{re.escape(ext)}(\.gz|\.br)?$")
+
+def write_hashed(out_dir, stem, data, ext=".json"):
+    """
+    Grava `data` (bytes) como <stem>.<hash><ext> (+ .gz/.br) em out_dir.
+    Nome igual = conteúdo igual, então um arquivo que já existe não é
+    reescrito. Retorna o nome.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    name = hashed_name(stem, data, ext)
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        columnar.write_atomic(path, data)
+        columnar.write_compressed(path, data)
+    return name
+
+def prune_hashed(out_dir, stem, keep, ext=".json"):
+    """Apaga as versões de <stem>.<hash><ext> que não estão em `keep`. Retorna os nomes apagados."""
+    pattern = hashed_pattern(stem, ext)
+    removed = []
+    for f in sorted(os.listdir(out_dir)):
+        match = pattern.match(f)
+        if match and f[:len(f) - len(match.group(1) or "")] not in keep:
+            os.remove(os.path.join(out_dir, f))
+            removed.append(f)
+    return removed
+
+def update_vercel_json(path=None):
+    """Troca a chave "headers" do vercel.json por HEADER_RULES (o resto fica igual)."""
+    path = path or VERCEL_FILE
+    config = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            config = json.load(f)
+    config["headers"] = HEADER_RULES
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp, path)
+    return config
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else VERCEL_FILE
+    update_vercel_json(path)
+    print(f"✅ {path}: {len(HEADER_RULES)} regras de Cache-Control")
+    for rule in HEADER_RULES:
+        print(f"   {rule['source']}: {rule['headers'][0]['value']}")
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import gzip
+import time
+import socket
+import asyncio
+import tempfile
+import subprocess
+from urllib.parse import urlsplit, urlencode
+
+import agrodb
+import columnar
+from cube import norm_safra
+
+# Teste de carga da API do AgroDB (scripts/agro_api.py).
+#
+# Sobe a API num subprocesso (ou usa a URL dada) e abre CLIENTES conexões
+# keep-alive que disparam, por SEGUNDOS, uma mistura de consultas montada a
+# partir dos dados:
+#   rows    linhas filtradas por cultura/safra, seguindo o cursor "next" até o fim
+#   group   agrupamentos (cultura,safra / fazenda / categoria / comprador)
+#   304     a mesma URL com If-None-Match (revalidação de quem já tem a resposta)
+# Antes da carga confere que a paginação devolve todas as linhas (soma das
+# páginas = n do agrupamento) e que o gzip/ETag respondem.
+# Relata req/s e latência p50/p99 no total e por tipo.
+#
+# Sem AgroDB em TERRA_AGRODB, monta um temporário com o data/database.json.
+#
+# Uso: python3 scripts/bench_api.py [--url http://host:porta] [--seconds 10] [--clients 32]
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_JSON = os.path.join(PROJECT_DIR, "data", "database.json")
+BENCH_CARGA = "bench"
+PAGE_LIMIT = 50
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def prepare_db():
+    """(caminho do AgroDB, carga): o de TERRA_AGRODB, senão um temporário com o database.json."""
+    if os.environ.get("TERRA_AGRODB") and os.path.exists(agrodb.DB_FILE):
+        return agrodb.DB_FILE, os.environ.get("TERRA_API_CARGA", "csv")
+    path = os.path.join(tempfile.mkdtemp(prefix="terra_api_"), "agrodb.sqlite")
+    db = columnar.load(DATABASE_JSON)
+    conn = agrodb.connect(path)
+    for section, table in agrodb.JSON_SECTIONS.items():
+        agrodb.replace_load(conn, table, BENCH_CARGA, db.get(section) or [])
+    conn.close()
+    return path, BENCH_CARGA
+
+def start_server(path, carga):
+    port = _free_port()
+    env = dict(os.environ, TERRA_AGRODB=path, TERRA_API_CARGA=carga)
+    proc = subprocess.Popen([sys.executable, os.path.join(PROJECT_DIR, "scripts", "agro_api.py"),
+                             "--port", str(port)], env=env, stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()  # linha "API do AgroDB em ..." = servidor escutando
+    return proc, f"http://127.0.0.1:{port}"
+
+class Client:
+    """Conexão HTTP/1.1 keep-alive mínima."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def get(self, target, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"GET {target} HTTP/1.1", f"Host: {self.host}", "Accept-Encoding: gzip"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        head = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            head[key.strip().lower()] = value.strip()
+        body = await self.reader.readexactly(int(head.get("content-length", 0)))
+        if head.get("connection") == "close":
+            self.writer.close()
+            self.writer = None
+        return status, head, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def _json(head, body):
+    return json.loads(gzip.decompress(body) if head.get("content-encoding") == "gzip" else body)
+
+def _url(path, **params):
+    query = urlencode([(k, v) for k, v in params.items() if v], doseq=True)
+    return path + ("?" + query if query else "")
+
+def build_mix(db):
+    """URLs (tipo, url) da mistura de consultas, a partir das combinações presentes nos dados."""
+    combos = sorted({(r.get("cultura"), norm_safra(r.get("safra"))) for r in db.get("produtividade") or []
+                     if r.get("cultura") and r.get("safra")})
+    mix = []
+    for cultura, safra in combos:
+        for section in ("produtividade", "custos", "contratos"):
+            mix.append(("rows", _url(f"/api/{section}", cultura=cultura, safra=safra, limit=PAGE_LIMIT)))
+        mix.append(("group", _url("/api/produtividade/group", cultura=cultura, by="fazenda")))
+        mix.append(("group", _url("/api/custos/group", cultura=cultura, safra=safra, by="categoria")))
+    mix.append(("group", _url("/api/produtividade/group", by="cultura,safra")))
+    mix.append(("group", _url("/api/contratos/group", by="comprador")))
+    return mix
+
+async def check(base):
+    """Paginação completa, gzip e 304 antes da carga."""
+    url = urlsplit(base)
+    client = Client(url.hostname, url.port)
+    try:
+        for section in agrodb.JSON_SECTIONS:
+            status, head, body = await client.get(f"/api/{section}/group")
+            total = _json(head, body)["groups"][0]["n"]
+            seen, after, pages = 0, None, 0
+            while True:
+                status, head, body = await client.get(_url(f"/api/{section}", limit=PAGE_LIMIT, after=after))
+                page = _json(head, body)
+                seen += page["count"]
+                pages += 1
+                after = page["next"]
+                if not after:
+                    break
+            mark = "✅" if seen == total else "❌"
+            print(f"   {mark} {section}: {seen}/{total} linhas em {pages} páginas de {PAGE_LIMIT}")
+            if seen != total:
+                return False
+        status, head, body = await client.get(_url("/api/produtividade", limit=500))
+        etag = head.get("etag")
+        status2, _, body2 = await client.get(_url("/api/produtividade", limit=500), {"If-None-Match": etag})
+        raw = len(json.dumps(_json(head, body), ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        print(f"   ✅ gzip {raw / 1024:.1f} KB -> {len(body) / 1024:.1f} KB; If-None-Match -> {status2} ({len(body2)} B)")
+        return status2 == 304
+    finally:
+        client.close()
+
+async def load(base, mix, seconds, clients):
+    url = urlsplit(base)
+    latencies = {"rows": [], "group": [], "304": []}
+    etags = {}
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(n):
+        nonlocal errors
+        client = Client(url.hostname, url.port)
+        i = n
+        try:
+            while time.perf_counter() < deadline:
+                kind, target = mix[i % len(mix)]
+                i += 1
+                # Metade das visitas repetidas revalida com o ETag já visto
+                if target in etags and i % 2:
+                    kind, headers = "304", {"If-None-Match": etags[target]}
+                else:
+                    headers = None
+                while True:
+                    start = time.perf_counter()
+                    status, head, body = await client.get(target, headers)
+                    latencies[kind].append(time.perf_counter() - start)
+                    if status not in (200, 304):
+                        errors += 1
+                        break
+                    etags.setdefault(target, head.get("etag"))
+                    if kind != "rows":
+                        break
+                    after = _json(head, body)["next"]
+                    if not after:
+                        break
+                    target = target.split("&after=")[0] + f"&after={after}"
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(clients)))
+    return latencies, errors, time.perf_counter() - start
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+def main():
+    args = sys.argv[1:]
+    opts = dict(zip(args[::2], args[1::2]))
+    seconds = float(opts.get("--seconds", 10))
+    clients = int(opts.get("--clients", 32))
+    proc = None
+    if "--url" in opts:
+        base = opts["--url"]
+    else:
+        path, carga = prepare_db()
+        proc, base = start_server(path, carga)
+        print(f"🌐 API em {base} (banco: {path}, carga: {carga})")
+    try:
+        mix = build_mix(columnar.load(DATABASE_JSON))
+        print("🔎 Conferindo a API...")
+        if not asyncio.run(check(base)):
+            print("❌ API não passou na conferência")
+            sys.exit(1)
+        print(f"🚀 {clients} clientes por {seconds:.0f}s ({len(mix)} URLs na mistura)...")
+        latencies, errors, wall = asyncio.run(load(base, mix, seconds, clients))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    total = [v for values in latencies.values() for v in values]
+    print(f"✅ {len(total)} requisições em {wall:.1f}s: {len(total) / wall:.0f} req/s, "
+          f"p50 {_pct(total, 0.5):.2f} ms, p99 {_pct(total, 0.99):.2f} ms, {errors} erros")
+    for kind, values in latencies.items():
+        print(f"   {kind:>5}: {len(values):>7} req, p50 {_pct(values, 0.5):.2f} ms, p99 {_pct(values, 0.99):.2f} ms")
+
+if __name__ == "__main__":
+    main()
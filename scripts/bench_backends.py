@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import shutil
+
+# Benchmark dos backends de extração de texto (pdf_text.BACKENDS):
+# pdftotext -layout em subprocesso x pdf_native no próprio processo, sobre
+# todos os PDFs em data/raw/drive (recursivo).
+#   - vazão: arquivos/s e páginas/s de cada backend, com o cache de texto desligado
+#   - concordância: o texto de cada backend passa pela detecção de layout e
+#     pelo parser do layout; os registros têm que ser os mesmos
+#
+# Uso: python3 scripts/bench_backends.py [segundos_por_medida]
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import parse_all_data
+import extract_scadi
+import extract_metrics_v2
+import layouts
+import text_cache
+from pdf_text import BACKENDS, extract_text, page_count
+
+PDF_DIR = os.path.join(PROJECT_DIR, "data", "raw", "drive")
+ENTRY = {"ano_safra": "DESCONHECIDO", "cultura": "SOJA", "filename": "bench.pdf"}
+
+def find_pdfs(root):
+    pdfs = []
+    for dirpath, _, filenames in os.walk(root):
+        pdfs += [os.path.join(dirpath, f) for f in filenames if f.lower().endswith(".pdf")]
+    return sorted(pdfs)
+
+def parse(text):
+    """(layout, registros) do texto, com o parser que o fingerprint escolher."""
+    fp = layouts.detect(text.split("\n"))
+    if fp["layout"] == layouts.PRODUTIVIDADE:
+        return fp, extract_metrics_v2.parse_produtividade(text, ENTRY, fp)
+    if fp["layout"] == layouts.CUSTO_APLICACAO:
+        return fp, parse_all_data.parse_custos(text, "24/25", "SOJA", fp)
+    if fp["layout"] == layouts.CUSTO_CATEGORIA:
+        return fp, extract_scadi.parse_custo_text(text, fp)
+    return fp, []
+
+def throughput(backend, pdfs, min_seconds):
+    """Extrai todos os PDFs até passar min_seconds; retorna (s por rodada, textos)."""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        texts = [extract_text(p, backend=backend) for p in pdfs]
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs, texts
+
+def main():
+    min_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    # Mede o extrator, não o cache
+    text_cache.ENABLED = False
+
+    pdfs = find_pdfs(PDF_DIR)
+    if not pdfs:
+        print(f"⚠️ Nenhum PDF em {PDF_DIR}")
+        return
+    backends = [b for b in BACKENDS if b != "pdftotext" or shutil.which("pdftotext")]
+    if "pdftotext" not in backends:
+        print("⚠️ pdftotext não instalado: medindo só o backend python\n")
+
+    pages = sum(page_count(p) or 0 for p in pdfs)
+    print(f"📄 {len(pdfs)} PDFs, {pages} páginas\n")
+
+    results = {}
+    print("| Backend | s/rodada | Arquivos/s | Páginas/s |")
+    print("|---|---:|---:|---:|")
+    for backend in backends:
+        per_run, texts = throughput(backend, pdfs, min_seconds)
+        results[backend] = texts
+        print(f"| {backend} | {per_run:.3f} | {len(pdfs) / per_run:,.1f} | {pages / per_run:,.1f} |")
+
+    print("\n| Arquivo | Layout | Registros | Iguais |")
+    print("|---|---|---:|---|")
+    agree = 0
+    for i, path in enumerate(pdfs):
+        parsed = {b: parse(results[b][i]) for b in backends}
+        fps = [fp for fp, _ in parsed.values()]
+        records = [r for _, r in parsed.values()]
+        counts = " / ".join(str(len(r)) for r in records)
+        cuts = " / ".join("colunas fixas" if fp["cuts"] else "regex" for fp in fps)
+        if len(records) < 2:
+            same = "—"
+        elif all(r == records[0] for r in records[1:]):
+            same = "✅"
+            agree += 1
+        else:
+            same = "❌"
+        print(f"| {os.path.basename(path)[:60]} | {fps[0]['layout']} ({cuts}) | {counts} | {same} |")
+
+    if len(backends) > 1:
+        print(f"\n{'✅' if agree == len(pdfs) else '❌'} {agree} de {len(pdfs)} arquivos com os mesmos registros "
+              f"({' / '.join(backends)})")
+
+if __name__ == "__main__":
+    main()
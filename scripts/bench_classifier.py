@@ -0,0 +1,223 @@
+import os
+import re
+import sys
+import glob
+import time
+
+# Micro-benchmark: linhas/s dos parsers Scadi antes (regex não compiladas,
+# vários padrões por linha) e depois do classificador compilado
+# (scadi_patterns), sobre o texto dos PDFs em data/raw/drive.
+# Também confere se os dois produzem os mesmos registros.
+# As linhas "(colunas fixas)" comparam o classificador com o fatiamento
+# pelo fingerprint de layout (layouts.py).
+#
+# Uso: python3 scripts/bench_classifier.py [segundos_por_medida]
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import build_complete_db
+import parse_all_data
+import extract_scadi
+import extract_metrics_v2
+import layouts
+from pdf_text import extract_text
+
+PDF_DIR = os.path.join(PROJECT_DIR, "data", "raw", "drive")
+
+# --- Versões antigas (cópia fiel de antes do classificador) ----------------
+
+def legacy_parse_currency(value_str):
+    if not value_str: return 0.0
+    clean = value_str.replace("R$", "").replace(".", "").replace(",", ".").strip()
+    try:
+        return float(clean)
+    except ValueError:
+        return 0.0
+
+def legacy_parse_custo_line(line):
+    parts = re.split(r'\s{2,}', line.strip())
+    if len(parts) < 5:
+        return None
+    if not re.match(r'20\d{2}', parts[0]):
+        return None
+    try:
+        valor_idx = -1
+        for i, p in enumerate(parts):
+            if "R$" in p:
+                valor_idx = i
+                break
+        if valor_idx == -1: return None
+        item = " ".join(parts[3:valor_idx])
+        raw_val_str = parts[valor_idx]
+        custo_ha_str = "0"
+        if raw_val_str.strip() == "R$":
+            if len(parts) > valor_idx + 1:
+                val_total = legacy_parse_currency(parts[valor_idx + 1])
+                if len(parts) > valor_idx + 2:
+                    if parts[valor_idx + 2].strip() == "R$":
+                        custo_ha_str = parts[valor_idx + 3] if len(parts) > valor_idx + 3 else "0"
+                    else:
+                        custo_ha_str = parts[valor_idx + 2]
+            else:
+                val_total = 0.0
+        else:
+            val_total = legacy_parse_currency(raw_val_str)
+            if len(parts) > valor_idx + 1:
+                if "R$" in parts[valor_idx+1]:
+                    if parts[valor_idx+1].strip() == "R$":
+                        custo_ha_str = parts[valor_idx+2] if len(parts) > valor_idx+2 else "0"
+                    else:
+                        custo_ha_str = parts[valor_idx+1]
+                else:
+                    custo_ha_str = parts[valor_idx+1]
+        return {
+            "safra": parts[0], "cultura": parts[1], "categoria_macro": parts[2], "item": item,
+            "valor_total_brl": val_total, "custo_por_ha": legacy_parse_currency(custo_ha_str),
+            "fonte": "SCADI"
+        }
+    except Exception:
+        return None
+
+def legacy_custo_text(text):
+    return [d for d in (legacy_parse_custo_line(l) for l in text.split('\n')) if d]
+
+def legacy_produtividade_v2(text, entry):
+    data = []
+    current_lavoura = "DESCONHECIDA"
+    for line in text.split('\n'):
+        if "Lavoura :" in line:
+            match = re.search(r'Lavoura\s*:\s*\d+\s*-\s*([^-]+)\s*-\s*(.+)', line)
+            if match:
+                current_lavoura = match.group(2).strip()
+            continue
+        if re.search(r'\d+,\d{2}\s+\d+,\d{2}', line) and "Totais" not in line and "Talhão" not in line:
+            parts = re.split(r'\s{2,}', line.strip())
+            if len(parts) >= 8:
+                try:
+                    data.append({
+                        "safra": entry['ano_safra'] if entry['ano_safra'] != "DESCONHECIDO" else "24/25",
+                        "cultura": entry['cultura'],
+                        "fazenda": current_lavoura,
+                        "talhao": parts[0],
+                        "variedade": parts[1],
+                        "area_ha": extract_metrics_v2.parse_decimal(parts[2]),
+                        "produtividade_sc_ha": extract_metrics_v2.parse_decimal(parts[-1]),
+                        "producao_total_sc": extract_metrics_v2.parse_decimal(parts[-3]),
+                        "arquivo_origem": entry['filename']
+                    })
+                except Exception:
+                    continue
+    return data
+
+def legacy_produtividade_complete(text, safra, cultura):
+    prods = []
+    for line in text.split('\n'):
+        if 'ha' in line.lower() and 'sc' in line.lower():
+            parts = line.split()
+            for i, p in enumerate(parts):
+                if re.match(r'^\d+\.?\d*$', p) and i + 1 < len(parts):
+                    area = float(p)
+                    for j in range(i+1, min(i+5, len(parts))):
+                        if re.match(r'^\d+\.?\d*$', parts[j]):
+                            prod = float(parts[j])
+                            if 50 < prod < 250:
+                                prods.append({'safra': safra, 'cultura': cultura, 'talhao': 'TALHAO',
+                                              'area': area, 'prod_sc_ha': prod})
+                            break
+    return prods
+
+def legacy_custos_aplicacao(text, safra, cultura):
+    custos = []
+    for line in text.split('\n'):
+        match = re.match(r'^\s*(\w+(?:\s+\w+)?)\s+(\d{4}/\d{4}|\d{4})\s+([A-ZÁÉÍÓÚ\s]+?)\s+R\$\s+([\d.]+,\d+)\s+', line)
+        if match:
+            valor = float(match.group(4).replace('.', '').replace(',', '.'))
+            valores = re.findall(r'R\$\s+([\d.]+,\d+)', line)
+            custo_ha = 0
+            if len(valores) >= 2:
+                custo_ha = float(valores[-1].replace('.', '').replace(',', '.'))
+            categoria = match.group(1).strip()
+            custos.append({'safra': safra, 'cultura': cultura, 'categoria': categoria, 'item': categoria,
+                           'fazenda': match.group(3).strip(), 'valor': valor, 'custo_ha': custo_ha})
+    return custos
+
+# --- Medição ----------------------------------------------------------------
+
+def lines_per_sec(fn, texts, min_seconds):
+    """Roda fn sobre todos os textos até passar min_seconds; retorna (linhas/s, resultado)."""
+    n_lines = sum(t.count('\n') + 1 for t, _ in texts)
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        result = [fn(t, *args) for t, args in texts]
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return n_lines * runs / elapsed, result
+
+def main():
+    min_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+
+    custos, prods = [], []
+    for path in sorted(glob.glob(os.path.join(PDF_DIR, "*.pdf"))):
+        text = extract_text(path)
+        if not text:
+            continue
+        fp = layouts.detect(text.split("\n"))
+        (prods if fp["layout"] == layouts.PRODUTIVIDADE else custos).append((text, fp))
+
+    if not custos and not prods:
+        print("⚠️ Nenhum texto extraído (pdftotext instalado?)")
+        return
+
+    entry = {"ano_safra": "DESCONHECIDO", "cultura": "SOJA", "filename": "bench.pdf"}
+    cases = [
+        ("extract_scadi.parse_custo_text", custos, (),
+         legacy_custo_text, extract_scadi.parse_custo_text),
+        ("parse_all_data.parse_custos", custos, ("24/25", "SOJA"),
+         legacy_custos_aplicacao, parse_all_data.parse_custos),
+        ("extract_metrics_v2.parse_produtividade", prods, (entry,),
+         legacy_produtividade_v2, extract_metrics_v2.parse_produtividade),
+        ("build_complete_db.parse_produtividade", prods, ("24/25", "SOJA"),
+         legacy_produtividade_complete, build_complete_db.parse_produtividade),
+        # O padrão antigo de parse_all_data.parse_produtividade tem backtracking
+        # exponencial nas linhas longas do -layout: não há "antes" mensurável.
+        ("parse_all_data.parse_produtividade", prods, ("24/25", "SOJA"),
+         None, parse_all_data.parse_produtividade),
+        # Mesmo parser sem e com fingerprint (o último argumento é o fp do arquivo)
+        ("extract_metrics_v2.parse_produtividade (colunas fixas)", prods, (entry, None),
+         extract_metrics_v2.parse_produtividade, extract_metrics_v2.parse_produtividade),
+        ("parse_all_data.parse_custos (colunas fixas)", custos, ("24/25", "SOJA", None),
+         parse_all_data.parse_custos, parse_all_data.parse_custos),
+    ]
+
+    n_custo = sum(t.count('\n') + 1 for t, _ in custos)
+    n_prod = sum(t.count('\n') + 1 for t, _ in prods)
+    print(f"📄 {len(custos)} PDFs de custo ({n_custo} linhas), {len(prods)} de produtividade ({n_prod} linhas)\n")
+    print("| Parser | Antes (linhas/s) | Depois (linhas/s) | Ganho | Registros iguais |")
+    print("|---|---:|---:|---:|---|")
+
+    for name, texts, args, before_fn, after_fn in cases:
+        if not texts:
+            continue
+        fixed = args and args[-1] is None
+        before_texts = [(t, args) for t, _ in texts]
+        after_texts = [(t, args[:-1] + (fp,)) for t, fp in texts] if fixed else before_texts
+        after, after_res = lines_per_sec(after_fn, after_texts, min_seconds)
+        if before_fn is None:
+            print(f"| {name} | — | {after:,.0f} | — | — |")
+            continue
+        before, before_res = lines_per_sec(before_fn, before_texts, min_seconds)
+        if before_res == after_res:
+            same = "✅"
+        elif all(r in a for b, a in zip(before_res, after_res) for r in b):
+            # Colunas fixas pegam linhas que o regex perdia (ex: "MÃO DE OBRA", "SÃO CRISTOVÃO")
+            gained = sum(len(a) - len(b) for b, a in zip(before_res, after_res))
+            same = f"✅ +{gained}"
+        else:
+            same = "❌"
+        print(f"| {name} | {before:,.0f} | {after:,.0f} | {after / before:.2f}x | {same} |")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
-import csv
-import json
 import os
 
+import agrodb
+import profiling
+import tables
+
 # Config
 DATA_DIR = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data"
 OUTPUT_DB = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data/database.json"
+# Carga do AgroDB (scripts/agrodb.py) com as linhas dos CSVs do ETL
+CARGA = "csv"
+
+# Chaves de cada registro no database.json (o banco guarda as linhas completas)
+JSON_FIELDS = {
+    "custos": ["safra", "cultura", "categoria", "item", "valor", "custo_ha"],
+    "produtividade": ["safra", "cultura", "fazenda", "talhao", "variedade", "area", "prod_sc_ha", "total_sc"],
+}
 
 def clean_currency(val):
     if isinstance(val, str):
@@ -44,46 +54,32 @@ def normalize_safra(val, cultura):
     return val
 
 def build_bi_database():
-    print("🏗️ Construindo AgroDB (JSON Relacional)...")
+    print("🏗️ Construindo AgroDB (SQLite + export JSON)...")
     
-    # 1. Carregar Custos
-    custos = []
+    # 1. Carregar Custos (tabelas colunares: números já em float, textos internados)
     try:
-        with open(os.path.join(DATA_DIR, "custos_operacionais.csv"), 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                safra = normalize_safra(row['safra'], row['cultura'])
-                
-                custos.append({
-                    "safra": safra,
-                    "cultura": row['cultura'],
-                    "categoria": row['categoria_macro'],
-                    "item": row['item'],
-                    "valor": float(row['valor_total_brl']),
-                    "custo_ha": float(row['custo_por_ha'])
-                })
+        custos = tables.Table.from_csv(os.path.join(DATA_DIR, "custos_operacionais.csv"), "custos")
+        custos.derive("safra", normalize_safra, "safra", "cultura")
     except Exception as e:
         print(f"Erro custos: {e}")
+        custos = tables.Table("custos")
 
     # 2. Carregar Produtividade
-    produtividade = []
     try:
-        with open(os.path.join(DATA_DIR, "produtividade.csv"), 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                safra = normalize_safra(row['safra'], row['cultura'])
-                produtividade.append({
-                    "safra": safra,
-                    "cultura": row['cultura'],
-                    "fazenda": row['fazenda'],
-                    "talhao": row['talhao'],
-                    "variedade": row['variedade'],
-                    "area": float(row['area_ha']),
-                    "prod_sc_ha": float(row['produtividade_sc_ha']),
-                    "total_sc": float(row['producao_total_sc'])
-                })
+        produtividade = tables.Table.from_csv(os.path.join(DATA_DIR, "produtividade.csv"), "produtividade")
+        produtividade.derive("safra", normalize_safra, "safra", "cultura")
     except Exception as e:
         print(f"Erro produtividade: {e}")
+        produtividade = tables.Table("produtividade")
+
+    # Contratos (extract_metrics.py), se já extraídos
+    try:
+        contratos = tables.read_csv(os.path.join(DATA_DIR, "contratos.csv"), "contratos")
+        if len(contratos):
+            contratos.derive("safra", normalize_safra, "safra", "cultura")
+    except Exception as e:
+        print(f"Erro contratos: {e}")
+        contratos = tables.Table("contratos")
 
     # 3. Consolidar IMEA (Referencia Detalhada)
     imea_refs = [
@@ -99,21 +95,24 @@ def build_bi_database():
         }},
     ]
 
-    # Estrutura Final
-    db = {
-        "custos": custos,
-        "produtividade": produtividade,
-        "referencias": imea_refs,
-        "metadata": {
-            "updated_at": "Today",
-            "version": "3.0"
-        }
-    }
-
-    with open(OUTPUT_DB, "w") as f:
-        json.dump(db, f, ensure_ascii=False)
+    # Carga no SQLite (transação por tabela) e database.json exportado do banco
+    with profiling.stage("write"):
+        conn = agrodb.connect()
+        agrodb.replace_load(conn, "custos_operacionais", CARGA, custos)
+        agrodb.replace_load(conn, "produtividade_real", CARGA, produtividade)
+        agrodb.replace_load(conn, "contratos_venda", CARGA, contratos)
+        agrodb.export_json(conn, OUTPUT_DB, CARGA, fields=JSON_FIELDS, cube=True, columnar_copy=True, shards=True, extra={
+            "referencias": imea_refs,
+            "metadata": {
+                "updated_at": "Today",
+                "version": "3.0"
+            }
+        })
+        conn.close()
     
+    print(f"✅ AgroDB: {len(custos)} custos, {len(produtividade)} produtividades, {len(contratos)} contratos em {agrodb.DB_FILE}")
     print(f"✅ Database gerado com sucesso: {OUTPUT_DB}")
 
 if __name__ == "__main__":
-    build_bi_database()
+    with profiling.run("build_db"):
+        build_bi_database()
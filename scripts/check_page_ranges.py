@@ -0,0 +1,77 @@
+import os
+import sys
+import glob
+
+# Verificação: o parse por intervalos de páginas (um job por página, em
+# paralelo) tem que dar exatamente o mesmo resultado do parse sequencial
+# do PDF inteiro, nos PDFs de data/raw/drive.
+# Nos PDFs incluídos toda página começa com "Lavoura :", então a produtividade
+# também é cortada em CADA linha do texto (dois intervalos sintéticos), para
+# exercitar a lavoura herdada do intervalo anterior.
+#
+# Uso: python3 scripts/check_page_ranges.py [páginas_por_job]
+# Sai com código 1 se algum arquivo divergir.
+
+import layouts
+from extract_metrics_v2 import parse_produtividade, parse_produtividade_range, join_ranges
+from extract_scadi import parse_custo_text
+from pdf_pool import PdfJob, map_pdfs, page_ranges
+from pdf_text import extract_text
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF_DIR = os.path.join(PROJECT_DIR, "data", "raw", "drive")
+
+def check_file(path, pages_per_job):
+    fp = layouts.fingerprint(path)
+    name = os.path.basename(path)
+    ranges = page_ranges(path, pages_per_job)
+    if ranges == [None]:
+        return None, f"⏭️  {name}: 1 intervalo só, nada a comparar"
+
+    if fp["layout"] == layouts.PRODUTIVIDADE:
+        entry = {"ano_safra": "DESCONHECIDO", "cultura": "SOJA", "filename": name}
+        text = extract_text(path, strict=True)
+        sequential = parse_produtividade(text, entry, fp)
+        jobs = [PdfJob(path, parse_produtividade_range, (entry, fp, first), None, (first, last))
+                for first, last in ranges]
+        parallel = join_ranges(result for _, result in map_pdfs(jobs))
+
+        lines = text.split("\n")
+        for cut in range(1, len(lines)):
+            split = join_ranges([parse_produtividade_range(lines[:cut], entry, fp, 1),
+                                 parse_produtividade_range(lines[cut:], entry, fp, 2)])
+            if split != sequential:
+                return False, f"❌ {name}: corte sintético na linha {cut} diverge do parse sequencial"
+    elif fp["layout"] == layouts.CUSTO_CATEGORIA:
+        sequential = parse_custo_text(extract_text(path, strict=True), fp)
+        jobs = [PdfJob(path, parse_custo_text, (fp, first), None, (first, last))
+                for first, last in ranges]
+        parallel = [r for _, records in map_pdfs(jobs) for r in records]
+    else:
+        return None, f"⏭️  {name}: layout {fp['layout']} sem parser"
+
+    ok = sequential == parallel
+    status = "✅" if ok else "❌"
+    return ok, (f"{status} {name}: {len(ranges)} intervalos, "
+                f"{len(sequential)} registros sequencial / {len(parallel)} por intervalo")
+
+def main():
+    pages_per_job = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    results = []
+    for path in sorted(glob.glob(os.path.join(PDF_DIR, "*.pdf"))):
+        ok, msg = check_file(path, pages_per_job)
+        print(msg)
+        if ok is not None:
+            results.append(ok)
+    layouts.save_cache()
+
+    if not results:
+        print("⚠️ Nenhum PDF com mais de um intervalo (pdftotext/pdfinfo instalados?)")
+        return
+    if not all(results):
+        print(f"\n❌ {results.count(False)} de {len(results)} arquivos divergem do parse sequencial")
+        sys.exit(1)
+    print(f"\n✅ {len(results)} arquivos idênticos ao parse sequencial")
+
+if __name__ == "__main__":
+    main()
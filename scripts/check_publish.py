@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+# Verificação do publish_supabase contra o PostgREST falso
+# (scripts/fake_postgrest.py), sem rede:
+#   1. 1ª publicação do data/database.json com latência e toda 7ª escrita
+#      falhando (503): o remoto tem que ficar igual ao build
+#   2. 2ª publicação: nada para enviar
+#   3. uma linha alterada, uma apagada e uma nova: só elas vão
+#   4. remoto mexido por fora (linha apagada e linha alterada): o snapshot
+#      não vê; --full lê o remoto e conserta
+#   5. sem snapshot com o remoto já populado (carga antiga, outros ids): lê o
+#      remoto e apaga as linhas antigas em vez de duplicar
+#   6. a 1ª publicação com 1 worker e com o pool, para comparar linhas/s
+#
+# Uso: python3 scripts/check_publish.py [latência_s]
+# Sai com código 1 se algo divergir.
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_JSON = os.path.join(PROJECT_DIR, "data", "database.json")
+
+def main():
+    delay = sys.argv[1] if len(sys.argv) > 1 else "0.01"
+    tmp = tempfile.mkdtemp(prefix="terra_publish_")
+    os.environ.update({
+        "TERRA_PUBLISH_SNAPSHOT": os.path.join(tmp, "snapshot.json"),
+        "TERRA_PUBLISH_BATCH": "50",
+        "TERRA_PUBLISH_BACKOFF": "0.02",
+        "FAKE_POSTGREST_DELAY": delay,
+        "FAKE_POSTGREST_FAIL_EVERY": "7",
+    })
+    import columnar
+    import fake_postgrest
+    import publish_supabase as pub
+
+    server, store, base = fake_postgrest.serve()
+    ok = True
+
+    def publish(source=DATABASE_JSON, **kw):
+        return pub.publish(source, base_url=base, key="service-key-falsa", **kw)
+
+    def check(label, summary, db, upserted, deleted):
+        nonlocal ok
+        expected = pub.build_rows(db)
+        with store.lock:
+            remote = {t: {rid: {c: r.get(c) for c in list(pub.TABLES[t][1]) + ["id"]} for rid, r in rows.items()}
+                      for t, rows in store.tables.items()}
+        same = all(remote.get(t, {}) == rows for t, rows in expected.items())
+        if not same or summary["upserted"] != upserted or summary["deleted"] != deleted or summary["failed"]:
+            print(f"❌ {label}: remoto igual={same}, {summary}\n")
+            ok = False
+        else:
+            print(f"✅ {label} ({summary['rows_per_s']:.0f} linhas/s, {summary['requests']} requisições, "
+                  f"{summary['connections']} conexões, {summary['retries']} retries)\n")
+
+    try:
+        db = columnar.load(DATABASE_JSON)
+        total = sum(len(rows) for rows in pub.build_rows(db).values())
+        summary = publish()
+        check(f"1ª publicação: {total} linhas, 503 a cada 7 escritas recuperado", summary, db, total, 0)
+        if not summary["retries"]:
+            print("❌ nenhuma falha injetada foi repetida\n")
+            ok = False
+
+        summary = publish()
+        check("2ª publicação: nada para enviar", summary, db, 0, 0)
+
+        # Uma linha alterada, uma apagada e uma nova
+        edited = json.loads(json.dumps(db))
+        edited["custos"][0]["valor"] = edited["custos"][0]["valor"] + 1
+        del edited["contratos"][3]
+        edited["produtividade"].append({**edited["produtividade"][0], "talhao": "TALHAO NOVO"})
+        source = os.path.join(tmp, "database.json")
+        with open(source, "w") as f:
+            json.dump(edited, f, ensure_ascii=False)
+        summary = publish(source)
+        check("1 alterada + 1 apagada + 1 nova: só elas", summary, edited, 2, 1)
+
+        # Mexido por fora: o snapshot acha que está tudo publicado
+        with store.lock:
+            victim = next(iter(store.tables["historico"]))
+            del store.tables["historico"][victim]
+            changed = next(iter(store.tables["custos"].values()))
+            changed["custo_reais"] = -1
+        summary = publish(source)
+        if summary["upserted"] or summary["deleted"]:
+            print(f"❌ sem --full o snapshot deveria esconder a divergência: {summary}\n")
+            ok = False
+        summary = publish(source, full=True)
+        check("remoto divergente: --full conserta só as 2 linhas", summary, edited, 2, 0)
+
+        # Snapshot perdido e remoto com linhas de uma carga antiga (ids de outro formato)
+        os.remove(os.environ["TERRA_PUBLISH_SNAPSHOT"])
+        legacy = 0
+        with store.lock:
+            for rows in store.tables.values():
+                for i, row in enumerate(list(rows.values())[:5]):
+                    rows[f"legado-{i}"] = {**row, "id": f"legado-{i}"}
+                    legacy += 1
+        summary = publish(source)
+        check(f"sem snapshot: {legacy} linhas antigas apagadas, nada duplicado", summary, edited, 0, legacy)
+
+        # 1 worker x pool, sem falhas, a partir do zero
+        fake_postgrest.FAIL_EVERY = 0
+        runs = {}
+        for workers in (1, pub.WORKERS):
+            with store.lock:
+                store.tables.clear()
+            os.remove(os.environ["TERRA_PUBLISH_SNAPSHOT"])
+            runs[workers] = publish(workers=workers)
+        serial, pooled = runs[1], runs[pub.WORKERS]
+        print(f"\n⏱️ 1 worker: {serial['rows_per_s']:.0f} linhas/s ({serial['connections']} conexões) · "
+              f"{pub.WORKERS} workers: {pooled['rows_per_s']:.0f} linhas/s ({pooled['connections']} conexões, "
+              f"{pooled['requests']} requisições) -> {pooled['rows_per_s'] / serial['rows_per_s']:.1f}x")
+    finally:
+        server.shutdown()
+        shutil.rmtree(tmp)
+
+    if not ok:
+        sys.exit(1)
+    print("✅ Publicação OK")
+
+if __name__ == "__main__":
+    main()
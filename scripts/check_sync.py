@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+import shutil
+import filecmp
+import tempfile
+
+# Verificação do sync_drive contra o gog falso (scripts/fake_gog.py), sem rede:
+#   1. árvore SOJA/2024, SOJA/2025, MILHO/2025 com os PDFs de data/raw/drive
+#   2. 1º sync com latência por chamada e a 1ª tentativa de cada download
+#      falhando: tudo tem que chegar igual, sem sobrar .part
+#   3. 2º sync: nada para baixar
+#   4. manifesto: re-export no Drive, arquivo local corrompido e arquivo
+#      movido de pasta mexem só naquele arquivo; sem manifesto, os arquivos
+#      que já estão na pasta são adotados sem download
+#   5. delta pelo feed de mudanças: sem mudança não lista nada; PDF novo
+#      numa pasta nova e funda e PDF apagado mexem só neles, sem `drive ls`;
+#      token expirado cai na varredura completa; download que falhou no delta
+#      volta no delta seguinte (o token não avança)
+#   6. o 1º sync com 1 worker e com o pool, para comparar o tempo
+#
+# Uso: python3 scripts/check_sync.py [latência_s]
+# Sai com código 1 se algo divergir.
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF_DIR = os.path.join(PROJECT_DIR, "data", "raw", "drive")
+FAKE_GOG = os.path.join(PROJECT_DIR, "scripts", "fake_gog.py")
+
+def build_tree(root):
+    pdfs = sorted(f for f in os.listdir(PDF_DIR) if f.lower().endswith(".pdf"))
+    folders = ["SOJA/2024", "SOJA/2025", "MILHO/2025"]
+    for i, name in enumerate(pdfs):
+        folder = os.path.join(root, folders[i % len(folders)])
+        os.makedirs(folder, exist_ok=True)
+        shutil.copy(os.path.join(PDF_DIR, name), folder)
+    return len(pdfs)
+
+def same_tree(a, b):
+    """Mesmos arquivos (e conteúdo) nas duas árvores; sem temporários sobrando."""
+    for dirpath, _, filenames in os.walk(a):
+        for name in filenames:
+            other = os.path.join(b, os.path.relpath(os.path.join(dirpath, name), a))
+            if not os.path.exists(other) or not filecmp.cmp(os.path.join(dirpath, name), other, shallow=False):
+                return False, f"{other} ausente ou diferente"
+    for dirpath, _, filenames in os.walk(b):
+        for name in filenames:
+            if name.endswith(".part"):
+                return False, f"temporário sobrando: {name}"
+    return True, None
+
+def main():
+    delay = sys.argv[1] if len(sys.argv) > 1 else "0.2"
+    tmp = tempfile.mkdtemp(prefix="terra_sync_")
+    remote = os.path.join(tmp, "drive")
+    n = build_tree(remote)
+
+    os.environ.update({
+        "GOG_BIN": FAKE_GOG,
+        "FAKE_GOG_ROOT": remote,
+        "FAKE_GOG_DELAY": delay,
+        "FAKE_GOG_FAIL": "1",
+        "FAKE_GOG_STATE": os.path.join(tmp, "state"),
+        "FAKE_GOG_LOG": os.path.join(tmp, "gog.log"),
+        "FAKE_GOG_PAGE_SIZE": "2",
+        "TERRA_SYNC_BACKOFF": "0.05",
+    })
+    import sync_drive
+
+    ok = True
+
+    def listings():
+        """Nº de `drive ls` desde a última chamada (zera o log)."""
+        log = os.environ["FAKE_GOG_LOG"]
+        if not os.path.exists(log):
+            return 0
+        with open(log) as f:
+            n = sum(1 for line in f if line.startswith("drive ls"))
+        os.remove(log)
+        return n
+
+    def check(label, summary, changed, downloaded=None):
+        nonlocal ok
+        same, why = same_tree(remote, local)
+        expected = len(changed) if downloaded is None else downloaded
+        if not same or summary["changed"] != sorted(changed) or len(summary["downloaded"]) != expected \
+                or summary["failed"]:
+            print(f"❌ {label}: {why or summary}\n")
+            ok = False
+        else:
+            print(f"✅ {label} ({summary['seconds']:.2f}s)\n")
+
+    try:
+        local = os.path.join(tmp, "fazenda")
+        manifest = os.path.join(tmp, "manifest.json")
+        summary = sync_drive.sync_folder("root", local, manifest_path=manifest)
+        everything = [os.path.join(local, os.path.relpath(os.path.join(d, f), remote))
+                      for d, _, fs in os.walk(remote) for f in fs]
+        check(f"1º sync: {n} PDFs iguais ao remoto, 1 falha por arquivo recuperada", summary, everything)
+
+        summary = sync_drive.sync_folder("root", local, manifest_path=manifest)
+        check("2º sync: nada para baixar", summary, [])
+
+        # Re-export com o mesmo nome (conteúdo novo)
+        rel = os.path.relpath(everything[0], local)
+        with open(os.path.join(remote, rel), "ab") as f:
+            f.write(b"\n% re-export\n")
+        summary = sync_drive.sync_folder("root", local, manifest_path=manifest)
+        check(f"re-export de {os.path.basename(rel)[:40]}: só ele baixado", summary, [everything[0]])
+
+        # Arquivo local corrompido (tamanho muda)
+        with open(everything[1], "r+b") as f:
+            f.truncate(100)
+        summary = sync_drive.sync_folder("root", local, manifest_path=manifest)
+        check("arquivo local corrompido: baixado de novo", summary, [everything[1]])
+
+        # Movido de pasta no Drive (mesmo id): o arquivo local vai junto, sem download
+        dst_rel = os.path.join("MILHO", "2026", os.path.basename(rel))
+        os.makedirs(os.path.join(remote, "MILHO", "2026"))
+        shutil.move(os.path.join(remote, rel), os.path.join(remote, dst_rel))
+        summary = sync_drive.sync_folder("root", local, manifest_path=manifest)
+        check("arquivo movido de pasta no Drive: movido local, sem download",
+              summary, [os.path.join(local, dst_rel)], downloaded=0)
+
+        # Delta: sem mudança no Drive, nenhuma pasta listada
+        listings()
+        summary = sync_drive.sync_changes("root", local, manifest_path=manifest)
+        check("delta sem mudanças: nada para baixar", summary, [])
+        if summary["mode"] != "delta" or listings():
+            print(f"❌ delta sem mudanças listou pastas ({summary['mode']})\n")
+            ok = False
+
+        # PDF novo numa pasta nova, 3 níveis abaixo (pasta e arquivo chegam no mesmo delta)
+        new_rel = os.path.join("MILHO", "2026", "SAFRINHA", "TALHAO 7", "novo.pdf")
+        os.makedirs(os.path.dirname(os.path.join(remote, new_rel)))
+        shutil.copy(os.path.join(remote, dst_rel), os.path.join(remote, new_rel))
+        summary = sync_drive.sync_changes("root", local, manifest_path=manifest)
+        check("delta: PDF novo em pasta nova funda, só ele baixado", summary, [os.path.join(local, new_rel)])
+        if summary["mode"] != "delta" or listings():
+            print("❌ delta com PDF novo listou pastas\n")
+            ok = False
+
+        # Apagado no Drive: sai do manifesto (o arquivo local fica)
+        gone = os.path.relpath(everything[2], local)
+        os.remove(os.path.join(remote, gone))
+        summary = sync_drive.sync_changes("root", local, manifest_path=manifest)
+        check("delta: PDF apagado no Drive", summary, [])
+        if summary["removed"] != [everything[2]]:
+            print(f"❌ delta: removido esperado {gone}, veio {summary['removed']}\n")
+            ok = False
+        shutil.copy(everything[2], os.path.join(remote, gone))
+
+        # Token expirado: varredura completa (o PDF devolvido ao Drive é adotado pelo md5)
+        shutil.rmtree(os.path.join(tmp, "state", "changes"))
+        summary = sync_drive.sync_changes("root", local, manifest_path=manifest)
+        check("delta com token expirado: varredura completa", summary, [])
+        if summary["mode"] != "varredura" or not listings():
+            print("❌ token expirado não caiu na varredura\n")
+            ok = False
+
+        # Delta com todos os downloads falhando: o token não avança e o próximo delta baixa
+        failing = [os.path.join("SOJA", "2025", f"falha{i}.pdf") for i in (1, 2)]
+        sources = sorted(f for f in os.listdir(PDF_DIR) if f.lower().endswith(".pdf"))
+        for i, rel_new in enumerate(failing):
+            with open(os.path.join(PDF_DIR, sources[i]), "rb") as src, open(os.path.join(remote, rel_new), "wb") as f:
+                f.write(src.read() + f"\n% falha {i}\n".encode())
+        os.environ["FAKE_GOG_FAIL"] = "99"
+        summary = sync_drive.sync_changes("root", local, manifest_path=manifest)
+        if len(summary["failed"]) != 2 or summary["downloaded"]:
+            print(f"❌ delta com falhas: esperadas 2 falhas, veio {summary['failed']}\n")
+            ok = False
+        os.environ["FAKE_GOG_FAIL"] = "1"
+        summary = sync_drive.sync_changes("root", local, manifest_path=manifest)
+        check("delta depois de falha: os 2 PDFs que falharam são baixados", summary,
+              [os.path.join(local, r) for r in failing])
+        if summary["mode"] != "delta":
+            print(f"❌ retry das falhas não foi pelo delta ({summary['mode']})\n")
+            ok = False
+
+        # Sem manifesto: tudo já está na pasta, md5 confere -> adota sem baixar
+        os.remove(manifest)
+        summary = sync_drive.sync_folder("root", local, manifest_path=manifest)
+        check("sem manifesto: arquivos existentes adotados pelo md5", summary, [])
+
+        shutil.rmtree(os.path.join(tmp, "state"))
+        start = time.perf_counter()
+        sync_drive.sync_folder("root", os.path.join(tmp, "serial"), workers=1,
+                               manifest_path=os.path.join(tmp, "serial.json"))
+        serial = time.perf_counter() - start
+        shutil.rmtree(os.path.join(tmp, "state"))
+        start = time.perf_counter()
+        sync_drive.sync_folder("root", os.path.join(tmp, "parallel"),
+                               manifest_path=os.path.join(tmp, "parallel.json"))
+        parallel = time.perf_counter() - start
+        print(f"\n⏱️ 1 worker: {serial:.2f}s · {sync_drive.WORKERS} workers: {parallel:.2f}s "
+              f"({serial / parallel:.1f}x)")
+    finally:
+        shutil.rmtree(tmp)
+
+    if not ok:
+        sys.exit(1)
+    print("✅ Sync OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import subprocess
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Exportação colunar do database.json.
+#
+# No formato de linhas cada registro repete as chaves ("cultura", "safra",
+# "fazenda", ...) e os mesmos valores de texto. Aqui cada seção (custos,
+# produtividade, contratos) vira uma tabela coluna a coluna:
+#   {"n": nº de linhas, "columns": {nome: coluna}}
+# e cada coluna é uma de:
+#   {"t": "dict", "dict": [valores distintos], "codes": [índice por linha]}
+#       texto repetido (fazenda, variedade, categoria, comprador, cultura, safra...)
+#   {"t": "num", "values": [números]}
+#   {"t": "raw", "values": [valores]}   texto quase único ou tipos misturados
+# Chave ausente na linha = código -1 / null (o decoder não recria a chave).
+# As demais chaves do database.json (referencias, metadata, cube) passam iguais.
+#
+# Ao lado do .col.json saem .gz e .br pré-comprimidos (para servidor estático
+# com gzip_static/brotli_static); o .br precisa do módulo brotli ou do CLI
+# `brotli` e é pulado sem eles.
+#
+# decode() devolve o dict com as linhas, igual ao database.json; o index.html
+# tem o mesmo decoder em JS (decodeColumnar).
+#
+# Uso: python3 scripts/columnar.py [database.json]   (exporta e compara tamanho/parse)
+
+FORMAT = "terra-columnar"
+VERSION = 1
+SECTIONS = ("custos", "produtividade", "contratos")
+# Texto vira dicionário quando os distintos são no máximo esta fração das linhas
+DICT_RATIO = 0.5
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+def _is_num(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def _encode_column(values):
+    present = [v for v in values if v is not None]
+    if present and all(_is_num(v) for v in present):
+        return {"t": "num", "values": values}
+    if present and all(isinstance(v, str) for v in present):
+        distinct = {}
+        for v in present:
+            distinct.setdefault(v, len(distinct))
+        if len(distinct) <= max(1, len(values) * DICT_RATIO):
+            return {"t": "dict", "dict": list(distinct),
+                    "codes": [-1 if v is None else distinct[v] for v in values]}
+    return {"t": "raw", "values": values}
+
+def encode_table(rows):
+    """Lista de dicts -> tabela colunar."""
+    names = {}
+    for r in rows:
+        for k in r:
+            names.setdefault(k, None)
+    missing = object()
+    columns = {}
+    for name in names:
+        values = [r.get(name, missing) for r in rows]
+        # None explícito e chave ausente saem iguais (o decoder omite a chave)
+        columns[name] = _encode_column([None if v is missing else v for v in values])
+    return {"n": len(rows), "columns": columns}
+
+def decode_table(table):
+    """Tabela colunar -> lista de dicts."""
+    n = table["n"]
+    rows = [{} for _ in range(n)]
+    for name, col in table["columns"].items():
+        if col["t"] == "dict":
+            values = col["dict"]
+            for r, code in zip(rows, col["codes"]):
+                if code >= 0:
+                    r[name] = values[code]
+        else:
+            for r, v in zip(rows, col["values"]):
+                if v is not None:
+                    r[name] = v
+    return rows
+
+def encode(db):
+    """database.json (linhas) -> documento colunar."""
+    doc = {"format": FORMAT, "version": VERSION, "tables": {}}
+    for key, value in db.items():
+        if key in SECTIONS and isinstance(value, list):
+            doc["tables"][key] = encode_table(value)
+        else:
+            doc[key] = value
+    return doc
+
+def decode(doc):
+    """Documento colunar -> dict no formato do database.json (linhas)."""
+    if doc.get("format") != FORMAT:
+        return doc  # já está em linhas
+    db = {}
+    for key, value in doc.items():
+        if key == "tables":
+            for section, table in value.items():
+                db[section] = decode_table(table)
+        elif key not in ("format", "version"):
+            db[key] = value
+    return db
+
+def load(path):
+    """Lê database.json ou .col.json (também .gz) e devolve as linhas."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return decode(json.load(f))
+
+def _brotli_bytes(data):
+    if brotli is not None:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if shutil.which("brotli"):
+        return subprocess.run(["brotli", "-c", f"-q{BROTLI_QUALITY}"], input=data,
+                              capture_output=True, check=True).stdout
+    return None
+
+def write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def write_compressed(path, data):
+    """path + .gz/.br com `data` (bytes). Retorna {sufixo: bytes}."""
+    sizes = {}
+    # mtime=0: mesmo conteúdo gera o mesmo .gz (não muda à toa no git)
+    write_atomic(path + ".gz", gzip.compress(data, GZIP_LEVEL, mtime=0))
+    sizes[".gz"] = os.path.getsize(path + ".gz")
+    br = _brotli_bytes(data)
+    if br is not None:
+        write_atomic(path + ".br", br)
+        sizes[".br"] = len(br)
+    return sizes
+
+def col_path(path):
+    """data/database.json -> data/database.col.json"""
+    root, ext = os.path.splitext(path)
+    return root + ".col" + ext
+
+def write_export(db, path):
+    """Grava o documento colunar em `path` (+ .gz/.br). Retorna {arquivo: bytes}."""
+    data = json.dumps(encode(db), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    write_atomic(path, data)
+    sizes = {path: len(data)}
+    for suffix, size in write_compressed(path, data).items():
+        sizes[path + suffix] = size
+    return sizes
+
+def _parse_ms(data, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(data)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def report(path):
+    """Compara o database.json em linhas com a exportação colunar."""
+    with open(path, "rb") as f:
+        rows_data = f.read()
+    db = json.loads(rows_data)
+    out = col_path(path)
+    sizes = write_export(db, out)
+    with open(out, "rb") as f:
+        col_data = f.read()
+
+    if decode(json.loads(col_data)) != json.loads(json.dumps(db)):
+        print("❌ decode(encode(db)) diferente do original")
+        sys.exit(1)
+
+    def fmt(n):
+        return f"{n / 1024:.1f} KB"
+
+    br_rows = _brotli_bytes(rows_data)
+    print(f"📦 {os.path.basename(path)} (linhas) vs {os.path.basename(out)} (colunar)")
+    print(f"   bruto:  {fmt(len(rows_data)):>10} -> {fmt(len(col_data)):>10}")
+    print(f"   gzip:   {fmt(len(gzip.compress(rows_data, GZIP_LEVEL))):>10} -> {fmt(sizes[out + '.gz']):>10}")
+    if br_rows is not None:
+        print(f"   brotli: {fmt(len(br_rows)):>10} -> {fmt(sizes[out + '.br']):>10}")
+    else:
+        print("   brotli: (sem módulo brotli nem CLI `brotli`, .br não gerado)")
+
+    decode_best = float("inf")
+    parsed = json.loads(col_data)
+    for _ in range(20):
+        start = time.perf_counter()
+        decode(parsed)
+        decode_best = min(decode_best, time.perf_counter() - start)
+    print(f"   parse:  {_parse_ms(rows_data):.2f} ms -> {_parse_ms(col_data):.2f} ms "
+          f"(+ {decode_best * 1000:.2f} ms para voltar a linhas)")
+    print(f"✅ {out} ({', '.join(os.path.basename(p) for p in sizes)})")
+
+if __name__ == "__main__":
+    report(sys.argv[1] if len(sys.argv) > 1 else "data/database.json")
@@ -0,0 +1,113 @@
+import re
+import sys
+import json
+import time
+from itertools import product
+from collections import defaultdict
+
+# Cubo de agregados dos KPIs do dashboard, calculado no build e enviado no
+# database.json (chave "cube"). O index.html lê somas/contagens por chave em
+# vez de refazer .filter()/.reduce() sobre as linhas a cada troca de filtro.
+#
+# Dimensões (a mesma chave que os filtros da página montam):
+#   prod       cultura × safra × fazenda               -> n, area, total_sc
+#   custos     cultura × safra × fazenda × categoria   -> n, valor
+#   contratos  cultura × safra                         -> n, quantidade_sc, valor_total_liquido, receita, valor_saco
+# Chave = valores unidos por "|", com "*" no lugar da dimensão somada
+# (ex.: "SOJA|2024/2025|*" = todas as fazendas). Cada linha soma em 2^k
+# células (k fixo), então o build é linear no nº de linhas.
+#
+# A safra entra normalizada como na página (normSafra: "24/25" -> "2024/2025",
+# "2023.2024" -> "2023/2024"); categoria é o rótulo do gráfico de custos
+# (item, senão categoria). O index.html tem o mesmo cálculo em JS (buildCube)
+# para quando os dados vêm do Supabase.
+#
+# Uso: python3 scripts/cube.py [database.json]   (mede o build com o banco replicado 1x/10x/100x)
+
+CUBE_VERSION = 1
+ALL = "*"
+SEP = "|"
+
+DIMS = {
+    "prod": ("cultura", "safra", "fazenda"),
+    "custos": ("cultura", "safra", "fazenda", "categoria"),
+    "contratos": ("cultura", "safra"),
+}
+MEASURES = {
+    "prod": ("area", "total_sc"),
+    "custos": ("valor",),
+    "contratos": ("quantidade_sc", "valor_total_liquido", "receita", "valor_saco"),
+}
+SECTIONS = {"prod": "produtividade", "custos": "custos", "contratos": "contratos"}
+
+RE_SAFRA_CURTA = re.compile(r"^(\d{2})/(\d{2})$")
+
+def norm_safra(safra):
+    """Mesma normalização do index.html (normSafra)."""
+    if not safra:
+        return safra
+    match = RE_SAFRA_CURTA.match(safra)
+    if match:
+        return f"20{match.group(1)}/20{match.group(2)}"
+    return safra.replace(".", "/", 1)
+
+def _num(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _coords(section, r):
+    coords = {"cultura": r.get("cultura"), "safra": norm_safra(r.get("safra")), "fazenda": r.get("fazenda")}
+    if section == "custos":
+        coords["categoria"] = r.get("item") or r.get("categoria") or r.get("aplicacao") or "OUTROS"
+    return [str(coords[d]) if coords[d] is not None else "" for d in DIMS[section]]
+
+def _measures(section, r):
+    if section == "prod":
+        area = _num(r.get("area"))
+        total_sc = _num(r["total_sc"]) if r.get("total_sc") is not None else _num(r.get("prod_sc_ha")) * area
+        return (area, total_sc)
+    if section == "custos":
+        return (_num(r.get("valor")),)
+    liquido = _num(r.get("valor_total_liquido"))
+    return (_num(r.get("quantidade_sc")), liquido, liquido or _num(r.get("valor_total_bruto")), _num(r.get("valor_saco")))
+
+def cube_key(*values):
+    """Chave da célula; None/"" vira "*" (dimensão somada)."""
+    return SEP.join(ALL if v in (None, "") else str(v) for v in values)
+
+def build_cube(db):
+    """Cubo {seção: {chave: {n, medidas...}}} a partir do dict do database.json."""
+    cube = {"version": CUBE_VERSION, "dims": {s: list(d) for s, d in DIMS.items()}}
+    for section, dims in DIMS.items():
+        names = MEASURES[section]
+        cells = defaultdict(lambda: [0] + [0.0] * len(names))
+        # Cada linha soma na própria célula e em todos os rollups ("*" em qualquer subconjunto)
+        masks = list(product((False, True), repeat=len(dims)))
+        for r in db.get(SECTIONS[section]) or []:
+            coords = _coords(section, r)
+            values = _measures(section, r)
+            for mask in masks:
+                cell = cells[SEP.join(ALL if rolled else c for c, rolled in zip(coords, mask))]
+                cell[0] += 1
+                for i, v in enumerate(values, 1):
+                    cell[i] += v
+        cube[section] = {key: dict(zip(("n",) + names, [c[0]] + [round(v, 4) for v in c[1:]]))
+                         for key, c in sorted(cells.items())}
+    return cube
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/database.json"
+    with open(path, "r") as f:
+        db = json.load(f)
+    # Mesmo banco replicado 1x/10x/100x: o tempo por linha tem que ficar estável (build linear)
+    for factor in (1, 10, 100):
+        big = {s: (db.get(s) or []) * factor for s in SECTIONS.values()}
+        rows = sum(len(v) for v in big.values())
+        start = time.perf_counter()
+        cube = build_cube(big)
+        elapsed = time.perf_counter() - start
+        cells = sum(len(cube[s]) for s in DIMS)
+        print(f"✅ {factor:>3}x: {rows} linhas -> {cells} células em {elapsed * 1000:.1f} ms "
+              f"({elapsed / max(rows, 1) * 1e6:.1f} µs/linha, {len(json.dumps(cube, ensure_ascii=False)) / 1024:.0f} KB)")
@@ -16,9 +16,9 @@ cd $PROJECT_DIR
 echo "Step 1: Syncing from Drive..."
 python3 scripts/sync_drive.py
 
-# 2. Re-indexar Arquivos Locais
+# 2. Re-indexar Arquivos Locais (só o que o sync baixou/moveu é re-hasheado)
 echo "Step 2: Indexing Files..."
-python3 scripts/index_files.py
+python3 scripts/index_files.py --changed data/drive_changes.txt
 
 # 3. Extrair Métricas (ETL)
 echo "Step 3: Extracting Metrics..."
@@ -29,9 +29,16 @@ python3 scripts/extract_metrics_v2.py
 echo "Step 4: Building Database..."
 python3 scripts/build_db.py
 
-# 5. Publicar no GitHub
-echo "Step 5: Deploying..."
+# 5. Publicar no Supabase (só as linhas que mudaram desde a última publicação)
+echo "Step 5: Publishing to Supabase..."
+python3 scripts/publish_supabase.py
+
+# 6. Publicar no GitHub
+echo "Step 6: Deploying..."
 git add data/
+# Saídas do build_db ficam fora do git nos commits de código (.gitignore); só o deploy as publica
+git add -f 'data/database.col.json*'
+git add -f data/shards
 git commit -m "chore(auto): Daily update $(date +%Y-%m-%d)"
 git push origin master
 
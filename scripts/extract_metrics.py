@@ -2,7 +2,9 @@ import os
 import json
 import re
 import csv
-import subprocess
+
+from pdf_text import extract_text
+import profiling
 
 # Config
 DATA_DIR = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data"
@@ -10,13 +12,6 @@ INDEX_FILE = os.path.join(DATA_DIR, "file_index.json")
 PROD_DB_FILE = os.path.join(DATA_DIR, "produtividade.csv")
 CONTRACT_DB_FILE = os.path.join(DATA_DIR, "contratos.csv")
 
-def extract_text_from_pdf(pdf_path):
-    try:
-        result = subprocess.run(["pdftotext", "-layout", pdf_path, "-"], capture_output=True, text=True, check=True)
-        return result.stdout
-    except Exception:
-        return ""
-
 def parse_currency(val):
     if not val: return 0.0
     return float(val.replace("R$", "").replace(".", "").replace(",", ".").strip())
@@ -33,17 +28,22 @@ def extract_productivity():
     
     for entry in index['files']:
         if entry['tipo'] == "PRODUTIVIDADE":
-            text = extract_text_from_pdf(entry['path'])
+            profiling.begin_file(entry['path'])
+            with profiling.stage("decode"):
+                text = extract_text(entry['path'])
             # Regex simples para capturar linhas de talhão:
             # Ex: 1 CR  S NEO 810  231,91  231,91 100,00  ...
             # Padrão: Nome Talhão (Texto/Num) + Variedade (Texto) + Area (Num)
             
             lines = text.split('\n')
+            start = len(data)
             for line in lines:
                 # Heurística: Linha que tem numeros decimais e parece ser um talhão
                 if re.search(r'\d+,\d{2}\s+\d+,\d{2}', line) and not "Total" in line:
                     parts = re.split(r'\s{2,}', line.strip())
-                    if len(parts) >= 4:
+                    if len(parts) < 4:
+                        profiling.reject("produtividade/v1", line, "menos de 4 colunas")
+                    else:
                         try:
                             # Tentativa de mapeamento posicional (frágil, mas funcional para v1)
                             talhao = parts[0]
@@ -62,11 +62,13 @@ def extract_productivity():
                                 "area_ha": area,
                                 "produtividade_sc_ha": prod_sc_ha
                             })
-                        except:
-                            continue
+                            profiling.accept("produtividade/v1")
+                        except (ValueError, IndexError) as e:
+                            profiling.reject("produtividade/v1", line, e)
+            profiling.add_file(profiling.end_file(), records=len(data) - start)
 
     if data:
-        with open(PROD_DB_FILE, 'w') as f:
+        with profiling.stage("write"), open(PROD_DB_FILE, 'w') as f:
             writer = csv.DictWriter(f, fieldnames=data[0].keys())
             writer.writeheader()
             writer.writerows(data)
@@ -80,7 +82,10 @@ def extract_contracts():
     
     for entry in index['files']:
         if entry['tipo'] == "CONTRATO":
-            text = extract_text_from_pdf(entry['path'])
+            profiling.begin_file(entry['path'])
+            with profiling.stage("decode"):
+                text = extract_text(entry['path'])
+            start = len(data)
             # Ex: 509  CARGILL AGRICOLA S A  Milho  20/01/2026  60.000,00  R$ 41,04  R$ 2.462.500,00
             
             lines = text.split('\n')
@@ -105,15 +110,20 @@ def extract_contracts():
                                 "vencimento": vencimento,
                                 "valor_total": valor_total
                             })
-                        except:
-                            continue
+                            profiling.accept("contrato/v1")
+                        except (ValueError, IndexError) as e:
+                            profiling.reject("contrato/v1", line, e)
+                    else:
+                        profiling.reject("contrato/v1", line, "menos de 5 colunas")
+            profiling.add_file(profiling.end_file(), records=len(data) - start)
     if data:
-        with open(CONTRACT_DB_FILE, 'w') as f:
+        with profiling.stage("write"), open(CONTRACT_DB_FILE, 'w') as f:
             writer = csv.DictWriter(f, fieldnames=data[0].keys())
             writer.writeheader()
             writer.writerows(data)
         print(f"✅ {len(data)} contratos salvos.")
 
 if __name__ == "__main__":
-    extract_productivity()
-    extract_contracts()
+    with profiling.run("extract_metrics"):
+        extract_productivity()
+        extract_contracts()
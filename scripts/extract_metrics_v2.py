@@ -1,8 +1,14 @@
 import os
-import json
-import re
-import csv
-import subprocess
+
+from incremental import (
+    load_index, save_index, pending_entries, set_status, merge_csv, source_key, index_keys,
+    STATUS_EXTRACTED, STATUS_LOADED, STATUS_FAILED,
+)
+from pdf_pool import PdfJob, map_pdfs, page_ranges
+from pdf_text import as_lines
+from scadi_patterns import lavoura_name, produtividade_cols, LAVOURA, ROW
+import layouts
+import profiling
 
 # Config
 DATA_DIR = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data"
@@ -10,83 +16,186 @@ INDEX_FILE = os.path.join(DATA_DIR, "file_index.json")
 PROD_DB_FILE = os.path.join(DATA_DIR, "produtividade.csv")
 CONTRACT_DB_FILE = os.path.join(DATA_DIR, "contratos.csv")
 
-def extract_text_from_pdf(pdf_path):
-    try:
-        result = subprocess.run(["pdftotext", "-layout", pdf_path, "-"], capture_output=True, text=True, check=True)
-        return result.stdout
-    except Exception:
-        return ""
+# Subir a versão quando parse_produtividade mudar força o reprocessamento
+# (/3: arquivo_origem passou a ser o caminho relativo, incremental.source_key)
+PARSER_VERSION = "produtividade/3"
+
+# Lavoura desconhecida no início de um intervalo de páginas (vem do intervalo anterior)
+LAVOURA_ANTERIOR = None
 
 def parse_decimal(val):
     if not val: return 0.0
     return float(val.replace(".", "").replace(",", ".").strip())
 
-def extract_productivity():
-    with open(INDEX_FILE, "r") as f: index = json.load(f)
+def parse_produtividade(text, entry, fp=None):
+    """
+    Parse do relatório 'Acompanhamento da Colheita' (roda no worker).
+    Com o fingerprint do layout as linhas de talhão já vêm fatiadas nas
+    colunas fixas do -layout; sem ele (ou se a linha não couber) cai no split.
+    """
+    return _parse_produtividade(text, entry, fp, "DESCONHECIDA")[0]
+
+def parse_produtividade_range(text, entry, fp=None, first_page=1):
+    """
+    Parse de um intervalo de páginas do PDF (roda no worker).
+    Retorna (registros, lavoura no fim do intervalo). Os talhões antes do
+    primeiro 'Lavoura :' do intervalo pertencem à lavoura do intervalo
+    anterior: saem com fazenda None e join_ranges completa.
+    """
+    if first_page <= 1:
+        return _parse_produtividade(text, entry, fp, "DESCONHECIDA")
+    return _parse_produtividade(text, entry, fp, LAVOURA_ANTERIOR, partial=True)
+
+def join_ranges(results):
+    """
+    Junta os (registros, lavoura final) dos intervalos, na ordem das páginas,
+    levando a lavoura corrente de um intervalo para o próximo: mesmo
+    resultado do parse sequencial do arquivo inteiro.
+    """
+    data = []
+    current_lavoura = "DESCONHECIDA"
+    for records, last_lavoura in results:
+        for record in records:
+            if record["fazenda"] is LAVOURA_ANTERIOR:
+                record["fazenda"] = current_lavoura
+        data.extend(records)
+        if last_lavoura is not LAVOURA_ANTERIOR:
+            current_lavoura = last_lavoura
+    return data
+
+def _parse_produtividade(text, entry, fp, current_lavoura, partial=False):
+    data = []
+    lines = as_lines(text)
+    
+    for kind, value in layouts.iter_cells(lines, fp, partial):
+        # Detecta Lavoura (Ex: Lavoura : 010 - SOJA - FAZENDA CRISTALINA)
+        if kind == LAVOURA:
+            current_lavoura = lavoura_name(value) or current_lavoura # Ex: FAZENDA CRISTALINA
+            continue
+
+        # Linha de dados (Ex: 1 CR  S NEO 810  231,91 ...)
+        # Totais/cabeçalhos já saem pelo classificador; sem colunas fixas a
+        # linha precisa ter números com vírgula no meio e várias colunas
+        if kind == ROW:
+            # Colunas fixas: talhão, variedade, área, produção líq. (sc), produt. líq. (sc/ha)
+            parts = value
+            pattern = "produtividade/colunas"
+        else:
+            parts = produtividade_cols(value)
+            pattern = "produtividade/regex"
+            if parts:
+                # Mapeamento baseado no layout visualizado:
+                # a produtividade liquida (sc/ha) é a última coluna e a produção
+                # total liquida (sc) é a antepenúltima (3a de tras pra frente)
+                parts = (parts[0], parts[1], parts[2], parts[-3], parts[-1])
+            else:
+                profiling.reject(pattern, value, "sem colunas numéricas")
+
+        if parts:
+            try:
+                talhao, variedade, area_str, total_str, prod_str = parts
+                area_plantada = parse_decimal(area_str)
+                prod_sc_ha_liq = parse_decimal(prod_str)
+                prod_total_sc = parse_decimal(total_str)
+
+                data.append({
+                    "safra": entry['ano_safra'] if entry['ano_safra'] != "DESCONHECIDO" else "24/25",
+                    "cultura": entry['cultura'],
+                    "fazenda": current_lavoura,
+                    "talhao": talhao,
+                    "variedade": variedade,
+                    "area_ha": area_plantada,
+                    "produtividade_sc_ha": prod_sc_ha_liq,
+                    "producao_total_sc": prod_total_sc,
+                    "arquivo_origem": entry['filename']
+                })
+                profiling.accept(pattern)
+            except Exception as e:
+                profiling.reject(pattern, value if kind is None else "  ".join(value), e)
+    return data, current_lavoura
+
+def is_produtividade(entry):
+    return layouts.layout_of(entry) == layouts.PRODUTIVIDADE
+
+def extract_productivity(executor=None):
+    index = load_index(INDEX_FILE)
+    total = sum(1 for entry in index['files'] if is_produtividade(entry))
+    pending = pending_entries(index, is_produtividade, PARSER_VERSION)
+    
+    # Linhas de PDFs que saíram do índice (apagados/movidos) saem do CSV
+    keep = index_keys(index)
+    if not pending:
+        with profiling.stage("write"):
+            _, purged = merge_csv(PROD_DB_FILE, [], set(), keep=keep)
+        if purged:
+            print(f"🗑️ {purged} linhas de arquivos removidos do índice apagadas de {PROD_DB_FILE}")
+        print(f"✅ Nenhum relatório de produtividade novo ou alterado ({total} já carregados).")
+        return
+    
     data = []
+    sources = set()
+    by_path = {entry['path']: entry for entry in pending}
+    failed = set()
     
-    print("🚜 Extraindo Produtividade (Regex Avançado)...")
+    print(f"🚜 Extraindo Produtividade (Regex Avançado) - {len(pending)} de {total} arquivos...")
     
-    for entry in index['files']:
-        if entry['tipo'] == "PRODUTIVIDADE":
-            print(f"   ↳ Lendo: {entry['filename']}")
-            text = extract_text_from_pdf(entry['path'])
-            lines = text.split('\n')
-            
-            current_lavoura = "DESCONHECIDA"
-            
-            for line in lines:
-                # Detecta Lavoura (Ex: Lavoura : 010 - SOJA - FAZENDA CRISTALINA)
-                if "Lavoura :" in line:
-                    match = re.search(r'Lavoura\s*:\s*\d+\s*-\s*([^-]+)\s*-\s*(.+)', line)
-                    if match:
-                        current_lavoura = match.group(2).strip() # Ex: FAZENDA CRISTALINA
-                    continue
-
-                # Detecta linha de dados (Ex: 1 CR  S NEO 810  231,91 ...)
-                # Regex: Começa com algo que não é espaço, tem numeros com virgula no meio
-                if re.search(r'\d+,\d{2}\s+\d+,\d{2}', line) and "Totais" not in line and "Talhão" not in line:
-                    parts = re.split(r'\s{2,}', line.strip())
-                    
-                    if len(parts) >= 8: # Precisa ter várias colunas
-                        try:
-                            # Mapeamento baseado no layout visualizado
-                            talhao = parts[0]
-                            variedade = parts[1]
-                            area_plantada = parse_decimal(parts[2])
-                            
-                            # A produtividade liquida (sc/ha) é a última coluna
-                            prod_sc_ha_liq = parse_decimal(parts[-1])
-                            
-                            # A produção total liquida (sc) é a antepenúltima (3a de tras pra frente)
-                            prod_total_sc = parse_decimal(parts[-3])
-
-                            data.append({
-                                "safra": entry['ano_safra'] if entry['ano_safra'] != "DESCONHECIDO" else "24/25",
-                                "cultura": entry['cultura'],
-                                "fazenda": current_lavoura,
-                                "talhao": talhao,
-                                "variedade": variedade,
-                                "area_ha": area_plantada,
-                                "produtividade_sc_ha": prod_sc_ha_liq,
-                                "producao_total_sc": prod_total_sc
-                            })
-                        except Exception as e:
-                            # print(f"Erro parse linha: {line} -> {e}")
-                            continue
-
-    if data:
-        with open(PROD_DB_FILE, 'w') as f:
-            writer = csv.DictWriter(f, fieldnames=data[0].keys())
-            writer.writeheader()
-            writer.writerows(data)
-        print(f"✅ {len(data)} registros de produtividade salvos.")
-    else:
+    def on_error(job, error):
+        pages = f" págs. {job.pages[0]}-{job.pages[1]}" if job.pages else ""
+        print(f"   ❌ Falha: {os.path.basename(job.path)}{pages} ({error})")
+        set_status(by_path[job.path], STATUS_FAILED, PARSER_VERSION, error=error)
+        failed.add(job.path)
+    
+    # PDFs grandes são divididos em intervalos de páginas (pdftotext -f/-l)
+    # para ocupar todos os workers mesmo com um único relatório consolidado
+    jobs = []
+    for entry in pending:
+        fp = layouts.fingerprint(entry['path'], entry.get('sha256'))
+        for pages in page_ranges(entry['path']):
+            first_page = pages[0] if pages else 1
+            jobs.append(PdfJob(entry['path'], parse_produtividade_range,
+                               (entry, fp, first_page), entry.get('sha256'), pages))
+    layouts.save_cache()
+    
+    # Extração + parse em paralelo; resultados chegam na ordem do índice
+    # (e das páginas), então cada arquivo é remontado em sequência
+    ranges = {}
+    for job, result in map_pdfs(jobs, on_error=on_error, executor=executor):
+        ranges.setdefault(job.path, []).append(result)
+    
+    for entry in pending:
+        # Um intervalo com erro invalida o arquivo todo (já marcado como failed)
+        if entry['path'] not in ranges or entry['path'] in failed:
+            continue
+        records = join_ranges(ranges[entry['path']])
+        print(f"   ↳ Lendo: {entry['filename']}")
+        key = source_key(entry, index)
+        for rec in records:
+            rec["arquivo_origem"] = key
+        data.extend(records)
+        set_status(entry, STATUS_EXTRACTED, PARSER_VERSION, records=len(records))
+        sources.add(key)
+
+    # Mescla no CSV: troca só as linhas dos arquivos reprocessados (e tira as
+    # de arquivos que saíram do índice)
+    with profiling.stage("write"):
+        rows, purged = merge_csv(PROD_DB_FILE, data, sources, replace_all=len(sources) == total, keep=keep)
+    if purged:
+        print(f"🗑️ {purged} linhas de arquivos removidos do índice apagadas de {PROD_DB_FILE}")
+    if sources:
+        for entry in pending:
+            if entry['status'] == STATUS_EXTRACTED:
+                set_status(entry, STATUS_LOADED)
+        print(f"✅ {len(data)} registros de produtividade salvos ({rows} no total).")
+    if not data:
         print("⚠️ Nenhum dado de produtividade extraído.")
+    
+    with profiling.stage("write"):
+        save_index(index, INDEX_FILE)
 
 def extract_contracts():
     # Placeholder simplificado para contratos (foco na produtividade agora)
     pass
 
 if __name__ == "__main__":
-    extract_productivity()
+    with profiling.run("extract_metrics_v2"):
+        extract_productivity()
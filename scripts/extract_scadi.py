@@ -1,16 +1,31 @@
 import os
-import json
-import re
-import csv
-import subprocess
 from datetime import datetime
 
+from incremental import (
+    load_index, save_index, pending_entries, set_status, merge_csv, source_key, index_keys,
+    STATUS_EXTRACTED, STATUS_LOADED, STATUS_FAILED,
+)
+from pdf_pool import PdfJob, map_pdfs, page_ranges
+from pdf_text import as_lines
+from scadi_patterns import (
+    classify_line, custo_categoria_fields, custo_categoria_parts,
+    custo_aplicacao_fields, custo_aplicacao_cells, SAFRA_ROW, ROW,
+)
+import layouts
+import profiling
+
 # Config
 BASE_DIR = "/home/jarvis/.openclaw/workspace/fazenda"
 DATA_DIR = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data"
 INDEX_FILE = os.path.join(DATA_DIR, "file_index.json")
 DB_FILE = os.path.join(DATA_DIR, "custos_operacionais.csv")
 
+# Subir a versão quando parse_custo_line mudar força o reprocessamento
+# (/3: arquivo_origem passou a ser o caminho relativo, incremental.source_key)
+PARSER_VERSION = "custo_categoria/3"
+# Idem para parse_aplicacao_text (relatório CUSTO POR APLICAÇÃO)
+APLICACAO_PARSER_VERSION = "custo_aplicacao/2"
+
 def parse_currency(value_str):
     """Converte 'R$ 1.234,56' para float 1234.56"""
     if not value_str: return 0.0
@@ -20,140 +35,187 @@ def parse_currency(value_str):
     except ValueError:
         return 0.0
 
-def extract_text_from_pdf(pdf_path):
-    """Usa pdftotext -layout para extrair texto mantendo colunas."""
-    try:
-        result = subprocess.run(
-            ["pdftotext", "-layout", pdf_path, "-"],
-            capture_output=True, text=True, check=True
-        )
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Erro ao ler PDF {pdf_path}: {e}")
-        return ""
-
 def parse_custo_line(line):
     """
     Tenta extrair dados de uma linha do relatório CUSTO POR CATEGORIA.
     Exemplo de linha:
     2024/2025  SOJA  MÃO DE OBRA  Salários  R$ 1.078.965,88  R$ 214,46  1,7302 sc/ha
     """
-    # Regex flexível para capturar colunas separadas por múltiplos espaços
-    # Grupo 1: Safra (Ex: 2024/2025)
-    # Grupo 2: Cultura (Ex: SOJA)
-    # Grupo 3: Aplicação (Ex: MÃO DE OBRA)
-    # Grupo 4: Categoria/Item (Ex: Salários) - Pode ter espaços
-    # Grupo 5: Valor Total (Ex: R$ 1.000,00)
-    
-    # Estratégia: Split por múltiplos espaços (2 ou mais)
-    parts = re.split(r'\s{2,}', line.strip())
-    
-    if len(parts) < 5:
+    # Validação básica: primeiro campo parece ano? (classificador compilado)
+    if classify_line(line) != SAFRA_ROW:
         return None
-        
-    # Validação básica: primeiro campo parece ano?
-    if not re.match(r'20\d{2}', parts[0]):
+
+    return custo_record(custo_categoria_fields(line))
+
+def custo_record(fields):
+    if not fields:
         return None
+    safra, cultura, aplicacao, item, valor_str, custo_ha_str = fields
 
-    try:
-        safra = parts[0]
-        cultura = parts[1]
-        aplicacao = parts[2]
-        
-        # Acha o índice onde tem "R$"
-        valor_idx = -1
-        for i, p in enumerate(parts):
-            if "R$" in p:
-                valor_idx = i
-                break
-        
-        if valor_idx == -1: return None
-        
-        item = " ".join(parts[3:valor_idx])
-        
-        # Lógica corrigida para R$ separado do valor
-        # Cenário 1: "R$ 1.000,00" (junto) -> parts[valor_idx] é o valor
-        # Cenário 2: "R$" ... "1.000,00" (separado) -> parts[valor_idx] é R$, valor é próximo
-        
-        raw_val_str = parts[valor_idx]
-        custo_ha_str = "0"
-        
-        if raw_val_str.strip() == "R$":
-            # O valor está na próxima coluna
-            if len(parts) > valor_idx + 1:
-                val_total = parse_currency(parts[valor_idx + 1])
-                # Tenta pegar o próximo R$ (custo/ha)
-                if len(parts) > valor_idx + 2:
-                     # Pode ser que o próximo seja "R$" solto de novo
-                     if parts[valor_idx + 2].strip() == "R$":
-                         custo_ha_str = parts[valor_idx + 3] if len(parts) > valor_idx + 3 else "0"
-                     else:
-                         custo_ha_str = parts[valor_idx + 2]
-            else:
-                val_total = 0.0
+    return {
+        "safra": safra,
+        "cultura": cultura,
+        "categoria_macro": aplicacao,
+        "item": item,
+        "valor_total_brl": parse_currency(valor_str),
+        "custo_por_ha": parse_currency(custo_ha_str),
+        "fonte": "SCADI"
+    }
+
+def parse_custo_text(text, fp=None, first_page=1):
+    """
+    Extrai os custos do relatório (roda no worker). Com o fingerprint do
+    layout as linhas são fatiadas nas colunas fixas; o que não couber
+    (ou sem fingerprint) passa por parse_custo_line.
+    Cada linha é independente, então um intervalo de páginas (first_page > 1)
+    não depende do anterior: basta concatenar na ordem.
+    """
+    records = []
+    for kind, value in layouts.iter_cells(as_lines(text), fp, first_page > 1):
+        if kind == ROW:
+            # Colunas vazias no fatiamento equivalem a separadores no split
+            data = custo_record(custo_categoria_parts([c for c in value if c]))
+            pattern = "custo_categoria/colunas"
         else:
-            # O valor está junto (Ex: "R$1.000,00")
-            val_total = parse_currency(raw_val_str)
-            # Tenta pegar custo ha (pode ser a prox coluna ou R$ + prox)
-            if len(parts) > valor_idx + 1:
-                if "R$" in parts[valor_idx+1]:
-                     if parts[valor_idx+1].strip() == "R$":
-                         custo_ha_str = parts[valor_idx+2] if len(parts) > valor_idx+2 else "0"
-                     else:
-                         custo_ha_str = parts[valor_idx+1]
-                else:
-                     custo_ha_str = parts[valor_idx+1]
-
-        custo_ha = parse_currency(custo_ha_str)
-        
-        return {
+            data = parse_custo_line(value)
+            pattern = "custo_categoria/regex"
+        if data:
+            records.append(data)
+            profiling.accept(pattern)
+        else:
+            profiling.reject(pattern, value if kind is None else "  ".join(value), "campos não reconhecidos")
+    return records
+
+def parse_aplicacao_text(text, cultura, fp=None, first_page=1):
+    """
+    Custos do relatório CUSTO POR APLICAÇÃO (roda no worker), no mesmo
+    formato de custos_operacionais.csv. O relatório não traz a cultura:
+    vem do índice (pasta/nome do arquivo).
+    """
+    records = []
+    for kind, value in layouts.iter_cells(as_lines(text), fp, first_page > 1):
+        if kind == ROW:
+            fields = custo_aplicacao_cells(value)
+            pattern = "custo_aplicacao/colunas"
+        elif kind is None:
+            fields = custo_aplicacao_fields(value)
+            pattern = "custo_aplicacao/regex"
+        else:
+            continue
+        if not fields:
+            profiling.reject(pattern, value if kind is None else "  ".join(value), "campos não reconhecidos")
+            continue
+        profiling.accept(pattern)
+        aplicacao, safra, fazenda, valor, custo_ha = fields
+        records.append({
             "safra": safra,
             "cultura": cultura,
             "categoria_macro": aplicacao,
-            "item": item,
-            "valor_total_brl": val_total,
+            "item": aplicacao,
+            "valor_total_brl": valor,
             "custo_por_ha": custo_ha,
-            "fonte": "SCADI"
-        }
-    except Exception as e:
-        # print(f"Erro parse linha: {line} -> {e}")
-        return None
+            "fonte": "SCADI",
+            "fazenda": fazenda,
+        })
+    return records
+
+def is_custo_categoria(entry):
+    return layouts.layout_of(entry) == layouts.CUSTO_CATEGORIA
+
+def is_custo_aplicacao(entry):
+    return layouts.layout_of(entry) == layouts.CUSTO_APLICACAO
 
-def run_extraction():
-    # 1. Carrega Index
-    with open(INDEX_FILE, "r") as f:
-        index = json.load(f)
+def is_custo(entry):
+    return is_custo_categoria(entry) or is_custo_aplicacao(entry)
+
+def parser_version(entry):
+    return APLICACAO_PARSER_VERSION if is_custo_aplicacao(entry) else PARSER_VERSION
+
+def run_extraction(executor=None):
+    # 1. Carrega Index e separa só o que é novo/alterado
+    index = load_index(INDEX_FILE)
+    total = sum(1 for entry in index['files'] if is_custo(entry))
+    pending = (pending_entries(index, is_custo_categoria, PARSER_VERSION)
+               + pending_entries(index, is_custo_aplicacao, APLICACAO_PARSER_VERSION))
+    
+    # Linhas de PDFs que saíram do índice (apagados/movidos) saem do CSV
+    keep = index_keys(index)
+    if not pending:
+        with profiling.stage("write"):
+            _, purged = merge_csv(DB_FILE, [], set(), keep=keep)
+        if purged:
+            print(f"🗑️ {purged} linhas de arquivos removidos do índice apagadas de {DB_FILE}")
+        print(f"✅ Nenhum arquivo de custo novo ou alterado ({total} já carregados).")
+        return
     
     extracted_data = []
+    sources = set()
+    by_path = {entry['path']: entry for entry in pending}
+    failed = set()
     
-    print(f"🚜 Iniciando extração de {len(index['files'])} arquivos...")
+    print(f"🚜 Iniciando extração de {len(pending)} de {total} arquivos...")
     
-    # 2. Itera arquivos
-    for entry in index['files']:
-        if entry['tipo'] == "CUSTO" and "CATEGORIA" in entry['filename']:
-            print(f"   ↳ Processando: {entry['filename']}")
-            text = extract_text_from_pdf(entry['path'])
-            
-            for line in text.split('\n'):
-                data = parse_custo_line(line)
-                if data:
-                    # Adiciona metadados extras
-                    data['arquivo_origem'] = entry['filename']
-                    data['fazenda'] = "CONSOLIDADO" # Assumindo consolidado por enquanto
-                    extracted_data.append(data)
-
-    # 3. Salva CSV
-    if extracted_data:
-        keys = extracted_data[0].keys()
-        with open(DB_FILE, 'w', newline='') as output_file:
-            dict_writer = csv.DictWriter(output_file, fieldnames=keys)
-            dict_writer.writeheader()
-            dict_writer.writerows(extracted_data)
+    def on_error(job, error):
+        pages = f" págs. {job.pages[0]}-{job.pages[1]}" if job.pages else ""
+        print(f"   ❌ Falha: {os.path.basename(job.path)}{pages} ({error})")
+        entry = by_path[job.path]
+        set_status(entry, STATUS_FAILED, parser_version(entry), error=error)
+        failed.add(job.path)
+    
+    # 2. Extrai os arquivos em paralelo (ordem do índice preservada).
+    # PDFs grandes viram vários jobs, um por intervalo de páginas (pdftotext -f/-l)
+    jobs = []
+    for entry in pending:
+        fp = layouts.fingerprint(entry['path'], entry.get('sha256'))
+        for pages in page_ranges(entry['path']):
+            first_page = pages[0] if pages else 1
+            if fp["layout"] == layouts.CUSTO_APLICACAO:
+                job = PdfJob(entry['path'], parse_aplicacao_text,
+                             (entry['cultura'], fp, first_page), entry.get('sha256'), pages)
+            else:
+                job = PdfJob(entry['path'], parse_custo_text,
+                             (fp, first_page), entry.get('sha256'), pages)
+            jobs.append(job)
+    layouts.save_cache()
+    
+    ranges = {}
+    for job, records in map_pdfs(jobs, on_error=on_error, executor=executor):
+        ranges.setdefault(job.path, []).extend(records)
+    
+    for entry in pending:
+        # Um intervalo com erro invalida o arquivo todo (já marcado como failed)
+        if entry['path'] not in ranges or entry['path'] in failed:
+            continue
+        records = ranges[entry['path']]
+        print(f"   ↳ Processando: {entry['filename']}")
+        for data in records:
+            # Adiciona metadados extras
+            data['arquivo_origem'] = source_key(entry, index)
+            # CUSTO POR CATEGORIA não traz fazenda: assumindo consolidado por enquanto
+            data.setdefault('fazenda', "CONSOLIDADO")
+            extracted_data.append(data)
+        set_status(entry, STATUS_EXTRACTED, parser_version(entry), records=len(records))
+        sources.add(source_key(entry, index))
+
+    # 3. Mescla no CSV: troca só as linhas dos arquivos reprocessados (e tira
+    # as de arquivos que saíram do índice). Se TODOS foram reprocessados, reescreve do zero.
+    with profiling.stage("write"):
+        rows, purged = merge_csv(DB_FILE, extracted_data, sources, replace_all=len(sources) == total, keep=keep)
+    if purged:
+        print(f"🗑️ {purged} linhas de arquivos removidos do índice apagadas de {DB_FILE}")
+    if sources:
+        for entry in pending:
+            if entry['status'] == STATUS_EXTRACTED:
+                set_status(entry, STATUS_LOADED)
         
-        print(f"\n✅ Sucesso! {len(extracted_data)} registros de custo extraídos.")
+        print(f"\n✅ Sucesso! {len(extracted_data)} registros de custo extraídos ({rows} no total).")
         print(f"📊 Banco de dados salvo em: {DB_FILE}")
-    else:
+    if not extracted_data:
         print("\n⚠️ Nenhum dado de custo extraído. Verifique os layouts.")
+    
+    with profiling.stage("write"):
+        save_index(index, INDEX_FILE)
 
 if __name__ == "__main__":
-    run_extraction()
+    with profiling.run("extract_scadi"):
+        run_extraction()
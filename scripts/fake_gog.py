@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from datetime import datetime, timezone
+
+# `gog drive` falso para testar o sync sem rede: serve uma pasta local
+# como se fosse o Drive. Só o que o sync_drive usa:
+#
+#   fake_gog.py drive ls --parent ID --json
+#   fake_gog.py drive download ID --out CAMINHO
+#   fake_gog.py drive changes token --json
+#   fake_gog.py drive changes list --page-token TOKEN --json
+#
+# O feed de mudanças é simulado com fotos da árvore: `changes token` grava
+# uma foto (id -> caminho/pai/mtime/tamanho) e devolve o nome dela; `changes
+# list` compara a foto com a árvore atual. Apagar a foto em
+# FAKE_GOG_STATE/changes/ simula um token expirado.
+#
+# Config (env):
+#   FAKE_GOG_ROOT     pasta servida (obrigatório)
+#   FAKE_GOG_ROOT_ID  id da raiz (padrão "root"); os demais ids são "fake:<inode>",
+#                     estáveis quando o arquivo é movido/renomeado (como no Drive)
+#   FAKE_GOG_DELAY    segundos de latência por chamada (simula a API)
+#   FAKE_GOG_FAIL     as N primeiras tentativas de download de cada arquivo falham
+#   FAKE_GOG_STATE    pasta onde contar as tentativas (padrão FAKE_GOG_ROOT/../.fake_gog)
+#   FAKE_GOG_LOG      arquivo onde registrar cada chamada (uma linha por chamada)
+#   FAKE_GOG_PAGE_SIZE mudanças por página do changes list (padrão 100)
+#
+# Uso: GOG_BIN=scripts/fake_gog.py FAKE_GOG_ROOT=/tmp/drive python3 scripts/sync_drive.py
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+ROOT = os.environ.get("FAKE_GOG_ROOT")
+ROOT_ID = os.environ.get("FAKE_GOG_ROOT_ID", "root")
+DELAY = float(os.environ.get("FAKE_GOG_DELAY", "0"))
+FAIL = int(os.environ.get("FAKE_GOG_FAIL", "0"))
+PAGE_SIZE = int(os.environ.get("FAKE_GOG_PAGE_SIZE", "100"))
+
+def fail(msg, code=1):
+    print(f"fake_gog: {msg}", file=sys.stderr)
+    sys.exit(code)
+
+def resolve(fid):
+    if fid == ROOT_ID:
+        return ROOT
+    if fid.startswith("fake:"):
+        for dirpath, dirnames, filenames in os.walk(ROOT):
+            for name in dirnames + filenames:
+                path = os.path.join(dirpath, name)
+                if file_id(path) == fid:
+                    return path
+    fail(f"não encontrado: {fid}", 4)
+
+def file_id(path):
+    if os.path.normpath(path) == os.path.normpath(ROOT):
+        return ROOT_ID
+    return f"fake:{os.stat(path).st_ino}"
+
+def state_dir(*parts):
+    state = os.environ.get("FAKE_GOG_STATE") or os.path.join(os.path.dirname(os.path.normpath(ROOT)), ".fake_gog")
+    path = os.path.join(state, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def md5(path):
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def describe(path):
+    st = os.stat(path)
+    item = {
+        "id": file_id(path),
+        "name": os.path.basename(path),
+        "parents": [file_id(os.path.dirname(path))],
+        "modifiedTime": datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+    }
+    if os.path.isdir(path):
+        item["mimeType"] = FOLDER_MIME
+    else:
+        item["mimeType"] = "application/pdf" if path.lower().endswith(".pdf") else "application/octet-stream"
+        item["size"] = str(st.st_size)
+        item["md5Checksum"] = md5(path)
+    return item
+
+def cmd_ls(args):
+    parent = args[args.index("--parent") + 1] if "--parent" in args else ROOT_ID
+    folder = resolve(parent)
+    if not os.path.isdir(folder):
+        fail(f"não é pasta: {parent}", 4)
+    items = [describe(os.path.join(folder, name)) for name in sorted(os.listdir(folder))
+             if not name.startswith(".")]
+    json.dump(items, sys.stdout)
+
+def _attempt(fid):
+    """Nº desta tentativa de download do arquivo (para FAKE_GOG_FAIL)."""
+    counter = os.path.join(state_dir(), hashlib.sha1(fid.encode()).hexdigest())
+    with open(counter, "a") as f:
+        f.write("x")
+    return os.path.getsize(counter)
+
+def cmd_download(args):
+    fid = args[0]
+    out = args[args.index("--out") + 1]
+    src = resolve(fid)
+    if FAIL and _attempt(fid) <= FAIL:
+        # Falha no meio: deixa um arquivo parcial, como um download interrompido
+        with open(src, "rb") as f, open(out, "wb") as dst:
+            dst.write(f.read(max(1, os.path.getsize(src) // 2)))
+        fail("connection reset by peer", 1)
+    shutil.copyfile(src, out)
+    if "--json" in args:
+        json.dump({"id": fid, "path": out}, sys.stdout)
+
+def snapshot():
+    """Foto da árvore: {id: [caminho, pai, mtime_ns, tamanho]}."""
+    shot = {}
+    for dirpath, dirnames, filenames in os.walk(ROOT):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for name in dirnames + [f for f in filenames if not f.startswith(".")]:
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            shot[file_id(path)] = [os.path.relpath(path, ROOT), file_id(dirpath),
+                                   0 if os.path.isdir(path) else st.st_mtime_ns, st.st_size]
+    return shot
+
+def new_token():
+    folder = state_dir("changes")
+    token = str(len(os.listdir(folder)) + 1)
+    with open(os.path.join(folder, token + ".json"), "w") as f:
+        json.dump(snapshot(), f)
+    return token
+
+def cmd_changes(args):
+    if args and args[0] == "token":
+        json.dump({"startPageToken": new_token()}, sys.stdout)
+        return
+    if not args or args[0] != "list" or "--page-token" not in args:
+        fail(f"comando não suportado: drive changes {' '.join(args)}", 2)
+    token = args[args.index("--page-token") + 1]
+    base, _, offset = token.partition("@")
+    shot = os.path.join(state_dir("changes"), base + ".json")
+    if not os.path.exists(shot):
+        fail(f"invalid page token: {token}", 4)
+    with open(shot) as f:
+        before = json.load(f)
+    now = snapshot()
+    changes = []
+    for fid in sorted(set(before) | set(now)):
+        if fid not in now:
+            changes.append({"fileId": fid, "removed": True})
+        elif before.get(fid) != now[fid]:
+            changes.append({"fileId": fid, "removed": False, "file": describe(os.path.join(ROOT, now[fid][0]))})
+
+    offset = int(offset or 0)
+    page = {"changes": changes[offset:offset + PAGE_SIZE]}
+    if offset + PAGE_SIZE < len(changes):
+        page["nextPageToken"] = f"{base}@{offset + PAGE_SIZE}"
+    else:
+        page["newStartPageToken"] = new_token()
+    json.dump(page, sys.stdout)
+
+def main():
+    args = sys.argv[1:]
+    if not ROOT:
+        fail("FAKE_GOG_ROOT não definido", 2)
+    if len(args) < 2 or args[0] != "drive":
+        fail(f"comando não suportado: {' '.join(args)}", 2)
+    log = os.environ.get("FAKE_GOG_LOG")
+    if log:
+        with open(log, "a") as f:
+            f.write(" ".join(args) + "\n")
+    if DELAY:
+        time.sleep(DELAY)
+    if args[1] == "ls":
+        cmd_ls(args[2:])
+    elif args[1] == "download":
+        cmd_download(args[2:])
+    elif args[1] == "changes":
+        cmd_changes(args[2:])
+    else:
+        fail(f"comando não suportado: drive {args[1]}", 2)
+
+if __name__ == "__main__":
+    main()
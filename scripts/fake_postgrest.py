@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import threading
+from urllib.parse import urlsplit, parse_qsl, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# PostgREST falso para testar o publish_supabase sem rede: tabelas em
+# memória atrás de /rest/v1/<tabela>, com HTTP/1.1 keep-alive. Só o que o
+# publicador usa:
+#
+#   POST   /rest/v1/T?on_conflict=id   lote JSON; com Prefer resolution=merge-duplicates
+#                                      é upsert, sem ele id repetido dá 409
+#   DELETE /rest/v1/T?id=in.(a,b,...)
+#   GET    /rest/v1/T?select=*&order=id&id=gt.X&limit=N   (também col=eq.V)
+#   GET    /_stats                     conexões, requisições e linhas recebidas
+#
+# Como o PostgREST, recusa (400) um lote cujos objetos não têm todos as
+# mesmas chaves e exige o header apikey (401).
+#
+# Config (env):
+#   FAKE_POSTGREST_DELAY       segundos de latência por requisição (simula a rede)
+#   FAKE_POSTGREST_FAIL_EVERY  toda N-ésima escrita responde 503 sem gravar nada
+#
+# Uso: python3 scripts/fake_postgrest.py [porta]
+#      TERRA_SUPABASE_URL=http://127.0.0.1:PORTA TERRA_SUPABASE_KEY=x python3 scripts/publish_supabase.py
+
+DELAY = float(os.environ.get("FAKE_POSTGREST_DELAY", "0"))
+FAIL_EVERY = int(os.environ.get("FAKE_POSTGREST_FAIL_EVERY", "0"))
+PREFIX = "/rest/v1/"
+
+class Store:
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.stats = {"connections": 0, "requests": 0, "writes": 0, "rows": 0, "failed": 0}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+            return self.stats[key]
+
+def _filters(params):
+    """[(coluna, op, valor)] dos parâmetros col=op.valor."""
+    out = []
+    for key, value in params:
+        if key in ("select", "order", "limit", "on_conflict"):
+            continue
+        op, _, arg = value.partition(".")
+        out.append((key, op, arg))
+    return out
+
+def _match(row, filters):
+    for col, op, arg in filters:
+        value = row.get(col)
+        if op == "eq" and str(value) != arg:
+            return False
+        if op == "gt" and not (value is not None and str(value) > arg):
+            return False
+        if op == "in" and str(value) not in {unquote(v) for v in arg.strip("()").split(",")}:
+            return False
+    return True
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store = None
+
+    def setup(self):
+        super().setup()
+        self.store.count("connections")
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        """(tabela, parâmetros) ou None depois de responder o erro."""
+        self.store.count("requests")
+        if DELAY:
+            time.sleep(DELAY)
+        url = urlsplit(self.path)
+        if not url.path.startswith(PREFIX):
+            self._send(404, {"message": "not found"})
+            return None
+        if not self.headers.get("apikey"):
+            self._send(401, {"message": "No API key found in request"})
+            return None
+        return url.path[len(PREFIX):], parse_qsl(url.query, keep_blank_values=True)
+
+    def _fail_write(self):
+        n = self.store.count("writes")
+        if FAIL_EVERY and n % FAIL_EVERY == 0:
+            self.store.count("failed")
+            self._send(503, {"message": "injected failure"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            with self.store.lock:
+                return self._send(200, dict(self.store.stats))
+        route = self._route()
+        if route is None:
+            return
+        table, params = route
+        opts = dict(params)
+        with self.store.lock:
+            rows = [dict(r) for r in self.store.tables.get(table, {}).values() if _match(r, _filters(params))]
+        if opts.get("order"):
+            col = opts["order"].split(".")[0]
+            rows.sort(key=lambda r: str(r.get(col)), reverse=opts["order"].endswith(".desc"))
+        if opts.get("limit"):
+            rows = rows[:int(opts["limit"])]
+        self._send(200, rows)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        route = self._route()
+        if route is None or self._fail_write():
+            return
+        table, _ = route
+        rows = json.loads(body or b"[]")
+        rows = rows if isinstance(rows, list) else [rows]
+        if len({tuple(sorted(r)) for r in rows}) > 1:
+            return self._send(400, {"code": "PGRST102", "message": "All object keys must match"})
+        merge = "resolution=merge-duplicates" in self.headers.get("Prefer", "")
+        with self.store.lock:
+            data = self.store.tables.setdefault(table, {})
+            if not merge and any(r.get("id") in data for r in rows):
+                return self._send(409, {"code": "23505", "message": "duplicate key value violates unique constraint"})
+            for r in rows:
+                data[r["id"]] = {**data.get(r["id"], {}), **r}
+            self.store.stats["rows"] += len(rows)
+        self._send(201)
+
+    def do_DELETE(self):
+        route = self._route()
+        if route is None or self._fail_write():
+            return
+        table, params = route
+        filters = _filters(params)
+        if not filters:
+            return self._send(400, {"message": "DELETE requires a WHERE clause"})
+        with self.store.lock:
+            data = self.store.tables.get(table, {})
+            gone = [rid for rid, r in data.items() if _match(r, filters)]
+            for rid in gone:
+                del data[rid]
+            self.store.stats["rows"] += len(gone)
+        self._send(204)
+
+def serve(port=0):
+    """Sobe o servidor numa thread. Devolve (servidor, store, url base)."""
+    store = Store()
+    handler = type("FakePostgrest", (Handler,), {"store": store})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, store, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    server, _, base = serve(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    print(f"🧪 PostgREST falso em {base}{PREFIX} (Ctrl+C para sair)", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,39 +1,58 @@
-import csv
 import json
 import os
+import re
 from collections import defaultdict
 
+import assets
+import tables
+
+# O HTML gerado é só a casca: os dados vão para data/dashboard.<hash>.json
+# (nome muda quando o conteúdo muda, cache de um ano no Vercel) e a casca
+# busca esse arquivo. O vercel.json é regravado com as regras de cache
+# (assets.HEADER_RULES); visita repetida só revalida a casca.
+
 # Config
 DATA_DIR = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data"
 OUTPUT_HTML = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/index.html"
+OUTPUT_DIR = os.path.dirname(OUTPUT_HTML)
+VERCEL_FILE = os.path.join(OUTPUT_DIR, "vercel.json")
+DATA_STEM = "dashboard"
+RE_DATA_URL = re.compile(r'const DB_URL = "data/([^"]+)"')
+
+def load_csv_data(filename, kind):
+    """Table colunar do CSV (vazia se o arquivo não existe)."""
+    return tables.read_csv(os.path.join(DATA_DIR, filename), kind)
 
-def load_csv_data(filename):
-    data = []
-    filepath = os.path.join(DATA_DIR, filename)
-    if os.path.exists(filepath):
-        with open(filepath, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                data.append(row)
-    return data
+def _current_data_file():
+    """Arquivo de dados referenciado pela casca atual (se houver)."""
+    if not os.path.exists(OUTPUT_HTML):
+        return None
+    with open(OUTPUT_HTML, "r") as f:
+        match = RE_DATA_URL.search(f.read())
+    return match.group(1) if match else None
 
 def generate_dashboard_v2():
-    custos = load_csv_data("custos_operacionais.csv")
-    produtividade = load_csv_data("produtividade.csv")
+    custos = load_csv_data("custos_operacionais.csv", "custos")
+    produtividade = load_csv_data("produtividade.csv", "produtividade")
     
     # Processa dados para o Frontend (JSON)
     dashboard_data = {
-        "custos": custos,
-        "produtividade": produtividade,
+        "custos": custos.to_dicts(),
+        "produtividade": produtividade.to_dicts(),
         "resumo": {
-            "total_area_soja": sum([float(p['area_ha']) for p in produtividade if p['cultura'] == 'SOJA']),
-            "total_area_milho": sum([float(p['area_ha']) for p in produtividade if p['cultura'] == 'MILHO']),
+            "total_area_soja": produtividade.total("area_ha", cultura="SOJA") if len(produtividade) else 0,
+            "total_area_milho": produtividade.total("area_ha", cultura="MILHO") if len(produtividade) else 0,
             "media_prod_soja": 0, # Calcular no JS
             "media_prod_milho": 0
         }
     }
     
-    json_payload = json.dumps(dashboard_data)
+    # sort_keys: mesmo dado = mesmos bytes = mesmo nome (o cache do cliente continua valendo)
+    payload = json.dumps(dashboard_data, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    data_dir = os.path.join(OUTPUT_DIR, "data")
+    previous = _current_data_file()
+    data_file = assets.write_hashed(data_dir, DATA_STEM, payload)
+    data_url = f"data/{data_file}"
 
     html_content = f"""
 <!DOCTYPE html>
@@ -47,6 +66,7 @@ def generate_dashboard_v2():
     <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
     <script src="https://code.jquery.com/jquery-3.7.0.min.js"></script>
     <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
+    <link rel="preload" href="{data_url}" as="fetch" crossorigin>
     
     <style>
         body {{ background-color: #0f172a; color: #e2e8f0; font-family: 'Inter', sans-serif; }}
@@ -95,6 +115,13 @@ def generate_dashboard_v2():
             </div>
         </header>
 
+        <!-- Erro ao carregar os dados -->
+        <div id="load-error" class="hidden card border-l-4 border-red-500 mb-6">
+            <p class="text-red-400 font-bold">⚠️ Não foi possível carregar os dados do dashboard.</p>
+            <p id="load-error-detail" class="text-slate-400 text-xs mt-1"></p>
+            <button onclick="location.reload()" class="mt-3 bg-slate-700 hover:bg-slate-600 text-white text-sm py-1 px-3 rounded">Recarregar</button>
+        </div>
+
         <!-- Navigation Tabs -->
         <div class="flex border-b border-slate-700 mb-6">
             <button onclick="switchTab('visao-geral')" id="tab-geral" class="px-6 py-3 font-medium tab-active">📊 Visão Geral</button>
@@ -186,7 +213,17 @@ def generate_dashboard_v2():
 
     <!-- Application Logic -->
     <script>
-        const DB = {json_payload};
+        const DB_URL = "{data_url}";
+        let DB = null;
+        // Busca começa junto com a página (em paralelo com o login)
+        // Falha (404 de um deploy pela metade, rede, JSON inválido) resolve com o erro: o initApp mostra o aviso
+        const dbReady = fetch(DB_URL)
+            .then(res => {{
+                if (!res.ok) throw new Error(`HTTP ${{res.status}} em ${{DB_URL}}`);
+                return res.json();
+            }})
+            .then(data => {{ DB = data; return null; }})
+            .catch(err => {{ console.error('[Terra Dashboard] Erro ao carregar dados:', err); return err; }});
         
         // --- Security ---
         function checkPass() {{
@@ -217,7 +254,13 @@ def generate_dashboard_v2():
         }}
 
         // --- Init ---
-        function initApp() {{
+        async function initApp() {{
+            const loadError = await dbReady;
+            if (loadError) {{
+                document.getElementById('load-error-detail').innerText = loadError.message;
+                document.getElementById('load-error').classList.remove('hidden');
+                return;
+            }}
             renderKPIs();
             renderCharts();
             renderProdTable();
@@ -316,8 +359,16 @@ def generate_dashboard_v2():
 
     with open(OUTPUT_HTML, "w") as f:
         f.write(html_content)
-    
+
+    # Mantém a versão anterior dos dados: quem está com a casca velha aberta ainda a encontra
+    removed = assets.prune_hashed(data_dir, DATA_STEM, {data_file, previous})
+    assets.update_vercel_json(VERCEL_FILE)
+
     print(f"✅ Dashboard v2 gerado em: {OUTPUT_HTML}")
+    print(f"   📦 dados: {data_url} ({len(payload) / 1024:.1f} KB, cache imutável)")
+    print(f"   🧾 casca: {len(html_content.encode('utf-8')) / 1024:.1f} KB")
+    if removed:
+        print(f"   🗑️  {len(removed)} versões antigas removidas")
 
 if __name__ == "__main__":
     generate_dashboard_v2()
@@ -0,0 +1,113 @@
+import os
+import csv
+import json
+from datetime import datetime
+
+# Estado incremental da ingestão, guardado no próprio file_index.json.
+#
+# Cada entrada do índice carrega size/mtime/sha256 (preenchidos por index_files.py)
+# e o ciclo de vida do arquivo:
+#   indexed   -> novo ou alterado, ainda não extraído
+#   extracted -> parser rodou, registros ainda não gravados no CSV
+#   loaded    -> registros mesclados no CSV de saída
+#   failed    -> extração falhou (só tenta de novo se o arquivo ou o parser mudar)
+# parser_version registra qual versão do parser gerou os registros; subir a
+# versão no extrator força o reprocessamento dos arquivos daquele tipo.
+
+STATUS_INDEXED = "indexed"
+STATUS_EXTRACTED = "extracted"
+STATUS_LOADED = "loaded"
+STATUS_FAILED = "failed"
+
+def load_index(path):
+    if not os.path.exists(path):
+        return {"metadata": {}, "files": []}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_index(index, path):
+    """Grava o índice de forma atômica (tmp + rename)."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def pending_entries(index, match, parser_version):
+    """Entradas que casam com `match` e precisam (re)extração por este parser."""
+    pending = []
+    for entry in index["files"]:
+        if not match(entry):
+            continue
+        if entry.get("parser_version") != parser_version:
+            pending.append(entry)
+        elif entry.get("status") in (STATUS_INDEXED, STATUS_EXTRACTED):
+            pending.append(entry)
+    return pending
+
+def set_status(entry, status, parser_version=None, error=None, records=None):
+    entry["status"] = status
+    entry["status_at"] = datetime.now().isoformat(timespec="seconds")
+    if parser_version is not None:
+        entry["parser_version"] = parser_version
+    if records is not None:
+        entry["records"] = records
+    if error:
+        entry["error"] = error
+    else:
+        entry.pop("error", None)
+
+def source_key(entry, index):
+    """
+    Chave do arquivo nas linhas do CSV (arquivo_origem): caminho relativo à
+    raiz do índice (ex.: "SOJA/2025/CUSTO ....pdf"). Só o nome não basta:
+    relatórios com o mesmo nome em pastas {CULTURA}/{ANO} diferentes.
+    """
+    root = index.get("metadata", {}).get("root_path")
+    return os.path.relpath(entry["path"], root) if root else entry["path"]
+
+def index_keys(index):
+    """Chaves (source_key) de todos os arquivos que ainda estão no índice."""
+    return {source_key(entry, index) for entry in index["files"]}
+
+def merge_csv(path, records, sources, key="arquivo_origem", replace_all=False, keep=None):
+    """
+    Mescla `records` no CSV: remove as linhas cujas `key` estão em `sources`
+    (versões antigas dos arquivos reprocessados) e acrescenta as novas.
+    Com `keep` (index_keys), saem também as linhas de arquivos que não estão
+    mais no índice (PDF apagado ou movido de pasta).
+    Com replace_all=True reescreve o arquivo só com `records`.
+    Retorna (linhas gravadas, linhas de arquivos removidos). Sem registros
+    novos e sem nada removido, o arquivo não é regravado.
+    """
+    rows = []
+    fieldnames = []
+    purged = replaced = 0
+    if not replace_all and os.path.exists(path):
+        with open(path, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            fieldnames = list(reader.fieldnames or [])
+            for row in reader:
+                origin = row.get(key)
+                if origin in sources:
+                    replaced += 1
+                    continue
+                if keep is not None and origin and origin not in keep:
+                    purged += 1
+                    continue
+                rows.append(row)
+    if not records and not purged and not replaced and not replace_all:
+        return len(rows), 0
+
+    for rec in records:
+        for k in rec.keys():
+            if k not in fieldnames:
+                fieldnames.append(k)
+    rows.extend(records)
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+    return len(rows), purged
@@ -1,8 +1,13 @@
 import os
-import json
 import re
+import sys
+import time
 from datetime import datetime
 
+from incremental import load_index, save_index, STATUS_INDEXED
+from text_cache import file_sha256
+import layouts
+
 # Config
 BASE_DIR = "/home/jarvis/.openclaw/workspace/fazenda"
 OUTPUT_FILE = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data/file_index.json"
@@ -20,7 +25,28 @@ def classify_file(filename):
         return "ESTOQUE"
     return "OUTROS"
 
-def index_files():
+def _walk(top):
+    for root, dirs, files in os.walk(top):
+        dirs.sort()
+        for file in sorted(files):
+            yield os.path.join(root, file)
+
+def index_files(settle=0, changed=None, walk=True):
+    """
+    Atualiza o índice de forma incremental: arquivos com size/mtime iguais
+    mantêm a entrada (e o status) sem reler o conteúdo; os demais têm o
+    SHA-256 recalculado e, se o conteúdo mudou, voltam para 'indexed'.
+    `settle` (s): arquivo modificado há menos que isso ainda está sendo
+    escrito e fica para a próxima passada (usado pelo ingest_scadi).
+    `changed` (caminhos, do sync_drive): só esses são re-hasheados, mesmo
+    com size/mtime iguais; os demais já indexados ficam como estão.
+    `walk=False` (com `changed`, eventos do ingest_scadi): não varre a árvore;
+    só os caminhos de `changed` são olhados e os que não existem mais saem
+    do índice.
+    """
+    now = time.time()
+    previous = {e['path']: e for e in load_index(OUTPUT_FILE)['files']}
+    
     index = {
         "metadata": {
             "generated_at": datetime.now().isoformat(),
@@ -28,54 +54,118 @@ def index_files():
         },
         "files": []
     }
+    novos = alterados = 0
     
     print(f"🔍 Iniciando varredura em: {BASE_DIR}")
     
-    # Varre recursivamente
-    for root, dirs, files in os.walk(BASE_DIR):
-        for file in files:
-            if not file.lower().endswith(".pdf"):
-                continue
-                
-            path = os.path.join(root, file)
-            # Tenta extrair contexto do caminho (Ex: fazenda/SOJA/2025/arquivo.pdf)
-            parts = path.replace(BASE_DIR, "").strip("/").split("/")
-            
-            cultura = "DESCONHECIDO"
-            ano = "DESCONHECIDO"
-            
-            # Heurística simples para pasta estruturada
-            if len(parts) >= 2:
-                if parts[0] in ["SOJA", "MILHO"]:
-                    cultura = parts[0]
-                if re.match(r"20\d{2}", parts[1]): # Se parece um ano (2020-2029)
-                    ano = parts[1]
-            
-            # Se não pegou da pasta, tenta do nome do arquivo
-            if cultura == "DESCONHECIDO":
-                if "SOJA" in file.upper(): cultura = "SOJA"
-                if "MILHO" in file.upper(): cultura = "MILHO"
+    # Varre recursivamente (ou só o índice anterior + os caminhos alterados)
+    walk = walk or changed is None
+    if walk:
+        paths = _walk(BASE_DIR)
+    else:
+        changed = set(changed)
+        paths = sorted(set(previous) | changed)
+    for path in paths:
+        file = os.path.basename(path)
+        if not file.lower().endswith(".pdf"):
+            continue
             
-            doc_type = classify_file(file)
-            
-            entry = {
-                "path": path,
-                "filename": file,
-                "cultura": cultura,
-                "ano_safra": ano,
-                "tipo": doc_type,
-                "status": "PENDENTE_OCR"
-            }
-            
-            index["files"].append(entry)
-            print(f"📄 [{doc_type}] {file} ({cultura} {ano})")
+        prev = previous.get(path)
+        # Sem varredura, apagado/movido só aparece como caminho que não existe
+        if not walk and path in changed and not os.path.exists(path):
+            continue
+        
+        # Lista exata do sync: o que não está nela não mudou (nem stat)
+        if changed is not None and prev and path not in changed:
+            index["files"].append(prev)
+            continue
+        
+        st = os.stat(path)
+        
+        # Caminho rápido: nada mudou no disco, reaproveita a entrada
+        if prev and prev.get("size") == st.st_size and prev.get("mtime") == st.st_mtime \
+                and (changed is None or path not in changed):
+            layouts.layout_of(prev)  # entradas de antes do fingerprint
+            index["files"].append(prev)
+            continue
+        
+        # Escrita em andamento: mantém a versão anterior (se houver) por enquanto
+        if settle and now - st.st_mtime < settle:
+            if prev:
+                index["files"].append(prev)
+            continue
+        
+        sha = file_sha256(path)
+        if prev and prev.get("sha256") == sha:
+            # Só o mtime mudou (touch/cópia): mesmo conteúdo, mesmo status
+            prev.update({"size": st.st_size, "mtime": st.st_mtime})
+            layouts.layout_of(prev)
+            index["files"].append(prev)
+            continue
+        
+        # Tenta extrair contexto do caminho (Ex: fazenda/SOJA/2025/arquivo.pdf)
+        parts = path.replace(BASE_DIR, "").strip("/").split("/")
+        
+        cultura = "DESCONHECIDO"
+        ano = "DESCONHECIDO"
+        
+        # Heurística simples para pasta estruturada
+        if len(parts) >= 2:
+            if parts[0] in ["SOJA", "MILHO"]:
+                cultura = parts[0]
+            if re.match(r"20\d{2}", parts[1]): # Se parece um ano (2020-2029)
+                ano = parts[1]
+        
+        # Se não pegou da pasta, tenta do nome do arquivo
+        if cultura == "DESCONHECIDO":
+            if "SOJA" in file.upper(): cultura = "SOJA"
+            if "MILHO" in file.upper(): cultura = "MILHO"
+        
+        doc_type = classify_file(file)
+        # Layout vem do conteúdo (1ª página), em cache pelo SHA-256
+        layout = layouts.fingerprint(path, sha)["layout"]
+        
+        entry = {
+            "path": path,
+            "filename": file,
+            "cultura": cultura,
+            "ano_safra": ano,
+            "tipo": doc_type,
+            "layout": layout,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha256": sha,
+            "parser_version": None,
+            "status": STATUS_INDEXED
+        }
+        
+        if prev:
+            alterados += 1
+        else:
+            novos += 1
+        index["files"].append(entry)
+        print(f"📄 [{doc_type}/{layout}] {file} ({cultura} {ano})")
 
+    removidos = len(set(previous) - {e['path'] for e in index['files']})
+    
     # Salva o index
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(index, f, indent=2, ensure_ascii=False)
+    save_index(index, OUTPUT_FILE)
+    layouts.save_cache()
         
-    print(f"\n✅ Indexação concluída. {len(index['files'])} arquivos mapeados.")
+    print(f"\n✅ Indexação concluída. {len(index['files'])} arquivos mapeados "
+          f"({novos} novos, {alterados} alterados, {removidos} removidos).")
     print(f"📁 Índice salvo em: {OUTPUT_FILE}")
 
+def read_changes(path):
+    """Caminhos alterados gravados pelo sync_drive (um por linha); None se não há lista."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
 if __name__ == "__main__":
-    index_files()
+    # --changed ARQUIVO: lista do sync_drive (data/drive_changes.txt)
+    if "--changed" in sys.argv:
+        index_files(changed=read_changes(sys.argv[sys.argv.index("--changed") + 1]))
+    else:
+        index_files()
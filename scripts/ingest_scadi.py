@@ -1,20 +1,350 @@
 import os
+import sys
 import time
-# Placeholder para script de ingestão
-# Futuramente integrará:
-# 1. Watchdog para pasta Drive
-# 2. Pipeline: PDF -> Imagem -> Vision API -> JSON -> CSV
+import queue
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-def scan_drive_folder():
-    print("Iniciando varredura da pasta fazenda/...")
-    # Lógica de verificação de novos arquivos
-    pass
+import index_files
+import extract_scadi
+import extract_metrics_v2
+import build_db
+import profiling
+from pdf_pool import default_workers
 
-def process_cost_pdf(filepath):
-    print(f"Processando custo: {filepath}")
-    # Lógica de extração
-    pass
+# Serviço de ingestão: observa a árvore fazenda/{CULTURA}/{ANO}/ e leva cada
+# PDF novo ou alterado até custos_operacionais.csv / produtividade.csv e o
+# database.json em segundos, sem o rebuild completo do daily_update.sh.
+#
+#   watcher (thread)  inotify (Linux) ou varredura periódica (fallback)
+#        │            eventos de escrita parcial são agrupados (debounce): o
+#        ▼            arquivo só segue depois de DEBOUNCE s sem mudar de tamanho
+#   fila limitada     QUEUE_SIZE caminhos; cheia, o watcher espera (backpressure)
+#        │
+#        ▼
+#   ingestão          drena a fila em lote e roda o pipeline incremental só com
+#                     os caminhos do lote (apagados saem do índice e dos CSVs):
+#                     index_files -> extract_scadi / extract_metrics_v2 -> build_db
+#                     num ProcessPoolExecutor aberto UMA vez: os workers ficam
+#                     com parsers, regexes e módulos carregados entre os lotes
+#
+# Uso:
+#   python3 scripts/ingest_scadi.py          # serviço (Ctrl+C / SIGTERM para parar)
+#   python3 scripts/ingest_scadi.py --once   # só a varredura inicial e sai
+
+# Config
+BASE_DIR = index_files.BASE_DIR
+DEBOUNCE = float(os.environ.get("TERRA_INGEST_DEBOUNCE", "1.0"))
+POLL_INTERVAL = float(os.environ.get("TERRA_INGEST_POLL", "5"))
+QUEUE_SIZE = int(os.environ.get("TERRA_INGEST_QUEUE", "64"))
+# TERRA_INGEST_INOTIFY=0 força a varredura periódica (ex.: pasta em rede/FUSE)
+USE_INOTIFY = os.environ.get("TERRA_INGEST_INOTIFY", "1") != "0"
+
+def is_pdf(path):
+    name = os.path.basename(path)
+    # Downloads em andamento costumam ser ocultos (.nome.pdf.part) ou temporários
+    return name.lower().endswith(".pdf") and not name.startswith(".")
+
+# --- Watchers ---------------------------------------------------------------
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (+ nome)
+
+class InotifyWatcher:
+    """Watch recursivo com inotify via libc (sem dependências externas)."""
+
+    def __init__(self, root):
+        self.root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("libc sem inotify")
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self.dirs = {}
+        self._add_tree(root)
+
+    def _add_tree(self, top):
+        """Observa `top` e subpastas; retorna os PDFs que já estão lá (criados antes do watch)."""
+        found = []
+        for dirpath, _, filenames in os.walk(top):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                # ENOSPC = fs.inotify.max_user_watches esgotado
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch falhou em {dirpath}")
+            self.dirs[wd] = dirpath
+            found += [os.path.join(dirpath, f) for f in filenames]
+        return found
+
+    def poll(self, timeout):
+        """Caminhos que mudaram (None = perdeu eventos, precisa de varredura completa)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        changed = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b"\0"))
+            pos += length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, name)
+            if mask & IN_ISDIR:
+                # Pasta nova (ex.: fazenda/SOJA/2026): observa e pega o que já caiu nela
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed += self._add_tree(path)
+                continue
+            changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollWatcher:
+    """Fallback: compara (tamanho, mtime) de todos os PDFs a cada POLL_INTERVAL."""
+
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_size, st.st_mtime)
+        return snapshot
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self._scan()
+        changed = [p for p, sig in current.items() if self.snapshot.get(p) != sig]
+        changed += [p for p in self.snapshot if p not in current]
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+def make_watcher(root):
+    if USE_INOTIFY and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except OSError as e:
+            print(f"⚠️ inotify indisponível ({e}): usando varredura a cada {POLL_INTERVAL:g}s")
+    return PollWatcher(root)
+
+# --- Debounce ---------------------------------------------------------------
+
+class Debouncer:
+    """
+    Segura cada caminho até ele ficar DEBOUNCE s sem eventos e com o mesmo
+    tamanho em duas leituras (cópias/sync ainda escrevendo não passam).
+    """
+
+    def __init__(self, delay=DEBOUNCE):
+        self.delay = delay
+        self.pending = {}  # caminho -> (último evento, tamanho visto)
+
+    def touch(self, path, now=None):
+        self.pending[path] = (now or time.monotonic(), _size(path))
+
+    def ready(self, now=None):
+        now = now or time.monotonic()
+        out = []
+        for path, (last, size) in list(self.pending.items()):
+            if now - last < self.delay:
+                continue
+            current = _size(path)
+            if current != size:
+                self.pending[path] = (now, current)  # ainda crescendo
+                continue
+            del self.pending[path]
+            out.append(path)
+        return out
+
+    def next_deadline(self, now=None):
+        """Segundos até o próximo caminho poder sair (limita o timeout do watcher)."""
+        if not self.pending:
+            return None
+        now = now or time.monotonic()
+        return max(0.0, min(last for last, _ in self.pending.values()) + self.delay - now)
+
+def _size(path):
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None  # removido: segue para a ingestão, que tira do índice e dos CSVs
+
+# --- Serviço ------------------------------------------------------------------
+
+RESCAN = "<rescan>"  # marcador na fila: eventos perdidos, reprocessa a árvore
+
+def watch(watcher, work, stop):
+    """Thread do watcher: eventos -> debounce -> fila limitada. Fecha o watcher ao sair."""
+    debouncer = Debouncer()
+    print(f"👀 Observando {watcher.root} ({type(watcher).__name__}, debounce {DEBOUNCE:g}s)")
+    try:
+        while not stop.is_set():
+            deadline = debouncer.next_deadline()
+            timeout = 1.0 if deadline is None else min(1.0, deadline)
+            changed = watcher.poll(timeout)
+            if changed is None:
+                print("⚠️ Fila do inotify estourou: varredura completa")
+                _put(work, RESCAN, stop)
+                continue
+            for path in changed:
+                if is_pdf(path):
+                    debouncer.touch(path)
+            for path in debouncer.ready():
+                _put(work, path, stop)
+    finally:
+        watcher.close()
+
+def _put(work, item, stop):
+    # Fila cheia = ingestão atrasada: espera em vez de acumular eventos sem limite
+    while not stop.is_set():
+        try:
+            work.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+def drain(work, first):
+    batch = [first]
+    while True:
+        try:
+            batch.append(work.get_nowait())
+        except queue.Empty:
+            return batch
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+def ingest(executor, changed=None):
+    """
+    Um ciclo do pipeline incremental: só o que é novo/alterado no índice
+    é extraído; os CSVs são mesclados e o database.json remontado a partir deles.
+    `changed` (caminhos do lote): só eles são olhados no índice (sem varrer a
+    árvore), só roda o extrator do tipo deles e o build_db só roda se algum
+    CSV mudou. Sem `changed` (varredura inicial/RESCAN), tudo.
+    """
+    with profiling.run("ingest_scadi"):
+        if changed is None:
+            kinds = {"CUSTO", "PRODUTIVIDADE"}
+            index_files.index_files(settle=DEBOUNCE)
+        else:
+            # Apagados também contam: o tipo vem do nome, como no índice
+            kinds = {index_files.classify_file(os.path.basename(p)) for p in changed}
+            index_files.index_files(settle=DEBOUNCE, changed=changed, walk=False)
+        csvs = (extract_scadi.DB_FILE, extract_metrics_v2.PROD_DB_FILE)
+        before = [_stamp(p) for p in csvs]
+        if "CUSTO" in kinds:
+            extract_scadi.run_extraction(executor)
+        if "PRODUTIVIDADE" in kinds:
+            extract_metrics_v2.extract_productivity(executor)
+        if changed is None or [_stamp(p) for p in csvs] != before:
+            build_db.build_bi_database()
+        else:
+            print("✅ CSVs sem mudança: database.json mantido.")
+
+def scan_drive_folder(executor):
+    """Varredura inicial: pega o que chegou com o serviço parado."""
+    print(f"Iniciando varredura da pasta {BASE_DIR}...")
+    ingest(executor)
+
+def _warm(_):
+    return os.getpid()
+
+def serve():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    # Pool aberto uma vez: os workers herdam os módulos já importados e
+    # ficam vivos entre os lotes (sem fork/import por arquivo)
+    workers = default_workers()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Sobe todos os workers antes da thread do watcher (fork sem threads rodando)
+        list(executor.map(_warm, range(workers)))
+        # Watcher criado ANTES da varredura inicial: o que chegar durante ela
+        # fica na fila do inotify (ou fora da foto do PollWatcher) e vira lote
+        # logo depois, em vez de esperar o próximo reinício
+        watcher = None if "--once" in sys.argv else make_watcher(BASE_DIR)
+        try:
+            scan_drive_folder(executor)
+        except BaseException:
+            if watcher:
+                watcher.close()
+            raise
+        if watcher is None:
+            return
+
+        work = queue.Queue(maxsize=QUEUE_SIZE)
+        thread = threading.Thread(target=watch, args=(watcher, work, stop), daemon=True)
+        thread.start()
+        try:
+            while not stop.is_set():
+                try:
+                    first = work.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                batch = drain(work, first)
+                files = [p for p in batch if p != RESCAN]
+                start = time.perf_counter()
+                print(f"\n📥 {len(files)} arquivo(s) novo(s)/alterado(s): "
+                      + ", ".join(os.path.basename(p) for p in files[:5])
+                      + (" ..." if len(files) > 5 else ""))
+                try:
+                    # Eventos perdidos: varredura completa; senão só o lote
+                    ingest(executor, None if RESCAN in batch else set(files))
+                except Exception as e:
+                    # Um lote com problema não derruba o serviço
+                    print(f"❌ Falha na ingestão: {type(e).__name__}: {e}")
+                    continue
+                print(f"⚡ Lote ingerido em {time.perf_counter() - start:.2f}s")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            thread.join(timeout=5)
+    print("🛑 Serviço de ingestão encerrado.")
 
 if __name__ == "__main__":
-    print("TERRA Ingestion Service v0.1")
-    scan_drive_folder()
+    print("TERRA Ingestion Service v0.2")
+    serve()
@@ -0,0 +1,341 @@
+import os
+import re
+import json
+from operator import itemgetter
+from collections import namedtuple
+
+import pdf_text
+from pdf_text import iter_lines
+from scadi_patterns import (
+    classify_line, classify_raw, RE_DECIMAL_PAIR, HEADER, LAVOURA, TOTAL, ROW, SAFRA_ROW,
+)
+from text_cache import file_sha256, PROJECT_DIR
+
+# Detecção de layout dos relatórios Scadi pelo conteúdo, não pelo nome do arquivo.
+#
+# O fingerprint vem da primeira página: a linha de cabeçalho de colunas diz
+# QUAL relatório é, e as linhas de dados logo abaixo dão as posições fixas
+# das colunas no -layout (faixas de espaço comuns a todas as linhas).
+# Com isso o parser fatia cada linha nos cortes em vez de tentar regex:
+#
+#   fp = fingerprint(pdf_path, sha256)        # {"layout", "header", "cuts", ...}
+#   for kind, value in iter_cells(lines, fp):
+#       LAVOURA -> value é a linha "Lavoura : ..."
+#       ROW     -> value é a lista de células (só as colunas que o layout usa)
+#       None    -> value é a linha crua (não coube nos cortes; parser usa o regex)
+#
+# O pdftotext desloca as colunas de uma seção/página para outra, então cada
+# cabeçalho de colunas re-ancora os cortes (calculados de novo para aquele bloco).
+# O fingerprint fica em cache por SHA-256 do PDF em data/cache/layouts.json.
+# Os cortes dependem do espaçamento do extrator: trocar TERRA_PDF_BACKEND
+# re-detecta.
+
+# Config
+CACHE_FILE = os.environ.get("TERRA_LAYOUT_CACHE", os.path.join(PROJECT_DIR, "data", "cache", "layouts.json"))
+
+# Subir quando a detecção/cortes mudarem invalida os fingerprints em cache
+LAYOUT_VERSION = 1
+
+# Layouts
+CUSTO_CATEGORIA = "custo_categoria"
+CUSTO_APLICACAO = "custo_aplicacao"
+PRODUTIVIDADE = "produtividade"
+CONTRATO = "contrato"
+DESCONHECIDO = "desconhecido"
+
+# header:  regex da linha de cabeçalho de colunas (None = layout sem fatiador)
+# title:   regex de título/filtro que identifica o layout quando não há cabeçalho
+# columns: nº de colunas esperado (None = variável)
+# fields:  colunas que o parser usa, na ordem em que saem (None = todas)
+# sample:  linhas usadas para achar os cortes (fora do caminho quente)
+# is_row:  confere as células (já só as de `fields`) de uma linha fatiada
+Layout = namedtuple("Layout", ["header", "title", "columns", "fields", "sample", "is_row"])
+
+LAYOUTS = {
+    # Talhão  Variedade  Plantado  Colhido  %  A Colher  Início  Fim  + 3x4 (Bruto/Descontos/Líquido)
+    PRODUTIVIDADE: Layout(
+        re.compile(r'\s*Talh[ãa]o\s+Variedade\b'),
+        re.compile(r'Acompanhamento da Colheita'),
+        20,
+        # talhão, variedade, área plantada, produção líquida (sc), produtividade líquida (sc/ha)
+        (0, 1, 2, 17, 19),
+        lambda kind, line: RE_DECIMAL_PAIR.search(line),
+        lambda cells: cells[0] and cells[4][-3:-2] == ",",
+    ),
+    # APLICAÇÃO  SAFRA  FAZENDA  R$  valor  x,xx sc/ha  R$  custo/ha
+    CUSTO_APLICACAO: Layout(
+        re.compile(r'\s*APLICA[ÇC][ÃA]O\s+SAFRA\s+FAZENDA\b'),
+        re.compile(r'CUSTO POR APLICA[ÇC][ÃA]O'),
+        8,
+        # aplicação, safra, fazenda, "R$", valor, custo/ha
+        (0, 1, 2, 3, 4, 7),
+        lambda kind, line: "R$" in line,
+        lambda cells: cells[1] and cells[3] == "R$",
+    ),
+    # SAFRA  CULTURA  APLICAÇÃO  ITEM  R$ valor  R$ custo/ha  x,xxxx sc/ha
+    CUSTO_CATEGORIA: Layout(
+        re.compile(r'\s*SAFRA\s+CULTURA\b'),
+        re.compile(r'CUSTO POR CATEGORIA'),
+        None,
+        None,
+        lambda kind, line: kind == SAFRA_ROW and "R$" in line,
+        lambda cells: cells[0][:2] == "20",
+    ),
+    # Ainda sem parser (extract_contracts é placeholder): só é roteado
+    CONTRATO: Layout(None, re.compile(r'CONTRATO', re.I), None, None, None, None),
+}
+
+# byte -> 0 se espaço, 1 se tinta
+_INK_TABLE = bytes(0 if c == 32 else 1 for c in range(256))
+
+_cache = None
+_dirty = False
+
+# --- Colunas fixas ----------------------------------------------------------
+
+def column_cuts(rows, min_gap=2):
+    """
+    Cortes entre colunas: o meio de cada faixa de >= min_gap espaços que é
+    branca em TODAS as linhas de dados. Números alinhados à direita podem
+    crescer para dentro da faixa sem cruzar o corte.
+    """
+    if not rows:
+        return []
+    width = max(len(r) for r in rows)
+    # Máscara de tinta (1 = algum caractere) de cada linha, somadas por OR
+    # como inteiros: tudo em C, sem laço por caractere
+    ink = 0
+    for row in rows:
+        mask = row.ljust(width).encode("latin-1", "replace").translate(_INK_TABLE)
+        ink |= int.from_bytes(mask, "big")
+    ink = ink.to_bytes(width, "big")
+
+    # Faixas brancas entre a primeira e a última coluna (ignora as margens)
+    gutter = re.compile(rb"\x00{%d,}" % min_gap)
+    first, last = ink.find(1), ink.rfind(1)
+    return [(m.start() + m.end()) // 2 for m in gutter.finditer(ink, first, last)]
+
+def slice_cols(line, cuts):
+    """Células da linha nos cortes fixos, ou None se um valor cruza um corte."""
+    if not cuts:
+        return [line.strip()]
+    return _slice(line, _slicer(cuts))
+
+def _slicer(cuts, fields=None):
+    """
+    Pré-calcula (uma vez por bloco) os getters das colunas pedidas e dos
+    caracteres dos dois lados de cada corte, para fatiar a linha sem laço em Python.
+    """
+    bounds = [0, *cuts, None]
+    slices = [slice(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+    if fields:
+        slices = [slices[i] for i in fields]
+    cells = itemgetter(*slices)
+    edges = itemgetter(*[pos for cut in cuts for pos in (cut - 1, cut)])
+    return cuts, cells, edges
+
+def _slice(line, slicer):
+    cuts, cells, edges = slicer
+    if len(line) > cuts[-1]:
+        # Valor cruzando um corte = tinta dos dois lados dele
+        ink = "".join(edges(line)).encode("latin-1", "replace").translate(_INK_TABLE)
+        if int.from_bytes(ink[0::2], "big") & int.from_bytes(ink[1::2], "big"):
+            return None
+    else:
+        n = len(line)
+        for cut in cuts:
+            if cut < n and " " not in line[cut - 1:cut + 1]:
+                return None
+    return list(map(str.strip, cells(line)))
+
+def _block_cuts(layout, rows):
+    """Cortes de um bloco de linhas de dados, ou None se não batem com o layout."""
+    cuts = column_cuts(rows)
+    if not cuts:
+        return None
+    if layout.columns and len(cuts) + 1 != layout.columns:
+        return None
+    return cuts
+
+# --- Detecção ---------------------------------------------------------------
+
+def _header_layout(line):
+    for name, layout in LAYOUTS.items():
+        if layout.header and layout.header.match(line):
+            return name
+    return None
+
+def detect(lines):
+    """
+    Fingerprint a partir das linhas da primeira página: layout, linha de
+    cabeçalho de colunas e os cortes do primeiro bloco de dados.
+    """
+    name = None
+    header = None
+    title = None
+    rows = []
+
+    for i, line in enumerate(lines):
+        if i and line.startswith("\f"):
+            break  # só a primeira página
+        line = line.lstrip("\f")
+        # classify_raw: a detecção não entra nas contagens do profiling
+        kind = classify_raw(line)
+
+        if name is None:
+            name = _header_layout(line)
+            if name:
+                header = line.rstrip()
+                continue
+            if title is None:
+                for candidate, layout in LAYOUTS.items():
+                    if layout.title.search(line):
+                        title = candidate
+                        break
+            # CUSTO POR CATEGORIA sem cabeçalho reconhecido: linhas começam pela safra
+            if title is None and kind == SAFRA_ROW and "R$" in line:
+                title = CUSTO_CATEGORIA
+            if title is None or LAYOUTS[title].sample is None:
+                continue
+            if LAYOUTS[title].sample(kind, line):
+                rows.append(line)
+            continue
+
+        # Primeiro bloco termina no próximo cabeçalho ou na linha de totais
+        if kind == TOTAL or (kind == HEADER and _header_layout(line)):
+            if rows:
+                break
+            continue
+        if (kind == ROW or kind == SAFRA_ROW) and LAYOUTS[name].sample(kind, line):
+            rows.append(line)
+
+    name = name or title or DESCONHECIDO
+    layout = LAYOUTS.get(name)
+    cuts = _block_cuts(layout, rows) if layout and layout.sample else None
+    return {"version": LAYOUT_VERSION, "layout": name, "header": header, "cuts": cuts}
+
+# --- Cache por conteúdo -----------------------------------------------------
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(CACHE_FILE, "r") as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+def save_cache():
+    """Grava os fingerprints novos (tmp + rename). Chamar uma vez por lote."""
+    global _dirty
+    if not _dirty:
+        return
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    tmp = f"{CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(_cache, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, CACHE_FILE)
+    _dirty = False
+
+def fingerprint(pdf_path, sha256=None):
+    """
+    Fingerprint do PDF, em cache pelo SHA-256 (renomear/mover não re-detecta).
+    No miss só a primeira página é extraída (pdftotext -l 1).
+    """
+    global _dirty
+    sha = sha256 or file_sha256(pdf_path)
+    cache = _load_cache()
+    fp = cache.get(sha)
+    if fp and fp.get("version") == LAYOUT_VERSION and fp.get("backend", "pdftotext") == pdf_text.BACKEND:
+        return fp
+
+    fp = detect(iter_lines(pdf_path, last_page=1, sha256=sha))
+    fp["backend"] = pdf_text.BACKEND
+    # Falha de extração não vira fingerprint permanente
+    if fp["layout"] != DESCONHECIDO:
+        cache[sha] = fp
+        _dirty = True
+    return fp
+
+def layout_of(entry):
+    """Layout da entrada do índice (detecta e grava na entrada se ainda não tiver)."""
+    if "layout" not in entry:
+        if not os.path.exists(entry["path"]):
+            return DESCONHECIDO
+        entry["layout"] = fingerprint(entry["path"], entry.get("sha256"))["layout"]
+    return entry["layout"]
+
+# --- Fatiador ---------------------------------------------------------------
+
+def iter_cells(lines, fp=None, partial=False):
+    """
+    Percorre as linhas do relatório e gera (tipo, valor) só do que interessa
+    aos parsers: (LAVOURA, linha), (ROW, células de layout.fields) ou
+    (None, linha) para linhas de dados que não couberam nos cortes. Sem
+    fingerprint (ou layout sem fatiador) toda linha de dados sai como (None, linha).
+    `partial`: o texto é um intervalo de páginas do meio do PDF; até o
+    primeiro cabeçalho os cortes da 1ª página não valem e as linhas saem cruas.
+    """
+    layout = LAYOUTS.get(fp["layout"]) if fp else None
+    if not layout or not layout.sample:
+        for line in lines:
+            kind = classify_line(line)
+            if kind == LAVOURA:
+                yield LAVOURA, line
+            elif kind == ROW or kind == SAFRA_ROW:
+                yield None, line
+        return
+
+    slicer = _slicer(fp["cuts"], layout.fields) if fp["cuts"] and not partial else None
+    anchors = {fp["header"]: slicer}
+    pending = None  # (cabeçalho, linhas) de um bloco com cabeçalho ainda não visto
+
+    for line in lines:
+        if line.startswith("\f"):
+            line = line[1:]  # o \f do início de página desloca as posições
+        kind = classify_line(line)
+
+        if kind == HEADER and layout.header and layout.header.match(line):
+            if pending:
+                yield from _flush(layout, anchors, pending)
+                pending = None
+            key = line.rstrip()
+            if key in anchors:
+                slicer = anchors[key]
+            else:
+                pending = (key, [])
+            continue
+
+        if pending:
+            pending[1].append((kind, line))
+            continue
+
+        if kind == ROW or kind == SAFRA_ROW:
+            cells = _slice(line, slicer) if slicer else None
+            if cells and layout.is_row(cells):
+                yield ROW, cells
+            else:
+                yield None, line
+        elif kind == LAVOURA:
+            yield LAVOURA, line
+
+    if pending:
+        yield from _flush(layout, anchors, pending)
+
+def _flush(layout, anchors, pending):
+    """Re-ancora: calcula os cortes do bloco bufferizado e emite suas linhas."""
+    key, block = pending
+    rows = [line for kind, line in block
+            if (kind == ROW or kind == SAFRA_ROW) and layout.sample(kind, line)]
+    cuts = _block_cuts(layout, rows)
+    slicer = anchors[key] = _slicer(cuts, layout.fields) if cuts else None
+    for kind, line in block:
+        if kind == ROW or kind == SAFRA_ROW:
+            cells = _slice(line, slicer) if slicer else None
+            if cells and layout.is_row(cells):
+                yield ROW, cells
+            else:
+                yield None, line
+        elif kind == LAVOURA:
+            yield LAVOURA, line
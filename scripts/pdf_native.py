@@ -0,0 +1,791 @@
+import re
+import zlib
+import math
+import unicodedata
+from collections import namedtuple
+
+# Extrator de texto em Python puro: lê o PDF no próprio processo, sem poppler
+# e sem fork/exec de um pdftotext por arquivo (ou por intervalo de páginas).
+#
+# Cobre o que os relatórios Scadi usam: objetos soltos e em object streams
+# (/ObjStm do Excel), FlateDecode, fontes simples (WinAnsi + /Differences),
+# Type0 com ToUnicode, Form XObjects, páginas com /Rotate. A saída imita o
+# pdftotext -layout: cada glyph vai para a coluna x / largura média de
+# caractere, então as colunas do relatório continuam alinhadas por espaços.
+#
+#   for line in iter_text(pdf_path):   # linhas com '\n', '\f' entre páginas
+#       ...
+
+VERSION = "1"
+
+class PdfError(Exception):
+    """PDF que o extrator nativo não consegue ler."""
+
+Ref = namedtuple("Ref", ["num", "gen"])
+Stream = namedtuple("Stream", ["dict", "raw"])
+
+class Name(str):
+    """Nome PDF (/Font) sem a barra."""
+
+class Keyword(str):
+    """Palavra-chave / operador (obj, stream, Tj, BT...)."""
+
+# --- Léxico ------------------------------------------------------------------
+
+_WS = rb"\x00\t\n\f\r "
+_REGULAR = rb"[^\x00\t\n\f\r ()<>\[\]{}/%]"
+
+RE_TOKEN = re.compile(rb"""
+    (?P<ws>[\x00\t\n\f\r ]+|%[^\r\n]*)
+  | (?P<dict_open><<)
+  | (?P<dict_close>>>)
+  | (?P<hex><[0-9A-Fa-f\x00\t\n\f\r ]*>)
+  | (?P<array_open>\[)
+  | (?P<array_close>\])
+  | (?P<name>/""" + _REGULAR + rb"""*)
+  | (?P<number>[+-]?(?:\d+\.\d*|\.\d+|\d+)(?!""" + _REGULAR + rb"""))
+  | (?P<string>\()
+  | (?P<keyword>""" + _REGULAR + rb"""+)
+""", re.X)
+
+RE_REF_TAIL = re.compile(rb"[\x00\t\n\f\r ]+(\d+)[\x00\t\n\f\r ]+R(?!" + _REGULAR + rb")")
+RE_STRING_SPECIAL = re.compile(rb"[()\\]")
+RE_NAME_ESCAPE = re.compile(rb"#([0-9A-Fa-f]{2})")
+RE_OBJ = re.compile(rb"(?<!\d)(\d+)[\x00\t\n\f\r ]+(\d+)[\x00\t\n\f\r ]+obj(?!" + _REGULAR + rb")")
+RE_STREAM = re.compile(rb"[\x00\t\n\f\r ]*stream(?:\r\n|\n|\r)?")
+# Tokens de content stream, na ordem de frequência (números e operadores dominam)
+RE_CONTENT_TOKEN = re.compile(rb"""[\x00\t\n\f\r ]*(?:
+    (?P<number>[+-]?(?:\d+\.?\d*|\.\d+))(?!""" + _REGULAR + rb""")
+  | (?P<op>[A-Za-z'"][^\x00\t\n\f\r ()<>\[\]{}/%]*)
+  | (?P<name>/""" + _REGULAR + rb"""*)
+  | (?P<string>\()
+  | (?P<array_open>\[)
+  | (?P<array_close>\])
+  | (?P<dict_open><<)
+  | (?P<hex><[0-9A-Fa-f\x00\t\n\f\r ]*>)
+  | (?P<other>>>|%[^\r\n]*)
+)""", re.X)
+RE_INLINE_IMAGE_END = re.compile(rb"[\x00\t\n\f\r ]EI(?=[\x00\t\n\f\r ]|$)")
+
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f",
+            b"(": b"(", b")": b")", b"\\": b"\\"}
+
+# Fim de array/dict devolvido por parse_value
+_ARRAY_END = object()
+_DICT_END = object()
+
+def _read_string(data, pos):
+    """String literal a partir de pos (logo depois do '('): (bytes, nova posição)."""
+    out = bytearray()
+    depth = 1
+    while True:
+        m = RE_STRING_SPECIAL.search(data, pos)
+        if not m:
+            raise PdfError("string literal sem fim")
+        out += data[pos:m.start()]
+        c = data[m.start()]
+        pos = m.end()
+        if c == 0x5C:  # barra invertida
+            esc = data[pos:pos + 1]
+            if esc in _ESCAPES:
+                out += _ESCAPES[esc]
+                pos += 1
+            elif esc.isdigit():
+                octal = re.match(rb"[0-7]{1,3}", data[pos:pos + 3])
+                if octal:
+                    out.append(int(octal.group(), 8) & 0xFF)
+                    pos += len(octal.group())
+                else:
+                    out += esc
+                    pos += 1
+            elif esc == b"\r":
+                pos += 2 if data[pos + 1:pos + 2] == b"\n" else 1
+            elif esc == b"\n":
+                pos += 1
+            else:
+                out += esc
+                pos += 1
+        elif c == 0x28:
+            depth += 1
+            out.append(c)
+        else:
+            depth -= 1
+            if depth == 0:
+                return bytes(out), pos
+            out.append(c)
+
+def _hex_string(tok):
+    digits = re.sub(rb"[^0-9A-Fa-f]", b"", tok)
+    if len(digits) % 2:
+        digits += b"0"
+    return bytes.fromhex(digits.decode("ascii"))
+
+def parse_value(data, pos):
+    """Próximo objeto PDF a partir de pos: (valor, nova posição)."""
+    while True:
+        m = RE_TOKEN.match(data, pos)
+        if not m:
+            raise PdfError(f"token inválido na posição {pos}")
+        kind = m.lastgroup
+        pos = m.end()
+        if kind == "ws":
+            continue
+        tok = m.group(kind)
+
+        if kind == "number":
+            if b"." in tok:
+                return float(tok), pos
+            n = int(tok)
+            ref = RE_REF_TAIL.match(data, pos)
+            if ref:
+                return Ref(n, int(ref.group(1))), ref.end()
+            return n, pos
+        if kind == "name":
+            name = RE_NAME_ESCAPE.sub(lambda e: bytes([int(e.group(1), 16)]), tok[1:])
+            return Name(name.decode("latin-1")), pos
+        if kind == "string":
+            return _read_string(data, pos)
+        if kind == "hex":
+            return _hex_string(tok[1:-1]), pos
+        if kind == "array_open":
+            items = []
+            while True:
+                value, pos = parse_value(data, pos)
+                if value is _ARRAY_END:
+                    return items, pos
+                items.append(value)
+        if kind == "dict_open":
+            d = {}
+            while True:
+                key, pos = parse_value(data, pos)
+                if key is _DICT_END:
+                    return d, pos
+                value, pos = parse_value(data, pos)
+                d[key] = value
+        if kind == "array_close":
+            return _ARRAY_END, pos
+        if kind == "dict_close":
+            return _DICT_END, pos
+
+        if tok == b"true":
+            return True, pos
+        if tok == b"false":
+            return False, pos
+        if tok == b"null":
+            return None, pos
+        return Keyword(tok.decode("latin-1")), pos
+
+# --- Filtros -----------------------------------------------------------------
+
+def _png_unpredict(data, columns, colors=1, bpc=8):
+    bpp = max(1, colors * bpc // 8)
+    row_len = (columns * colors * bpc + 7) // 8
+    out = bytearray()
+    prev = bytearray(row_len)
+    for i in range(0, len(data), row_len + 1):
+        ftype = data[i]
+        row = bytearray(data[i + 1:i + 1 + row_len])
+        for j in range(len(row)):
+            left = row[j - bpp] if j >= bpp else 0
+            up = prev[j]
+            if ftype == 1:
+                row[j] = (row[j] + left) & 0xFF
+            elif ftype == 2:
+                row[j] = (row[j] + up) & 0xFF
+            elif ftype == 3:
+                row[j] = (row[j] + (left + up) // 2) & 0xFF
+            elif ftype == 4:
+                up_left = prev[j - bpp] if j >= bpp else 0
+                p = left + up - up_left
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - up_left)
+                pred = left if pa <= pb and pa <= pc else up if pb <= pc else up_left
+                row[j] = (row[j] + pred) & 0xFF
+        out += row
+        prev = row
+    return bytes(out)
+
+def _flate(data):
+    try:
+        return zlib.decompress(data)
+    except zlib.error:
+        # Stream truncado/com lixo no fim: aproveita o que descomprimir
+        return zlib.decompressobj().decompress(data)
+
+# --- Documento ---------------------------------------------------------------
+
+class Document:
+    """
+    Objetos do PDF, achados varrendo o arquivo ("N G obj") em vez de confiar
+    na tabela xref; objetos dentro de /ObjStm são indexados à parte.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.offsets = {}      # nº do objeto -> posição do valor
+        self.in_stream = {}    # nº do objeto -> (nº do ObjStm, índice)
+        self.root = None
+        self._objects = {}
+        self._fonts = {}
+        self._scan()
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def _scan(self):
+        data = self.data
+        obj_streams = []
+        pos = 0
+        while True:
+            m = RE_OBJ.search(data, pos)
+            if not m:
+                break
+            num = int(m.group(1))
+            self.offsets[num] = m.end()
+            try:
+                value, end = parse_value(data, m.end())
+            except (PdfError, ValueError, RecursionError):
+                pos = m.end()
+                continue
+            pos = end
+            if isinstance(value, dict):
+                if value.get("Root") is not None:
+                    self.root = value["Root"]  # trailer em xref stream
+                if value.get("Type") == "ObjStm":
+                    obj_streams.append(num)
+                # Pula o conteúdo do stream: "obj" dentro de dados binários não conta
+                s = RE_STREAM.match(data, end)
+                if s:
+                    length = value.get("Length")
+                    if isinstance(length, int) and data[s.end() + length:s.end() + length + 40].find(b"endstream") != -1:
+                        pos = s.end() + length
+                    else:
+                        e = data.find(b"endstream", s.end())
+                        pos = e if e != -1 else len(data)
+
+        # Trailer clássico
+        t = data.rfind(b"trailer")
+        if t != -1:
+            try:
+                trailer, _ = parse_value(data, t + 7)
+                if isinstance(trailer, dict) and trailer.get("Root") is not None:
+                    self.root = trailer["Root"]
+            except PdfError:
+                pass
+
+        for num in obj_streams:
+            stream = self.get(num)
+            if not isinstance(stream, Stream):
+                continue
+            content = self.decode(stream)
+            n, first = stream.dict.get("N", 0), stream.dict.get("First", 0)
+            header = content[:first].split()
+            for i in range(min(n, len(header) // 2)):
+                inner = int(header[2 * i])
+                # Objeto solto no arquivo (revisão posterior) tem precedência
+                if inner not in self.offsets:
+                    self.in_stream[inner] = (num, first + int(header[2 * i + 1]))
+
+        if self.root is None:
+            for num in list(self.offsets) + list(self.in_stream):
+                obj = self.get(num)
+                if isinstance(obj, dict) and obj.get("Type") == "Catalog":
+                    self.root = Ref(num, 0)
+        if self.root is None:
+            raise PdfError("catálogo (/Root) não encontrado")
+
+    def get(self, num):
+        if num in self._objects:
+            return self._objects[num]
+        value = None
+        if num in self.offsets:
+            value, end = parse_value(self.data, self.offsets[num])
+            s = RE_STREAM.match(self.data, end) if isinstance(value, dict) else None
+            if s:
+                length = self.resolve(value.get("Length"))
+                start = s.end()
+                if isinstance(length, int) and self.data[start + length:start + length + 40].find(b"endstream") != -1:
+                    raw = self.data[start:start + length]
+                else:
+                    e = self.data.find(b"endstream", start)
+                    raw = self.data[start:e if e != -1 else len(self.data)].rstrip(b"\r\n")
+                value = Stream(value, raw)
+        elif num in self.in_stream:
+            stream_num, offset = self.in_stream[num]
+            value, _ = parse_value(self.decode(self.get(stream_num)), offset)
+        self._objects[num] = value
+        return value
+
+    def resolve(self, value):
+        while isinstance(value, Ref):
+            value = self.get(value.num)
+        return value
+
+    def decode(self, stream):
+        """Dados do stream sem os filtros (só Flate e sem filtro; imagens ficam de fora)."""
+        stream = self.resolve(stream)
+        data = stream.raw
+        filters = self.resolve(stream.dict.get("Filter"))
+        params = self.resolve(stream.dict.get("DecodeParms"))
+        if not isinstance(filters, list):
+            filters = [filters] if filters else []
+            params = [params]
+        elif not isinstance(params, list):
+            params = [params] * len(filters)
+        for f, p in zip(filters, params):
+            if f in ("FlateDecode", "Fl"):
+                data = _flate(data)
+                p = self.resolve(p) or {}
+                if p.get("Predictor", 1) >= 10:
+                    data = _png_unpredict(data, p.get("Columns", 1), p.get("Colors", 1),
+                                          p.get("BitsPerComponent", 8))
+            else:
+                raise PdfError(f"filtro não suportado: {f}")
+        return data
+
+    def pages(self):
+        """Páginas na ordem do documento: (dict, resources, caixa, rotação)."""
+        catalog = self.resolve(self.root)
+        out = []
+        self._walk(self.resolve(catalog.get("Pages")), {}, out, set())
+        return out
+
+    def _walk(self, node, inherited, out, seen):
+        if not isinstance(node, dict) or id(node) in seen:
+            return
+        seen.add(id(node))
+        attrs = dict(inherited)
+        for key in ("Resources", "MediaBox", "CropBox", "Rotate"):
+            if key in node:
+                attrs[key] = self.resolve(node[key])
+        if node.get("Type") == "Pages" or "Kids" in node:
+            for kid in self.resolve(node.get("Kids")) or []:
+                self._walk(self.resolve(kid), attrs, out, seen)
+            return
+        box = [float(self.resolve(v)) for v in (attrs.get("CropBox") or attrs.get("MediaBox") or [0, 0, 612, 792])]
+        out.append((node, attrs.get("Resources") or {}, box, int(attrs.get("Rotate") or 0) % 360))
+
+    def contents(self, page):
+        contents = self.resolve(page.get("Contents"))
+        if contents is None:
+            return b""
+        if isinstance(contents, list):
+            return b"\n".join(self.decode(self.resolve(c)) for c in contents)
+        return self.decode(contents)
+
+    def font(self, ref_or_dict):
+        key = ref_or_dict.num if isinstance(ref_or_dict, Ref) else id(ref_or_dict)
+        if key not in self._fonts:
+            self._fonts[key] = Font(self, self.resolve(ref_or_dict) or {})
+        return self._fonts[key]
+
+# --- Fontes ------------------------------------------------------------------
+
+_CP1252 = [bytes([i]).decode("cp1252", "replace") if i >= 32 else chr(i) for i in range(256)]
+_MAC_ROMAN = [bytes([i]).decode("mac_roman") for i in range(256)]
+
+_GLYPH_NAMES = {
+    "space": " ", "exclam": "!", "quotedbl": '"', "numbersign": "#", "dollar": "$",
+    "percent": "%", "ampersand": "&", "quotesingle": "'", "parenleft": "(",
+    "parenright": ")", "asterisk": "*", "plus": "+", "comma": ",", "hyphen": "-",
+    "period": ".", "slash": "/", "colon": ":", "semicolon": ";", "less": "<",
+    "equal": "=", "greater": ">", "question": "?", "at": "@", "bracketleft": "[",
+    "backslash": "\\", "bracketright": "]", "underscore": "_", "ordfeminine": "ª",
+    "ordmasculine": "º", "degree": "°", "endash": "–", "emdash": "—",
+    "quoteright": "’", "quoteleft": "‘", "bullet": "•", "germandbls": "ß",
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+    "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
+}
+_ACCENTS = {"acute": "ACUTE", "grave": "GRAVE", "circumflex": "CIRCUMFLEX",
+            "tilde": "TILDE", "dieresis": "DIAERESIS", "cedilla": "CEDILLA", "ring": "RING ABOVE"}
+
+def glyph_char(name):
+    """Caractere de um nome de glyph (/Differences), ou None."""
+    if len(name) == 1:
+        return name
+    if name in _GLYPH_NAMES:
+        return _GLYPH_NAMES[name]
+    m = re.match(r"u(?:ni)?([0-9A-Fa-f]{4,6})$", name)
+    if m:
+        return chr(int(m.group(1), 16))
+    for suffix, accent in _ACCENTS.items():
+        if name.endswith(suffix) and len(name) == len(suffix) + 1:
+            letter = name[0]
+            case = "CAPITAL" if letter.isupper() else "SMALL"
+            try:
+                return unicodedata.lookup(f"LATIN {case} LETTER {letter.upper()} WITH {accent}")
+            except KeyError:
+                return None
+    return None
+
+RE_BFCHAR = re.compile(rb"beginbfchar(.*?)endbfchar", re.S)
+RE_BFRANGE = re.compile(rb"beginbfrange(.*?)endbfrange", re.S)
+RE_HEX = re.compile(rb"<([0-9A-Fa-f\s]*)>|\[([^\]]*)\]")
+
+def _utf16(hex_bytes):
+    raw = _hex_string(hex_bytes)
+    return raw.decode("utf-16-be", "replace")
+
+def parse_tounicode(data):
+    """CMap ToUnicode (bfchar/bfrange) -> {código: texto}."""
+    cmap = {}
+    for block in RE_BFCHAR.findall(data):
+        items = re.findall(rb"<([0-9A-Fa-f\s]*)>", block)
+        for src, dst in zip(items[0::2], items[1::2]):
+            cmap[int(src.replace(b" ", b"") or b"0", 16)] = _utf16(dst)
+    for block in RE_BFRANGE.findall(data):
+        tokens = RE_HEX.findall(block)
+        i = 0
+        while i + 2 < len(tokens) + 0 and i + 2 <= len(tokens) - 1:
+            lo = int(tokens[i][0].replace(b" ", b"") or b"0", 16)
+            hi = int(tokens[i + 1][0].replace(b" ", b"") or b"0", 16)
+            dst_hex, dst_array = tokens[i + 2]
+            if dst_array:
+                for k, item in enumerate(re.findall(rb"<([0-9A-Fa-f\s]*)>", dst_array)):
+                    cmap[lo + k] = _utf16(item)
+            else:
+                base = _utf16(dst_hex)
+                for k in range(hi - lo + 1):
+                    cmap[lo + k] = base[:-1] + chr(ord(base[-1]) + k) if base else ""
+            i += 3
+    return cmap
+
+class Font:
+    """Decodificação (código -> texto) e larguras (1/1000 em) de uma fonte."""
+    def __init__(self, doc, fdict):
+        self.two_byte = fdict.get("Subtype") == "Type0"
+        self.widths = {}
+        self.default_width = 500.0
+        self.to_unicode = None
+
+        tu = doc.resolve(fdict.get("ToUnicode"))
+        if isinstance(tu, Stream):
+            try:
+                self.to_unicode = parse_tounicode(doc.decode(tu))
+            except (PdfError, ValueError, zlib.error):
+                self.to_unicode = None
+
+        if self.two_byte:
+            descendant = doc.resolve((doc.resolve(fdict.get("DescendantFonts")) or [{}])[0]) or {}
+            self.default_width = float(descendant.get("DW", 1000))
+            w = doc.resolve(descendant.get("W")) or []
+            i = 0
+            while i < len(w) - 1:
+                first = doc.resolve(w[i])
+                nxt = doc.resolve(w[i + 1])
+                if isinstance(nxt, list):
+                    for k, width in enumerate(nxt):
+                        self.widths[first + k] = float(doc.resolve(width))
+                    i += 2
+                elif i + 2 < len(w):
+                    for code in range(first, nxt + 1):
+                        self.widths[code] = float(doc.resolve(w[i + 2]))
+                    i += 3
+                else:
+                    break
+            self.encoding = None
+            return
+
+        first = doc.resolve(fdict.get("FirstChar")) or 0
+        for k, width in enumerate(doc.resolve(fdict.get("Widths")) or []):
+            self.widths[first + k] = float(doc.resolve(width))
+        descriptor = doc.resolve(fdict.get("FontDescriptor")) or {}
+        missing = doc.resolve(descriptor.get("MissingWidth"))
+        if missing:
+            self.default_width = float(missing)
+        elif self.widths:
+            nonzero = [w for w in self.widths.values() if w]
+            self.default_width = sum(nonzero) / len(nonzero) if nonzero else 500.0
+
+        encoding = doc.resolve(fdict.get("Encoding"))
+        base = encoding.get("BaseEncoding") if isinstance(encoding, dict) else encoding
+        table = list(_MAC_ROMAN if base == "MacRomanEncoding" else _CP1252)
+        if isinstance(encoding, dict):
+            code = 0
+            for item in doc.resolve(encoding.get("Differences")) or []:
+                item = doc.resolve(item)
+                if isinstance(item, int):
+                    code = item
+                elif isinstance(item, Name):
+                    ch = glyph_char(item)
+                    if ch is not None and 0 <= code < 256:
+                        table[code] = ch
+                    code += 1
+        self.encoding = table
+
+    def glyphs(self, s):
+        """(texto, largura em 1/1000 em, é espaço simples) de cada código da string."""
+        if self.two_byte:
+            codes = [(s[i] << 8) | s[i + 1] for i in range(0, len(s) - 1, 2)]
+        else:
+            codes = s
+        out = []
+        for code in codes:
+            if self.to_unicode is not None and code in self.to_unicode:
+                text = self.to_unicode[code]
+            elif self.encoding is not None:
+                text = self.encoding[code]
+            else:
+                text = ""
+            out.append((text, self.widths.get(code, self.default_width),
+                        code == 32 and not self.two_byte))
+        return out
+
+# --- Conteúdo da página -----------------------------------------------------
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+def _mult(m, n):
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D,
+            e * A + f * C + E, e * B + f * D + F)
+
+def _display(box, rotate):
+    """Função (x, y) do PDF -> (X, Y) da página exibida (Y para baixo)."""
+    x0, y0, x1, y1 = box
+    if rotate == 90:
+        return lambda x, y: (y - y0, x - x0)
+    if rotate == 180:
+        return lambda x, y: (x1 - x, y - y0)
+    if rotate == 270:
+        return lambda x, y: (y1 - y, x1 - x)
+    return lambda x, y: (x - x0, y1 - y)
+
+def page_glyphs(doc, page, resources, box, rotate):
+    """Glyphs da página: lista de (Y, X, largura, tamanho, texto) em coordenadas de exibição."""
+    glyphs = []
+    to_display = _display(box, rotate)
+    _run(doc, doc.contents(page), resources, IDENTITY, to_display, glyphs, 0)
+    return glyphs
+
+def _run(doc, content, resources, ctm, to_display, glyphs, depth):
+    fonts = doc.resolve(resources.get("Font")) or {}
+    xobjects = doc.resolve(resources.get("XObject")) or {}
+
+    stack = []
+    # Estado de texto (faz parte do estado gráfico: q/Q salvam junto)
+    font, size, tc, tw, th, tl, rise = None, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0
+    tm = tlm = IDENTITY
+    operands = []
+    arrays = []  # operandos de fora enquanto um [ ... ] está aberto
+    pos = 0
+    n = len(content)
+    match = RE_CONTENT_TOKEN.match
+
+    while True:
+        t = match(content, pos)
+        if t is None:
+            if not content[pos:].strip():
+                break
+            pos += 1  # byte inválido no meio do stream: ignora
+            continue
+        pos = t.end()
+        kind = t.lastgroup
+        if kind == "number":
+            operands.append(float(t.group(kind)))
+            continue
+        if kind == "name":
+            operands.append(Name(t.group(kind)[1:].decode("latin-1")))
+            continue
+        if kind == "string":
+            value, pos = _read_string(content, pos)
+            operands.append(value)
+            continue
+        if kind == "array_open":
+            arrays.append(operands)
+            operands = []
+            continue
+        if kind == "array_close":
+            if arrays:
+                value = operands
+                operands = arrays.pop()
+                operands.append(value)
+            continue
+        if kind == "hex":
+            operands.append(_hex_string(t.group(kind)[1:-1]))
+            continue
+        if kind == "dict_open":
+            # Propriedades inline (BDC <</MCID 0>>): não interessam, mas ocupam operando
+            value, pos = parse_value(content, t.start(kind))
+            operands.append(value)
+            continue
+        if kind != "op":
+            continue  # comentário, ">>" solto
+
+        op = t.group(kind).decode("latin-1")
+        if arrays:
+            # Operador dentro de array (stream malformado): fecha os arrays abertos
+            operands = arrays[0]
+            arrays = []
+        try:
+            if op == "TJ" or op == "Tj" or op == "'" or op == '"':
+                if op == "'":
+                    tlm = _mult((1, 0, 0, 1, 0, -tl), tlm)
+                    tm = tlm
+                elif op == '"':
+                    tw, tc = float(operands[0]), float(operands[1])
+                    tlm = _mult((1, 0, 0, 1, 0, -tl), tlm)
+                    tm = tlm
+                items = operands[-1] if op == "TJ" else [operands[-1]]
+                if font is None or not isinstance(items, list):
+                    items = ()
+                m = _mult(tm, ctm)
+                scale_x = math.hypot(m[0], m[1])
+                scale_y = math.hypot(m[2], m[3])
+                tx = 0.0
+                for item in items:
+                    if isinstance(item, float):
+                        tx -= item / 1000.0 * size * th
+                        continue
+                    if not isinstance(item, bytes):
+                        continue
+                    for text, w0, is_space in font.glyphs(item):
+                        advance = (w0 / 1000.0 * size + tc + (tw if is_space else 0.0)) * th
+                        if text:
+                            x = m[0] * tx + m[2] * rise + m[4]
+                            y = m[1] * tx + m[3] * rise + m[5]
+                            X, Y = to_display(x, y)
+                            glyphs.append((Y, X, w0 / 1000.0 * size * th * scale_x, size * scale_y, text))
+                        tx += advance
+                tm = (tm[0], tm[1], tm[2], tm[3], tm[4] + tx * tm[0], tm[5] + tx * tm[1])
+            elif op == "Td" or op == "TD":
+                tx_, ty_ = float(operands[-2]), float(operands[-1])
+                if op == "TD":
+                    tl = -ty_
+                tlm = _mult((1, 0, 0, 1, tx_, ty_), tlm)
+                tm = tlm
+            elif op == "Tm":
+                tm = tlm = tuple(float(v) for v in operands[-6:])
+            elif op == "T*":
+                tlm = _mult((1, 0, 0, 1, 0, -tl), tlm)
+                tm = tlm
+            elif op == "BT":
+                tm = tlm = IDENTITY
+            elif op == "Tf":
+                ref = fonts.get(operands[-2])
+                font = doc.font(ref) if ref is not None else None
+                size = float(operands[-1])
+            elif op == "Tc":
+                tc = float(operands[-1])
+            elif op == "Tw":
+                tw = float(operands[-1])
+            elif op == "Tz":
+                th = float(operands[-1]) / 100.0
+            elif op == "TL":
+                tl = float(operands[-1])
+            elif op == "Ts":
+                rise = float(operands[-1])
+            elif op == "cm":
+                ctm = _mult(tuple(float(v) for v in operands[-6:]), ctm)
+            elif op == "q":
+                stack.append((ctm, font, size, tc, tw, th, tl, rise))
+            elif op == "Q":
+                if stack:
+                    ctm, font, size, tc, tw, th, tl, rise = stack.pop()
+            elif op == "Do":
+                xobj = doc.resolve(xobjects.get(operands[-1]))
+                if isinstance(xobj, Stream) and xobj.dict.get("Subtype") == "Form" and depth < 8:
+                    matrix = tuple(float(v) for v in (doc.resolve(xobj.dict.get("Matrix")) or IDENTITY))
+                    form_resources = doc.resolve(xobj.dict.get("Resources")) or resources
+                    _run(doc, doc.decode(xobj), form_resources, _mult(matrix, ctm),
+                         to_display, glyphs, depth + 1)
+            elif op == "BI":
+                # Imagem inline: pula os dados binários até o EI
+                end = RE_INLINE_IMAGE_END.search(content, pos)
+                pos = end.end() if end else n
+        except (IndexError, TypeError, ValueError):
+            pass  # operador com operandos malformados: ignora, como os leitores de PDF
+        operands = []
+
+# --- Layout -------------------------------------------------------------------
+
+def layout_lines(glyphs):
+    """
+    Monta as linhas de texto da página no estilo pdftotext -layout:
+    glyphs agrupados por linha de base e posicionados na coluna
+    X / largura de caractere; colunas separadas por >= 2 espaços, palavras
+    da mesma frase por 1.
+    """
+    if not glyphs:
+        return []
+    widths = sorted(g[2] for g in glyphs if g[4].strip() and g[2] > 0)
+    # Largura de "uma coluna de texto": 3/4 da mediana dos glyphs. Mais fina
+    # que a letra média para que colunas próximas (Colhido / %, ~0,7 em)
+    # mantenham >= 2 espaços entre si e texto largo não empurre a seguinte
+    cw = (widths[len(widths) // 2] if widths else 5.0) * 0.75
+
+    glyphs.sort(key=lambda g: g[0])
+    lines = []
+    current = [glyphs[0]]
+    base = glyphs[0][0]
+    for g in glyphs[1:]:
+        if abs(g[0] - base) <= 0.4 * max(g[3], current[0][3], 1.0):
+            current.append(g)
+        else:
+            lines.append(current)
+            current = [g]
+            base = g[0]
+    lines.append(current)
+
+    out = []
+    for line in lines:
+        line.sort(key=lambda g: g[1])
+        text = []
+        length = 0
+        prev_end = None
+        prev = None
+        for Y, X, w, size, ch in line:
+            if not ch.strip():
+                continue  # espaços viram distância entre glyphs
+            # Negrito "falso" (mesmo glyph desenhado duas vezes quase no mesmo lugar)
+            if prev and prev[4] == ch and abs(prev[1] - X) < 0.3 * max(w, 0.1):
+                continue
+            if prev_end is None:
+                pad = int(X / cw + 0.5)
+            else:
+                gap = X - prev_end
+                if gap <= 0.12 * size:
+                    pad = 0
+                elif gap <= 0.4 * size or (gap <= size and ch.isalnum() and prev[4][-1].isalpha()):
+                    # Espaço entre palavras da mesma frase ("S TMG 2379 IPRO")
+                    pad = 1
+                else:
+                    # Coluna nova: vai para a posição da página, com no mínimo 2 espaços
+                    pad = max(int(X / cw + 0.5) - length, 2)
+            if pad:
+                text.append(" " * pad)
+                length += pad
+            text.append(ch)
+            length += len(ch)
+            prev_end = X + w if prev_end is None else max(X + w, prev_end)
+            prev = (Y, X, w, size, ch)
+        out.append("".join(text))
+    return out
+
+# --- API -----------------------------------------------------------------------
+
+def page_count(pdf_path):
+    return len(Document.open(pdf_path).pages())
+
+def iter_text(pdf_path, first_page=None, last_page=None):
+    """
+    Texto do PDF linha a linha (com '\\n'), página por página, no formato do
+    pdftotext: cada página termina em '\\f'. first_page/last_page como -f/-l.
+    """
+    try:
+        doc = Document.open(pdf_path)
+        pages = doc.pages()
+    except (OSError, ValueError, RecursionError, zlib.error) as e:
+        raise PdfError(str(e)) from e
+
+    first = max(first_page or 1, 1)
+    last = min(last_page or len(pages), len(pages))
+    for number in range(first, last + 1):
+        try:
+            lines = layout_lines(page_glyphs(doc, *pages[number - 1]))
+        except (PdfError, ValueError, RecursionError, zlib.error, KeyError, TypeError) as e:
+            raise PdfError(f"página {number}: {e}") from e
+        for line in lines:
+            yield line + "\n"
+        yield "\f"
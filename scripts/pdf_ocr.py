@@ -0,0 +1,241 @@
+import os
+import shutil
+import hashlib
+import subprocess
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import text_cache
+
+# OCR local (tesseract) como fallback para exports Scadi que são só imagem.
+#
+# Só as páginas cuja camada de texto veio vazia (menos de MIN_CHARS caracteres
+# visíveis) passam pelo OCR; o resto do documento continua no caminho barato
+# do pdftotext / pdf_native. Cada página fraca é renderizada (pdftoppm) e
+# o texto do tesseract fica no cache de texto pelo SHA-256 da IMAGEM da
+# página: a mesma página escaneada em outro PDF (ou num re-export) não é
+# lida de novo.
+#
+#   text = fill_text(pdf_path, text)            # texto inteiro: páginas fracas em paralelo
+#   lines = fill_lines(lines, pdf_path)         # streaming: OCR em paralelo, linhas na ordem
+#
+# O trabalho pesado é do pdftoppm/tesseract (subprocessos), então o paralelismo
+# é um pool de threads, que funciona também dentro dos workers do pdf_pool e
+# do ingest_scadi (ver ocr_workers).
+#
+# `failed` (set opcional) recebe as páginas em que o OCR falhou (pdftoppm ou
+# tesseract com erro): o texto delas é o original, então quem guarda o
+# resultado no cache com a chave "+ocr" não deve guardar.
+#
+# Sem tesseract/pdftoppm instalados (ou com TERRA_OCR=0) nada muda.
+
+# Config
+ENABLED = os.environ.get("TERRA_OCR", "1") != "0"
+MIN_CHARS = int(os.environ.get("TERRA_OCR_MIN_CHARS", "20"))
+LANG = os.environ.get("TERRA_OCR_LANG", "por")
+DPI = int(os.environ.get("TERRA_OCR_DPI", "300"))
+# Páginas em OCR ao mesmo tempo (padrão em ocr_workers)
+OCR_WORKERS = int(os.environ.get("TERRA_OCR_WORKERS", "0"))
+
+# psm 6 = bloco uniforme de texto; preserve_interword_spaces mantém as
+# colunas separadas por vários espaços, como no -layout
+TESSERACT_FLAGS = ["--psm", "6", "-c", "preserve_interword_spaces=1"]
+
+_available = None
+
+class OcrError(Exception):
+    """Falha ao renderizar ou ler uma página."""
+
+def available():
+    """tesseract e pdftoppm no PATH (verificado uma vez por processo)."""
+    global _available
+    if _available is None:
+        _available = bool(shutil.which("tesseract") and shutil.which("pdftoppm"))
+    return _available
+
+def active():
+    return ENABLED and available()
+
+def ocr_workers():
+    """
+    Threads de OCR: TERRA_OCR_WORKERS, senão todos os núcleos no processo
+    principal e, num worker do pdf_pool, a fatia dele (núcleos / TERRA_WORKERS,
+    no mínimo 2) para não multiplicar tesseracts por worker.
+    """
+    if OCR_WORKERS > 0:
+        return OCR_WORKERS
+    cpus = os.cpu_count() or 1
+    if multiprocessing.parent_process() is None:
+        return cpus
+    return max(2, cpus // int(os.environ.get("TERRA_WORKERS") or cpus))
+
+def cache_flags():
+    """Entra na chave do cache de texto: o texto com OCR não é o mesmo sem ele."""
+    return ["+ocr", LANG, str(MIN_CHARS)] if active() else []
+
+def is_weak(page_text):
+    """Página sem camada de texto útil (escaneada)."""
+    return len("".join(page_text.split())) < MIN_CHARS
+
+def render_page(pdf_path, page):
+    """PNG (tons de cinza) da página, via pdftoppm."""
+    try:
+        result = subprocess.run(
+            ["pdftoppm", "-f", str(page), "-l", str(page), "-r", str(DPI), "-gray", "-png", pdf_path],
+            capture_output=True, check=True
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise OcrError(f"pdftoppm falhou na página {page}: {e}") from e
+    return result.stdout
+
+def ocr_image(png):
+    try:
+        result = subprocess.run(
+            ["tesseract", "stdin", "stdout", "-l", LANG, *TESSERACT_FLAGS],
+            input=png, capture_output=True, check=True,
+            # Várias páginas em paralelo: uma thread OpenMP por tesseract
+            env={"OMP_THREAD_LIMIT": "1", **os.environ}
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise OcrError(f"tesseract falhou: {e}") from e
+    return result.stdout.decode("utf-8", "replace")
+
+def ocr_page(pdf_path, page):
+    """Texto da página por OCR, em cache pelo hash da imagem renderizada."""
+    png = render_page(pdf_path, page)
+    key = None
+    if text_cache.ENABLED:
+        key = text_cache.cache_key(hashlib.sha256(png).hexdigest(),
+                                   ["ocr", LANG, *TESSERACT_FLAGS], "tesseract")
+        cached = text_cache.get(key)
+        if cached is not None:
+            return cached
+    text = ocr_image(png)
+    if key:
+        text_cache.put(key, text)
+    return text
+
+def _ocr_job(args):
+    pdf_path, page = args
+    try:
+        return ocr_page(pdf_path, page), None
+    except OcrError as e:
+        return None, str(e)
+
+def _ocr_result(pdf_path, page, result, failed):
+    """Texto útil do OCR da página ou None (erro vai para `failed`)."""
+    text, error = result
+    if error:
+        print(f"⚠️ OCR: {os.path.basename(pdf_path)} pág. {page}: {error}")
+        if failed is not None:
+            failed.add(page)
+        return None
+    return text if text and not is_weak(text) else None
+
+def ocr_pages(pdf_path, pages, workers=None, failed=None):
+    """
+    {página: texto} das páginas pedidas, em paralelo (threads, ver ocr_workers).
+    Página com erro fica de fora (o texto original é mantido) e vai para `failed`.
+    """
+    jobs = [(pdf_path, page) for page in pages]
+    if len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers or ocr_workers(), len(jobs))) as pool:
+            results = list(pool.map(_ocr_job, jobs))
+    else:
+        results = [_ocr_job(job) for job in jobs]
+
+    texts = {}
+    for page, result in zip(pages, results):
+        text = _ocr_result(pdf_path, page, result, failed)
+        if text:
+            texts[page] = text
+    return texts
+
+def _as_page(text):
+    """Texto do OCR no formato de uma página do -layout (linhas terminadas em '\\n')."""
+    return text.replace("\f", "").rstrip("\n") + "\n"
+
+def fill_text(pdf_path, text, first_page=None, failed=None):
+    """Troca as páginas sem texto (separadas por '\\f') pelo OCR delas."""
+    pages = text.split("\f")
+    first = first_page or 1
+    # O '\f' final do pdftotext deixa um pedaço vazio que não é página
+    count = len(pages) - 1 if text.endswith("\f") else len(pages)
+    weak = [first + i for i in range(count) if is_weak(pages[i])]
+    if not weak:
+        return text
+    for page, ocr in ocr_pages(pdf_path, weak, failed=failed).items():
+        pages[page - first] = _as_page(ocr)
+    return "\f".join(pages)
+
+def fill_lines(lines, pdf_path, first_page=None, failed=None):
+    """
+    Versão streaming de fill_text: recebe e gera linhas cruas (com '\\n').
+    Cada página fraca vai para o pool de OCR assim que termina e a leitura
+    segue; as páginas saem na ordem, então só o trecho a partir do OCR mais
+    antigo ainda em andamento fica em memória (no máximo ocr_workers() OCRs
+    em voo). Cada '\\f' fecha uma página e vai na frente da linha seguinte,
+    como na saída do pdftotext.
+    """
+    page = first_page or 1
+    buf = []
+    pending = ""
+    queue = deque()  # (página, linhas cruas, future do OCR ou None, fechada por '\f')
+    pool = None
+    limit = ocr_workers()
+
+    def push(closed):
+        nonlocal pool
+        future = None
+        if is_weak("".join(buf)):
+            # Pool só para documento com página escaneada
+            pool = pool or ThreadPoolExecutor(max_workers=limit)
+            future = pool.submit(_ocr_job, (pdf_path, page))
+        queue.append((page, buf, future, closed))
+
+    def drain(inflight_max):
+        # Sai a cabeça da fila se não depende de OCR, se o OCR dela já acabou ou
+        # se há OCRs demais em voo (aí espera por ela)
+        nonlocal pending
+        while queue:
+            head = queue[0][2]
+            if head is not None and not head.done() \
+                    and sum(1 for e in queue if e[2] is not None) <= inflight_max:
+                return
+            number, raw, future, closed = queue.popleft()
+            for out in _page_lines(raw, pdf_path, number, future, failed):
+                yield pending + out
+                pending = ""
+            if closed:
+                pending += "\f"
+
+    try:
+        for line in lines:
+            parts = line.split("\f")
+            for part in parts[:-1]:
+                if part:
+                    buf.append(part)
+                push(closed=True)
+                page += 1
+                buf = []
+                yield from drain(limit)
+            if parts[-1]:
+                buf.append(parts[-1])
+        # Sobra sem '\f' no fim (não veio do pdftotext): conta como página
+        if buf:
+            push(closed=False)
+        yield from drain(0)
+    finally:
+        # Consumidor parou no meio: não começa os OCRs que ainda estão na fila
+        if pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+    if pending:
+        yield pending
+
+def _page_lines(buf, pdf_path, page, future, failed=None):
+    if future is not None:
+        ocr = _ocr_result(pdf_path, page, future.result(), failed)
+        if ocr:
+            return _as_page(ocr).splitlines(keepends=True)
+    return buf
@@ -0,0 +1,135 @@
+import os
+import sys
+import resource
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import text_cache
+import profiling
+from pdf_text import extract_text, iter_lines, page_count, pdftotext_maxrss
+
+# Pool de extração: cada worker roda o pdftotext E o parser do arquivo,
+# devolvendo só os registros prontos para o processo principal.
+#
+# Uso:
+#   jobs = [PdfJob(path, parse_custos, (safra, cultura)), ...]
+#   for job, records in map_pdfs(jobs):
+#       ...
+#
+# O parser precisa ser uma função de nível de módulo (picklable) com
+# assinatura parser(text, *args) -> lista de registros, onde `text` é o
+# texto inteiro ou, no modo streaming (padrão), um iterável de linhas.
+# `sha256` (opcional) é o hash já conhecido pelo índice, repassado ao cache de texto.
+# `pages` (opcional) = (primeira, última): o job extrai só esse intervalo
+# (pdftotext -f/-l), para dividir um PDF grande entre vários workers.
+
+PdfJob = namedtuple("PdfJob", ["path", "parser", "args", "sha256", "pages"], defaults=(None, None))
+
+# TERRA_STREAM=0 volta ao modo antigo (texto inteiro em memória antes do parse)
+STREAM = os.environ.get("TERRA_STREAM", "1") != "0"
+
+# PDFs com mais páginas que isso são divididos em intervalos (TERRA_PAGES_PER_JOB=0 desliga)
+PAGES_PER_JOB = int(os.environ.get("TERRA_PAGES_PER_JOB", "10"))
+
+# ru_maxrss vem em KB no Linux e em bytes no macOS
+_RSS_SCALE = 1 if sys.platform == "darwin" else 1024
+
+def default_workers():
+    """Nº de workers: TERRA_WORKERS se definido, senão nº de núcleos."""
+    env = os.environ.get("TERRA_WORKERS")
+    if env:
+        return max(1, int(env))
+    return os.cpu_count() or 1
+
+def peak_rss():
+    """Pico de RSS (bytes) deste processo e dos pdftotext que ele rodou (0 sem pdftotext)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_SCALE
+    return own, pdftotext_maxrss() * _RSS_SCALE
+
+def page_ranges(pdf_path, pages_per_job=PAGES_PER_JOB):
+    """
+    Intervalos [(primeira, última), ...] para dividir o PDF entre workers,
+    ou [None] (arquivo inteiro) se ele é pequeno ou o nº de páginas é desconhecido.
+    """
+    if pages_per_job <= 0:
+        return [None]
+    n = page_count(pdf_path)
+    if not n or n <= pages_per_job:
+        return [None]
+    return [(first, min(first + pages_per_job - 1, n)) for first in range(1, n + 1, pages_per_job)]
+
+def run_job(job, stream=STREAM):
+    """
+    Extrai o texto e aplica o parser (executa dentro do worker).
+    Retorna (registros, erro, memória, perfil): erro é None ou a mensagem, e uma
+    exceção aqui não pode derrubar o pool.map() dos demais arquivos.
+    perfil é o dict de profiling.end_file() (None sem TERRA_PROFILE).
+    """
+    first, last = job.pages or (None, None)
+    profiling.begin_file(job.path, job.pages)
+    try:
+        with profiling.worker_profile():
+            if stream:
+                text = profiling.timed_lines(iter_lines(job.path, first, last, sha256=job.sha256, strict=True))
+            else:
+                with profiling.stage("decode"):
+                    text = extract_text(job.path, first, last, sha256=job.sha256, strict=True)
+            records, error = job.parser(text, *job.args), None
+    except Exception as e:
+        records, error = None, f"{type(e).__name__}: {e}"
+    return records, error, (os.getpid(),) + peak_rss(), profiling.end_file()
+
+def map_pdfs(jobs, workers=None, on_error=None, stream=STREAM, memory=None, executor=None):
+    """
+    Processa os PDFs em paralelo e gera (job, registros) na MESMA ordem
+    de entrada, à medida que ficam prontos.
+    Arquivos com erro não são gerados: vão para on_error(job, erro)
+    (ou só um aviso no console).
+    `memory` (dict opcional) recebe {pid: (pico RSS worker, pico RSS pdftotext)}
+    em bytes, para dimensionar o pool.
+    `executor` (opcional): pool já aberto por quem chama (ex.: ingest_scadi,
+    que mantém os workers aquecidos entre lotes); não é fechado aqui.
+    """
+    jobs = list(jobs)
+    workers = min(workers or default_workers(), len(jobs))
+    peaks = {} if memory is None else memory
+
+    if executor is not None:
+        results = executor.map(run_job, jobs, [stream] * len(jobs))
+        pool = None
+    # Sem ganho em abrir pool para 0/1 arquivo (ou TERRA_WORKERS=1)
+    elif workers <= 1:
+        results = (run_job(job, stream) for job in jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        # map() preserva a ordem dos jobs, então a saída é determinística
+        results = pool.map(run_job, jobs, [stream] * len(jobs))
+
+    try:
+        for job, (records, error, (pid, rss, child_rss), stats) in zip(jobs, results):
+            # ru_maxrss já é o pico da vida do processo; guarda o maior visto
+            prev = peaks.get(pid, (0, 0))
+            peaks[pid] = (max(prev[0], rss), max(prev[1], child_rss))
+            profiling.add_file(stats, records=len(records) if records is not None else None, error=error)
+            if error:
+                if on_error:
+                    on_error(job, error)
+                else:
+                    print(f"❌ {os.path.basename(job.path)}: {error}")
+                continue
+            yield job, records
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if peaks:
+        worst = max(rss for rss, _ in peaks.values())
+        worst_child = max(child for _, child in peaks.values())
+        # Backend python (ou tudo do cache): nenhum pdftotext rodou
+        child = f" (pdftotext: {worst_child / 1024 / 1024:.1f} MB)" if worst_child else ""
+        print(f"📈 Pico de RSS por worker ({len(peaks)} workers): {worst / 1024 / 1024:.1f} MB{child}")
+
+    # Aplica a política de tamanho/idade do cache de texto uma vez por lote
+    if text_cache.ENABLED:
+        text_cache.evict()
@@ -0,0 +1,223 @@
+import os
+import re
+import tempfile
+import subprocess
+
+import text_cache
+import pdf_native
+import pdf_ocr
+
+# Extração de texto compartilhada pelos scripts de ingestão.
+# Antes cada script tinha sua própria cópia de extract_text / extract_text_from_pdf.
+#
+# Dois backends com a mesma saída (texto -layout, '\f' entre páginas):
+#   pdftotext  poppler em subprocesso (padrão)
+#   python     pdf_native, no próprio processo: sem fork/exec por arquivo e
+#              sem depender do poppler instalado
+# Escolha com TERRA_PDF_BACKEND=python (compare com scripts/bench_backends.py).
+# Páginas sem camada de texto caem no OCR local (pdf_ocr), se o tesseract existir.
+
+# Config
+BACKEND = os.environ.get("TERRA_PDF_BACKEND", "pdftotext")
+BACKENDS = ("pdftotext", "python")
+
+PDFTOTEXT_FLAGS = ["-layout"]
+
+RE_PAGES = re.compile(r'^Pages:\s+(\d+)', re.M)
+
+# Maior ru_maxrss (KB no Linux, bytes no macOS) dos pdftotext deste processo,
+# lido no wait4 de cada um (RUSAGE_CHILDREN misturaria pdfinfo, workers etc.)
+_pdftotext_maxrss = 0
+
+class PdfTextError(Exception):
+    """Falha na extração (arquivo ausente, corrompido, ferramenta não instalada)."""
+
+def pdftotext_flags(first_page=None, last_page=None):
+    flags = list(PDFTOTEXT_FLAGS)
+    if first_page:
+        flags += ["-f", str(first_page)]
+    if last_page:
+        flags += ["-l", str(last_page)]
+    return flags
+
+def _cache_key(pdf_path, sha256, flags, backend):
+    flags = flags + pdf_ocr.cache_flags()
+    if backend == "python":
+        return text_cache.cache_key(sha256 or text_cache.file_sha256(pdf_path), flags,
+                                    "pdf_native", f"pdf_native {pdf_native.VERSION}")
+    return text_cache.cache_key(sha256 or text_cache.file_sha256(pdf_path), flags)
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"TERRA_PDF_BACKEND inválido: {backend!r} (use {' ou '.join(BACKENDS)})")
+
+def page_count(pdf_path):
+    """
+    Nº de páginas pelo pdfinfo (poppler, junto com o pdftotext). Sem ele,
+    lê a árvore de páginas com o pdf_native; None se não der para saber.
+    """
+    try:
+        result = subprocess.run(["pdfinfo", pdf_path], capture_output=True, text=True, check=True)
+        m = RE_PAGES.search(result.stdout)
+        if m:
+            return int(m.group(1))
+    except (subprocess.CalledProcessError, OSError):
+        pass
+    try:
+        return pdf_native.page_count(pdf_path) or None
+    except (pdf_native.PdfError, OSError, ValueError, RecursionError):
+        return None
+
+def extract_text(pdf_path, first_page=None, last_page=None, sha256=None, strict=False, backend=None):
+    """
+    Extrai o texto mantendo colunas (pdftotext -layout ou pdf_native, ver BACKEND).
+    A saída fica no cache de texto (text_cache), então um PDF que não mudou
+    não é renderizado de novo. `sha256` evita re-hash quando o índice já tem o hash.
+    Em erro retorna "" (ou levanta PdfTextError com strict=True).
+    """
+    backend = backend or BACKEND
+    _check_backend(backend)
+    flags = pdftotext_flags(first_page, last_page)
+
+    try:
+        key = None
+        if text_cache.ENABLED:
+            key = _cache_key(pdf_path, sha256, flags, backend)
+            cached = text_cache.get(key)
+            if cached is not None:
+                return cached
+
+        if backend == "python":
+            text = "".join(pdf_native.iter_text(pdf_path, first_page, last_page))
+        else:
+            text = "".join(_pdftotext_lines(pdf_path, flags))
+    except (OSError, pdf_native.PdfError) as e:
+        if strict:
+            raise PdfTextError(f"{pdf_path}: {e}") from e
+        print(f"❌ Erro ao ler PDF {pdf_path}: {e}")
+        return ""
+    except PdfTextError as e:
+        if strict:
+            raise
+        print(f"❌ Erro ao ler PDF {e}")
+        return ""
+
+    # Páginas escaneadas (sem camada de texto) passam pelo OCR
+    ocr_failed = set()
+    if pdf_ocr.active():
+        text = pdf_ocr.fill_text(pdf_path, text, first_page, failed=ocr_failed)
+
+    # Só guarda extrações bem-sucedidas (OCR que falhou numa página tenta de novo na próxima)
+    if key and not ocr_failed:
+        text_cache.put(key, text)
+    return text
+
+def iter_lines(pdf_path, first_page=None, last_page=None, sha256=None, strict=False, backend=None):
+    """
+    Modo streaming: gera as linhas (sem '\\n') lendo o stdout do pdftotext
+    (ou a saída do pdf_native, página a página) aos poucos, sem montar o
+    documento inteiro em memória.
+    No cache hit as linhas vêm direto do .txt.gz; no miss o texto é gravado
+    no cache ao mesmo tempo em que é consumido.
+    """
+    backend = backend or BACKEND
+    _check_backend(backend)
+    flags = pdftotext_flags(first_page, last_page)
+
+    key = None
+    try:
+        if text_cache.ENABLED:
+            key = _cache_key(pdf_path, sha256, flags, backend)
+            cached = text_cache.open_entry(key)
+            if cached is not None:
+                with cached:
+                    for line in cached:
+                        yield line.rstrip("\n")
+                return
+    except OSError as e:
+        if strict:
+            raise PdfTextError(f"{pdf_path}: {e}") from e
+        print(f"❌ Erro ao ler PDF {pdf_path}: {e}")
+        return
+
+    if backend == "python":
+        raw = _native_lines(pdf_path, first_page, last_page)
+    else:
+        raw = _pdftotext_lines(pdf_path, flags)
+    # Páginas escaneadas (sem camada de texto) passam pelo OCR
+    ocr_failed = set()
+    source = pdf_ocr.fill_lines(raw, pdf_path, first_page, ocr_failed) if pdf_ocr.active() else raw
+
+    writer = text_cache.EntryWriter(key) if key else None
+    completed = False
+    try:
+        for line in source:
+            if writer:
+                writer.write(line)
+            yield line.rstrip("\n")
+        completed = True
+    except PdfTextError as e:
+        if strict:
+            raise
+        print(f"❌ Erro ao ler PDF {e}")
+    finally:
+        # Consumidor parou no meio (ou erro): não deixa processo nem entrada parcial
+        source.close()
+        raw.close()
+        if writer and completed and not ocr_failed:
+            writer.commit()
+        elif writer:
+            writer.abort()
+
+def _pdftotext_lines(pdf_path, flags):
+    """Linhas cruas (com '\\n') do stdout do pdftotext; erro vira PdfTextError."""
+    # stderr num arquivo, não num pipe: PDF danificado pode gerar mais avisos do que
+    # cabem no pipe (~64 KB) e o pdftotext travaria esperando alguém ler
+    errors = tempfile.TemporaryFile()
+    try:
+        proc = subprocess.Popen(
+            ["pdftotext", *flags, pdf_path, "-"],
+            stdout=subprocess.PIPE, stderr=errors,
+            text=True, encoding="utf-8"
+        )
+    except OSError as e:
+        errors.close()
+        raise PdfTextError(f"{pdf_path}: {e}") from e
+
+    try:
+        yield from proc.stdout
+        proc.stdout.close()
+        if _reap(proc) != 0:
+            errors.seek(0)
+            # Só o fim: a causa costuma vir depois de milhares de "Syntax Error"
+            stderr = errors.read().decode("utf-8", "replace").strip()[-500:]
+            raise PdfTextError(f"{pdf_path}: pdftotext saiu com código {proc.returncode}: {stderr}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        errors.close()
+
+def _reap(proc):
+    """wait4 no pdftotext: código de saída + pico de RSS só dele."""
+    global _pdftotext_maxrss
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    _pdftotext_maxrss = max(_pdftotext_maxrss, usage.ru_maxrss)
+    return proc.returncode
+
+def pdftotext_maxrss():
+    """Pico de RSS (unidade de ru_maxrss) dos pdftotext já rodados neste processo; 0 se nenhum."""
+    return _pdftotext_maxrss
+
+def _native_lines(pdf_path, first_page, last_page):
+    try:
+        yield from pdf_native.iter_text(pdf_path, first_page, last_page)
+    except pdf_native.PdfError as e:
+        raise PdfTextError(f"{pdf_path}: {e}") from e
+
+def as_lines(source):
+    """Parsers aceitam o texto inteiro (str) ou um iterável de linhas (streaming)."""
+    if isinstance(source, str):
+        return source.split("\n")
+    return source
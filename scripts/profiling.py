@@ -0,0 +1,340 @@
+import os
+import json
+import time
+import random
+import cProfile
+import multiprocessing
+import pstats
+from contextlib import contextmanager
+from datetime import datetime
+
+from text_cache import PROJECT_DIR
+
+# Perfil da ingestão, compartilhado pelos scripts de extração/build.
+#
+# Com TERRA_PROFILE=1 cada execução grava um relatório JSON em data/reports/:
+#   - tempo por etapa, por arquivo e no total (soma dos workers, pode passar do wall):
+#       spawn     até a 1ª linha do extrator (hash, fork do pdftotext, 1ª página)
+#       decode    leitura/decodificação das demais linhas (ou do cache de texto)
+#       classify  classify_line (scadi_patterns)
+#       parse     parser: o resto do tempo do arquivo, fora as outras etapas
+#       write     gravação de CSV/JSON/índice
+#   - linhas vistas por tipo (classify_line) e aceitas/rejeitadas por padrão
+#   - amostra das linhas rejeitadas (com o motivo), por padrão
+# e compara com o relatório anterior do mesmo script, avisando se a vazão
+# do parse ou o nº de registros aceitos caiu.
+# TERRA_PROFILE_CPROFILE=1 grava também um .prof (processo principal + workers).
+#
+# Uso nos scripts:
+#   with profiling.run("extract_scadi"):
+#       run_extraction()
+#   ...
+#   with profiling.stage("write"):
+#       merge_csv(...)
+#   profiling.accept("custo_categoria/colunas")
+#   profiling.reject("custo_categoria/regex", line, "sem R$")
+#
+# Desligado (padrão) tudo aqui vira no-op.
+
+# Config
+CPROFILE = os.environ.get("TERRA_PROFILE_CPROFILE", "0") != "0"
+ENABLED = os.environ.get("TERRA_PROFILE", "0") != "0" or CPROFILE
+REPORT_DIR = os.environ.get("TERRA_PROFILE_DIR", os.path.join(PROJECT_DIR, "data", "reports"))
+SAMPLE_SIZE = int(os.environ.get("TERRA_PROFILE_SAMPLES", "5"))
+# Queda (fração) na vazão do parse ou nos registros aceitos que gera aviso
+REGRESSION = float(os.environ.get("TERRA_PROFILE_REGRESSION", "0.2"))
+
+STAGES = ("spawn", "decode", "classify", "parse", "write")
+
+_perf = time.perf_counter
+
+class Stats:
+    """Contadores de um arquivo (ou da parte da execução fora de arquivos)."""
+    def __init__(self, path=None, pages=None):
+        self.path = path
+        self.pages = pages
+        self.start = _perf()
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.lines = 0
+        self.kinds = {}
+        self.patterns = {}    # padrão -> [aceitas, rejeitadas]
+        self.samples = {}     # padrão -> amostra de rejeitadas (reservatório)
+
+    def as_dict(self):
+        return {
+            "file": os.path.basename(self.path) if self.path else None,
+            "pages": list(self.pages) if self.pages else None,
+            "stages": {k: round(v, 6) for k, v in self.stages.items()},
+            "lines": self.lines,
+            "kinds": self.kinds,
+            "patterns": {k: {"accepted": a, "rejected": r} for k, (a, r) in self.patterns.items()},
+            "rejected_samples": self.samples,
+        }
+
+_run_stats = Stats()
+_file_stats = None
+_stack = []           # [etapa, início, tempo das etapas internas]
+_files = []           # relatórios por arquivo (processo principal)
+
+def _target():
+    return _file_stats or _run_stats
+
+# --- Coleta -----------------------------------------------------------------
+
+def add_time(name, seconds):
+    """Soma tempo numa etapa medida por fora de stage() (linhas, classify)."""
+    _target().stages[name] += seconds
+    if _stack:
+        _stack[-1][2] += seconds
+
+@contextmanager
+def stage(name):
+    """Mede o bloco como `name`, descontando as etapas medidas lá dentro."""
+    if not ENABLED:
+        yield
+        return
+    frame = [name, _perf(), 0.0]
+    _stack.append(frame)
+    try:
+        yield
+    finally:
+        _stack.pop()
+        elapsed = _perf() - frame[1]
+        _target().stages[name] += elapsed - frame[2]
+        if _stack:
+            _stack[-1][2] += elapsed
+
+def count_kind(kind, seconds):
+    """Uma linha classificada (chamado pelo classify_line instrumentado)."""
+    stats = _target()
+    stats.kinds[kind] = stats.kinds.get(kind, 0) + 1
+    stats.stages["classify"] += seconds
+    if _stack:
+        _stack[-1][2] += seconds
+
+def accept(pattern):
+    if ENABLED:
+        _target().patterns.setdefault(pattern, [0, 0])[0] += 1
+
+def reject(pattern, line, reason=None):
+    """Linha candidata que o padrão descartou (entra na amostra)."""
+    if not ENABLED:
+        return
+    stats = _target()
+    counts = stats.patterns.setdefault(pattern, [0, 0])
+    counts[1] += 1
+    sample = stats.samples.setdefault(pattern, [])
+    item = {"line": line.replace("\f", "").strip()[:200], "reason": str(reason) if reason else None}
+    if stats.path:
+        item["file"] = os.path.basename(stats.path)
+    # Amostragem por reservatório: cada rejeitada tem a mesma chance de ficar
+    if len(sample) < SAMPLE_SIZE:
+        sample.append(item)
+    else:
+        i = random.randrange(counts[1])
+        if i < SAMPLE_SIZE:
+            sample[i] = item
+
+def timed_lines(lines):
+    """Repassa as linhas medindo spawn (até a 1ª) e decode (as demais)."""
+    if not ENABLED:
+        yield from lines
+        return
+    it = iter(lines)
+    name = "spawn"
+    try:
+        while True:
+            start = _perf()
+            try:
+                line = next(it)
+            except StopIteration:
+                add_time(name, _perf() - start)
+                return
+            add_time(name, _perf() - start)
+            name = "decode"
+            _target().lines += 1
+            yield line
+    finally:
+        close = getattr(it, "close", None)
+        if close:
+            close()
+
+# --- Arquivos ---------------------------------------------------------------
+
+def begin_file(path, pages=None):
+    global _file_stats
+    if ENABLED:
+        _file_stats = Stats(path, pages)
+
+def end_file():
+    """Fecha o arquivo corrente e devolve o dict dele (picklable, volta do worker)."""
+    global _file_stats
+    if not ENABLED or _file_stats is None:
+        return None
+    stats, _file_stats = _file_stats, None
+    # O que não foi medido como outra etapa é do parser
+    other = sum(v for k, v in stats.stages.items() if k != "parse")
+    stats.stages["parse"] = max(0.0, _perf() - stats.start - other)
+    return stats.as_dict()
+
+def add_file(stats, records=None, error=None):
+    """Registra no processo principal o resultado de um arquivo (worker ou local)."""
+    if not ENABLED or stats is None:
+        return
+    stats["records"] = records
+    stats["error"] = error
+    _files.append(stats)
+
+@contextmanager
+def file(path, pages=None):
+    """Arquivo processado no próprio processo (sem pdf_pool)."""
+    begin_file(path, pages)
+    try:
+        yield
+    finally:
+        add_file(end_file())
+
+# --- cProfile nos workers ---------------------------------------------------
+
+_job_seq = 0
+
+@contextmanager
+def worker_profile():
+    """cProfile de um job no worker, gravado em <run>.<pid>.<n>.prof para run() juntar."""
+    global _job_seq
+    run_id = os.environ.get("TERRA_PROFILE_RUN")
+    # Sem pool (1 worker) o job roda no processo principal, que run() já perfila
+    if not CPROFILE or not run_id or multiprocessing.parent_process() is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _job_seq += 1
+        profiler.dump_stats(os.path.join(REPORT_DIR, f"{run_id}.{os.getpid()}.{_job_seq}.prof"))
+
+# --- Relatório ----------------------------------------------------------------
+
+def _merge(files, run_stats):
+    stages = dict(run_stats.stages)
+    kinds = dict(run_stats.kinds)
+    patterns = {k: {"accepted": a, "rejected": r} for k, (a, r) in run_stats.patterns.items()}
+    pool = {k: list(v) for k, v in run_stats.samples.items()}
+    lines = run_stats.lines
+    for f in files:
+        lines += f["lines"]
+        for k, v in f["stages"].items():
+            stages[k] += v
+        for k, v in f["kinds"].items():
+            kinds[k] = kinds.get(k, 0) + v
+        for k, v in f["patterns"].items():
+            total = patterns.setdefault(k, {"accepted": 0, "rejected": 0})
+            total["accepted"] += v["accepted"]
+            total["rejected"] += v["rejected"]
+        for k, v in f["rejected_samples"].items():
+            pool.setdefault(k, []).extend(v)
+    samples = {k: random.sample(v, min(len(v), SAMPLE_SIZE)) for k, v in pool.items()}
+    return lines, stages, kinds, patterns, samples
+
+def _previous_report(script):
+    try:
+        names = sorted(n for n in os.listdir(REPORT_DIR)
+                       if n.startswith(script + "-") and n.endswith(".json"))
+    except OSError:
+        return None
+    if not names:
+        return None
+    try:
+        with open(os.path.join(REPORT_DIR, names[-1]), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _compare(prev, report):
+    """Avisos de regressão contra o relatório anterior do mesmo script."""
+    warnings = []
+    old, new = prev.get("parse_lines_per_sec"), report["parse_lines_per_sec"]
+    if old and new and new < old * (1 - REGRESSION):
+        warnings.append(f"parse mais lento: {new:,.0f} linhas/s (antes {old:,.0f})")
+    for pattern, counts in prev.get("patterns", {}).items():
+        now = report["patterns"].get(pattern, {"accepted": 0})["accepted"]
+        if counts["accepted"] and now < counts["accepted"] * (1 - REGRESSION):
+            warnings.append(f"{pattern}: {now} aceitas (antes {counts['accepted']})")
+    return warnings
+
+def write_report(script, started, wall, extra=None):
+    lines, stages, kinds, patterns, samples = _merge(_files, _run_stats)
+    parse_time = stages["parse"] + stages["classify"]
+    report = {
+        "script": script,
+        "started_at": started.isoformat(timespec="seconds"),
+        "wall_s": round(wall, 6),
+        "files": len(_files),
+        "lines": lines,
+        "parse_lines_per_sec": round(lines / parse_time, 1) if parse_time and lines else None,
+        "stages": {k: round(v, 6) for k, v in stages.items()},
+        "kinds": kinds,
+        "patterns": patterns,
+        "rejected_samples": samples,
+        "per_file": _files,
+    }
+    if extra:
+        report.update(extra)
+
+    prev = _previous_report(script)
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    path = os.path.join(REPORT_DIR, f"{script}-{started.strftime('%Y%m%d-%H%M%S')}.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, path)
+
+    accepted = sum(p["accepted"] for p in patterns.values())
+    rejected = sum(p["rejected"] for p in patterns.values())
+    print(f"⏱️  Perfil: {len(_files)} arquivos, {lines} linhas, {accepted} aceitas / {rejected} rejeitadas "
+          f"em {wall:.2f}s → {path}")
+    print("   " + " · ".join(f"{k} {v:.3f}s" for k, v in stages.items()))
+    for warning in _compare(prev, report) if prev else []:
+        print(f"   ⚠️ Regressão: {warning}")
+    return path
+
+@contextmanager
+def run(script, extra=None):
+    """Envolve a execução de um script: ao final grava o relatório (e o .prof)."""
+    if not ENABLED:
+        yield
+        return
+    started = datetime.now()
+    run_id = f"{script}-{started.strftime('%Y%m%d-%H%M%S')}"
+    # Workers (fork ou spawn) herdam o id para nomear os .prof deles
+    os.environ["TERRA_PROFILE_RUN"] = run_id
+    profiler = None
+    if CPROFILE:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = _perf()
+    try:
+        yield
+    finally:
+        wall = _perf() - start
+        if profiler:
+            profiler.disable()
+        write_report(script, started, wall, extra)
+        if profiler:
+            _dump_profile(profiler, run_id)
+        os.environ.pop("TERRA_PROFILE_RUN", None)
+
+def _dump_profile(profiler, run_id):
+    stats = pstats.Stats(profiler)
+    parts = [n for n in os.listdir(REPORT_DIR) if n.startswith(run_id + ".") and n.endswith(".prof")]
+    for name in parts:
+        path = os.path.join(REPORT_DIR, name)
+        stats.add(path)
+        os.remove(path)
+    path = os.path.join(REPORT_DIR, run_id + ".prof")
+    stats.dump_stats(path)
+    print(f"   cProfile ({1 + len(parts)} perfis): {path}  (python3 -m pstats {path})")
@@ -0,0 +1,312 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import hashlib
+import threading
+import http.client
+from datetime import datetime
+from urllib.parse import urlsplit, quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import columnar
+
+# Publica o database.json nas tabelas do Supabase que o index.html lê
+# (historico, custos, contratos), mandando só o que mudou.
+#
+# Cada registro vira a linha no formato da tabela remota (o inverso do
+# mapeamento do loadData do index.html) com um `id` determinístico: uuid5
+# da chave natural (+ ordem entre repetidos). O snapshot da última
+# publicação (data/supabase_snapshot.json: {tabela: {id: hash da linha}})
+# é comparado com o build novo:
+#   id novo ou hash diferente -> upsert (POST ?on_conflict=id, merge-duplicates)
+#   id que sumiu do build     -> DELETE ?id=in.(...)
+# em lotes de BATCH linhas, por um pool de WORKERS threads, cada uma com a
+# sua conexão HTTP keep-alive (aberta uma vez, reaberta só se cair). Falha
+# de rede, 429 e 5xx são repetidas até RETRIES vezes com backoff exponencial
+# e jitter. O snapshot só registra os lotes confirmados, então uma
+# publicação interrompida manda de novo só o que faltou.
+#
+# `--full` ignora o snapshot e lê os ids/linhas do próprio Supabase
+# (paginação por id): conserta a cópia remota que divergiu do database.json.
+# Sem snapshot (1ª publicação, arquivo perdido) é o mesmo caminho: as linhas
+# que já estão lá (de outra máquina ou da carga antiga, com outros ids) são
+# apagadas em vez de ficarem duplicadas ao lado das novas.
+#
+# As tabelas precisam da coluna `id text primary key`. Escrita exige a
+# service key em TERRA_SUPABASE_KEY. Teste sem rede contra o PostgREST falso
+# (scripts/fake_postgrest.py, ver scripts/check_publish.py).
+#
+# Uso: python3 scripts/publish_supabase.py [database.json] [--full] [--dry-run]
+
+# Config
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_FILE = os.path.join(PROJECT_DIR, "data", "database.json")
+SNAPSHOT_FILE = os.environ.get("TERRA_PUBLISH_SNAPSHOT", os.path.join(PROJECT_DIR, "data", "supabase_snapshot.json"))
+SUPABASE_URL = os.environ.get("TERRA_SUPABASE_URL", "https://kmqhzumoqptrmwbntcoc.supabase.co")
+SUPABASE_KEY = os.environ.get("TERRA_SUPABASE_KEY", "")
+BATCH = int(os.environ.get("TERRA_PUBLISH_BATCH", "500"))
+DELETE_BATCH = 100  # ids por DELETE (vão na URL)
+WORKERS = int(os.environ.get("TERRA_PUBLISH_WORKERS", "4"))
+RETRIES = int(os.environ.get("TERRA_PUBLISH_RETRIES", "4"))
+BACKOFF = float(os.environ.get("TERRA_PUBLISH_BACKOFF", "0.5"))  # s antes da 2ª tentativa (dobra a cada uma)
+TIMEOUT = 30
+READ_PAGE = 1000
+
+ID_NAMESPACE = uuid.UUID("2d7c4e1a-5b3f-4c8d-9e6a-7f1b0c2d3e4f")
+
+# Tabela remota: (seção do database.json, colunas, chave natural)
+TABLES = {
+    "historico": ("produtividade",
+                  ("safra", "cultura", "talhao", "variedade", "area", "produtividade", "total_sc"),
+                  ("safra", "cultura", "talhao")),
+    "custos": ("custos",
+               ("safra", "cultura", "fazenda", "aplicacao", "custo_reais", "custo_reais_ha", "custo_sc_ha"),
+               ("safra", "cultura", "fazenda", "aplicacao")),
+    "contratos": ("contratos",
+                  ("safra", "cultura", "vendedor", "comprador", "quantidade_sc", "valor_saco",
+                   "valor_total_bruto", "valor_total_liquido", "data_venda", "situacao"),
+                  ("safra", "cultura", "vendedor", "comprador", "data_venda")),
+}
+
+class PublishError(Exception):
+    """Resposta de erro do Supabase que não adianta repetir (4xx)."""
+
+class RetryableError(Exception):
+    """Falha de rede, 429 ou 5xx."""
+
+def to_remote(table, record):
+    """Registro do database.json -> linha da tabela remota (sem o id)."""
+    if table == "historico":
+        talhao = record.get("talhao") or ""
+        # O index.html separa "TALHAO [Fazenda]" de volta em talhão e fazenda
+        if record.get("fazenda"):
+            talhao = f"{talhao} [{record['fazenda']}]"
+        row = {"safra": record.get("safra"), "cultura": record.get("cultura"), "talhao": talhao,
+               "variedade": record.get("variedade"), "area": record.get("area"),
+               "produtividade": record.get("prod_sc_ha"), "total_sc": record.get("total_sc")}
+    elif table == "custos":
+        row = {"safra": record.get("safra"), "cultura": record.get("cultura"), "fazenda": record.get("fazenda"),
+               "aplicacao": record.get("item") or record.get("categoria"), "custo_reais": record.get("valor"),
+               "custo_reais_ha": record.get("custo_ha"), "custo_sc_ha": record.get("custo_sc_ha")}
+    else:
+        row = {col: record.get(col) for col in TABLES[table][1]}
+    # Todas as linhas de um lote com as mesmas chaves (exigência do PostgREST)
+    return {col: row.get(col) for col in TABLES[table][1]}
+
+def row_hash(table, row):
+    values = {col: row.get(col) for col in TABLES[table][1]}
+    # Número remoto pode voltar como 10 ou 10.0: compara como float
+    values = {k: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v for k, v in values.items()}
+    return hashlib.sha1(json.dumps(values, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def build_rows(db):
+    """{tabela: {id: linha}} a partir do dict do database.json."""
+    out = {}
+    for table, (section, _, natural) in TABLES.items():
+        rows = {}
+        seen = {}
+        for record in db.get(section) or []:
+            row = to_remote(table, record)
+            key = "|".join(str(row.get(c)) for c in natural)
+            n = seen.get(key, 0)
+            seen[key] = n + 1
+            row["id"] = str(uuid.uuid5(ID_NAMESPACE, f"{table}|{key}|{n}"))
+            rows[row["id"]] = row
+        out[table] = rows
+    return out
+
+def diff(rows, snapshot):
+    """{tabela: (linhas para upsert, ids para apagar)}."""
+    plan = {}
+    for table, current in rows.items():
+        published = snapshot.get(table, {})
+        upserts = [row for rid, row in current.items() if published.get(rid) != row_hash(table, row)]
+        deletes = sorted(rid for rid in published if rid not in current)
+        plan[table] = (upserts, deletes)
+    return plan
+
+def load_snapshot(path=None):
+    """{tabela: {id: hash}} da última publicação; None se não há snapshot."""
+    path = path or SNAPSHOT_FILE
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f).get("tables", {})
+
+def save_snapshot(tables, path=None):
+    """Grava o snapshot de forma atômica (tmp + rename)."""
+    path = path or SNAPSHOT_FILE
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"published_at": datetime.now().isoformat(timespec="seconds"), "tables": tables}, f)
+    os.replace(tmp, path)
+
+class Pool:
+    """Conexões HTTP keep-alive, uma por thread do pool."""
+
+    def __init__(self, base_url, key):
+        url = urlsplit(base_url)
+        self.scheme, self.host, self.port = url.scheme, url.hostname, url.port
+        self.prefix = url.path.rstrip("/") + "/rest/v1/"
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.retries = 0
+        self.bytes_sent = 0
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            conn = self.local.conn = cls(self.host, self.port, timeout=TIMEOUT)
+            with self.lock:
+                self.connections += 1
+        return conn
+
+    def _drop(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """Uma requisição (sem retry). Devolve (status, corpo)."""
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        try:
+            conn = self._conn()
+            conn.request(method, self.prefix + path, body=data, headers={**self.headers, **(headers or {})})
+            resp = conn.getresponse()
+            payload = resp.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._drop()
+            raise RetryableError(f"{method} {path.split('?')[0]}: {e}") from e
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += len(data or b"")
+        if resp.getheader("Connection", "").lower() == "close":
+            self._drop()
+        if resp.status == 429 or resp.status >= 500:
+            raise RetryableError(f"{method} {path.split('?')[0]}: HTTP {resp.status}")
+        if resp.status >= 400:
+            raise PublishError(f"{method} {path.split('?')[0]}: HTTP {resp.status} {payload[:200].decode('utf-8', 'replace')}")
+        return resp.status, payload
+
+    def with_retries(self, method, path, body=None, headers=None):
+        for attempt in range(1, RETRIES + 1):
+            try:
+                return self.request(method, path, body, headers)
+            except RetryableError as e:
+                if attempt == RETRIES:
+                    raise
+                with self.lock:
+                    self.retries += 1
+                delay = BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                print(f"   ↻ {e} (tentativa {attempt}/{RETRIES}, de novo em {delay:.2f}s)")
+                time.sleep(delay)
+
+def upsert(pool, table, rows):
+    pool.with_retries("POST", f"{table}?on_conflict=id", rows,
+                      {"Prefer": "resolution=merge-duplicates,return=minimal"})
+
+def delete(pool, table, ids):
+    pool.with_retries("DELETE", f"{table}?id=in.({','.join(quote(i) for i in ids)})",
+                      headers={"Prefer": "return=minimal"})
+
+def read_remote(pool, table):
+    """{id: hash} da tabela remota, paginando por id (--full ou sem snapshot)."""
+    published = {}
+    last = ""
+    while True:
+        query = f"{table}?select=*&order=id&limit={READ_PAGE}" + (f"&id=gt.{quote(last)}" if last else "")
+        _, payload = pool.with_retries("GET", query)
+        page = json.loads(payload)
+        for row in page:
+            published[row["id"]] = row_hash(table, row)
+        if len(page) < READ_PAGE:
+            return published
+        last = page[-1]["id"]
+
+def publish(source=None, snapshot_path=None, full=False, dry_run=False, workers=None,
+            base_url=None, key=None):
+    """Publica o build no Supabase. Retorna o resumo."""
+    workers = workers or WORKERS
+    db = columnar.load(source or SOURCE_FILE)
+    rows = build_rows(db)
+    pool = Pool(base_url or SUPABASE_URL, key if key is not None else SUPABASE_KEY)
+    start = time.perf_counter()
+    snapshot = None if full else load_snapshot(snapshot_path)
+    if snapshot is None:
+        print(f"🔎 Lendo o estado atual do Supabase ({'--full' if full else 'sem snapshot'})...")
+        snapshot = {table: read_remote(pool, table) for table in TABLES}
+    plan = diff(rows, snapshot)
+
+    summary = {"upserted": 0, "deleted": 0, "unchanged": 0, "failed": 0}
+    for table, (upserts, deletes) in plan.items():
+        summary["unchanged"] += len(rows[table]) - len(upserts)
+        print(f"   {table}: {len(upserts)} upserts, {len(deletes)} deletes, "
+              f"{len(rows[table]) - len(upserts)} iguais")
+    if dry_run:
+        return {**summary, "plan": {t: (len(u), len(d)) for t, (u, d) in plan.items()}}
+
+    jobs = []
+    for table, (upserts, deletes) in plan.items():
+        jobs += [("upsert", table, upserts[i:i + BATCH]) for i in range(0, len(upserts), BATCH)]
+        jobs += [("delete", table, deletes[i:i + DELETE_BATCH]) for i in range(0, len(deletes), DELETE_BATCH)]
+
+    # O snapshot parte do publicado e só recebe os lotes confirmados
+    published = {table: dict(snapshot.get(table, {})) for table in TABLES}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {}
+            for kind, table, batch in jobs:
+                fn = upsert if kind == "upsert" else delete
+                futures[ex.submit(fn, pool, table, batch)] = (kind, table, batch)
+            for future in as_completed(futures):
+                kind, table, batch = futures[future]
+                try:
+                    future.result()
+                except (PublishError, RetryableError) as e:
+                    print(f"❌ {table}: lote de {len(batch)} ({kind}) falhou: {e}")
+                    summary["failed"] += len(batch)
+                    continue
+                if kind == "upsert":
+                    for row in batch:
+                        published[table][row["id"]] = row_hash(table, row)
+                    summary["upserted"] += len(batch)
+                else:
+                    for rid in batch:
+                        published[table].pop(rid, None)
+                    summary["deleted"] += len(batch)
+    finally:
+        save_snapshot(published, snapshot_path)
+
+    seconds = time.perf_counter() - start
+    sent = summary["upserted"] + summary["deleted"]
+    summary.update(seconds=seconds, rows_per_s=sent / seconds if seconds > 0 else 0.0,
+                   requests=pool.requests, connections=pool.connections, retries=pool.retries,
+                   bytes=pool.bytes_sent)
+    return summary
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    dry_run = "--dry-run" in sys.argv
+    if not SUPABASE_KEY and not dry_run:
+        print("❌ Defina TERRA_SUPABASE_KEY (service key) ou use --dry-run")
+        sys.exit(1)
+    summary = publish(args[0] if args else None, full="--full" in sys.argv, dry_run=dry_run)
+    if dry_run:
+        print(f"✅ Dry-run: {summary['unchanged']} linhas iguais, nada enviado")
+        sys.exit(0)
+    print(f"✅ Publicado: {summary['upserted']} upserts, {summary['deleted']} deletes, "
+          f"{summary['unchanged']} iguais em {summary['seconds']:.2f}s "
+          f"({summary['rows_per_s']:.0f} linhas/s, {summary['requests']} requisições em "
+          f"{summary['connections']} conexões, {summary['retries']} retries, {summary['bytes'] / 1024:.0f} KB)")
+    if summary["failed"]:
+        print(f"⚠️  {summary['failed']} linhas falharam (ficam para a próxima publicação)")
+        sys.exit(1)
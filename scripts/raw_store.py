@@ -0,0 +1,186 @@
+import os
+import re
+import sys
+import json
+import shutil
+from datetime import datetime
+
+from text_cache import file_sha256
+from index_files import classify_file
+
+# Store endereçado por conteúdo dos PDFs brutos.
+#
+# Cada PDF é guardado uma vez só, em data/blobs/<2 primeiros hex>/<sha256>.pdf,
+# e as cópias em data/raw/ e data/raw/drive/ viram hard links para o blob
+# (mesmo inode: o disco guarda o conteúdo uma vez, os caminhos antigos seguem
+# funcionando). Os blobs ficam somente leitura; quem baixa de novo grava por
+# os.replace (inode novo), então nunca escreve por cima de um blob.
+#
+# O catálogo (data/raw_catalog.json) liga o id do Drive ao blob:
+#   {"files": {id: {"sha256", "name", "cultura", "safra", "tipo", "size", "paths"}}}
+# e substitui o os.listdir + busca por substring a cada consulta do PDF_MAP
+# (locate() é um acesso a dict). Arquivos sem id do Drive no nome entram com
+# o próprio nome como chave.
+#
+# Uso: python3 scripts/raw_store.py [pasta ...]   (padrão: data/raw e data/raw/drive)
+
+# Config
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLOB_DIR = os.environ.get("TERRA_BLOB_DIR", os.path.join(PROJECT_DIR, "data", "blobs"))
+CATALOG_FILE = os.environ.get("TERRA_RAW_CATALOG", os.path.join(PROJECT_DIR, "data", "raw_catalog.json"))
+RAW_DIRS = [os.path.join(PROJECT_DIR, "data", "raw"), os.path.join(PROJECT_DIR, "data", "raw", "drive")]
+
+# "<id do Drive>_<nome original>.pdf" (ids atuais do Drive têm 33 caracteres e podem conter _ e -)
+RE_DRIVE_NAME = re.compile(r"^([\w-]{33})_(.+)$")
+RE_SAFRA = re.compile(r"(\d{4})\.(\d{4})")
+RE_ANO = re.compile(r"\b(20\d{2})\b")
+CULTURAS = ("SOJA", "MILHO", "ALGODAO", "ALGODÃO", "FEIJAO", "FEIJÃO", "TRIGO", "SORGO")
+
+_catalog = None
+_scans = {}
+
+def split_name(filename):
+    """(id do Drive ou None, nome original)."""
+    match = RE_DRIVE_NAME.match(filename)
+    if match:
+        return match.group(1), match.group(2)
+    return None, filename
+
+def describe_name(name):
+    """cultura/safra/tipo a partir do nome (ex: 'CUSTO SOJA - SAFRA 2024.2025.pdf' -> SOJA, 24/25, CUSTO)."""
+    upper = name.upper()
+    cultura = next((c for c in CULTURAS if c in upper), None)
+    match = RE_SAFRA.search(name)
+    if match:
+        safra = f"{match.group(1)[2:]}/{match.group(2)[2:]}"
+    else:
+        match = RE_ANO.search(name)
+        safra = match.group(1) if match else None
+    return {"cultura": cultura, "safra": safra, "tipo": classify_file(name)}
+
+def blob_path(sha):
+    return os.path.join(BLOB_DIR, sha[:2], sha + ".pdf")
+
+def sha_of(path):
+    """SHA-256 de um caminho de blob (pelo nome, sem ler o arquivo), ou None."""
+    name = os.path.basename(path)
+    if os.path.dirname(os.path.abspath(path)).startswith(os.path.abspath(BLOB_DIR)) and len(name) == 68:
+        return name[:-4]
+    return None
+
+def load_catalog(path=None):
+    path = path or CATALOG_FILE
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def _cached_catalog():
+    # Consultas (locate) leem o catálogo uma vez por processo
+    global _catalog
+    if _catalog is None:
+        _catalog = load_catalog()
+    return _catalog
+
+def save_catalog(catalog, path=None):
+    """Grava o catálogo de forma atômica (tmp + rename)."""
+    path = path or CATALOG_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    catalog["updated_at"] = datetime.now().isoformat(timespec="seconds")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(catalog, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _link(src, dst):
+    """dst vira hard link de src (atômico); cópia se estiverem em discos diferentes."""
+    tmp = os.path.join(os.path.dirname(dst), "." + os.path.basename(dst) + ".link")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        return False
+    os.replace(tmp, dst)
+    return True
+
+def store(path):
+    """
+    Guarda o PDF no store e troca o arquivo por um hard link para o blob.
+    Retorna (sha256, bytes economizados).
+    """
+    sha = file_sha256(path)
+    blob = blob_path(sha)
+    if not os.path.exists(blob):
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        if not _link(path, blob):
+            tmp = blob + ".tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, blob)
+        os.chmod(blob, 0o444)
+        return sha, 0
+    if os.path.samefile(path, blob):
+        return sha, 0
+    size = os.path.getsize(path)
+    return sha, size if _link(blob, path) else 0
+
+def add(path, catalog, drive_id=None):
+    """Guarda o PDF e cataloga em `catalog`. Retorna (chave do catálogo, bytes economizados)."""
+    file_id, name = split_name(os.path.basename(path))
+    key = drive_id or file_id or name
+    sha, saved = store(path)
+    entry = catalog["files"].get(key, {})
+    paths = [p for p in entry.get("paths", []) if os.path.exists(os.path.join(PROJECT_DIR, p))]
+    rel = os.path.relpath(os.path.abspath(path), PROJECT_DIR)
+    if rel not in paths:
+        paths.append(rel)
+    entry.update(describe_name(name), sha256=sha, name=name, size=os.path.getsize(path), paths=sorted(paths))
+    catalog["files"][key] = entry
+    return key, saved
+
+def locate(file_id, fallback_dir=None):
+    """
+    Caminho do PDF pelo id do Drive: blob do catálogo, senão o arquivo de
+    fallback_dir com o id no nome (a pasta é listada uma vez por processo).
+    """
+    entry = _cached_catalog()["files"].get(file_id)
+    if entry:
+        blob = blob_path(entry["sha256"])
+        if os.path.exists(blob):
+            return blob
+    if fallback_dir is None:
+        return None
+    if fallback_dir not in _scans:
+        scan = {}
+        for f in sorted(os.listdir(fallback_dir)):
+            fid, _ = split_name(f)
+            if fid:
+                scan.setdefault(fid, os.path.join(fallback_dir, f))
+        _scans[fallback_dir] = scan
+    return _scans[fallback_dir].get(file_id)
+
+def ingest(dirs, catalog_path=None):
+    """Cataloga e deduplica os PDFs das pastas. Retorna o resumo."""
+    catalog = load_catalog(catalog_path)
+    files = 0
+    saved = 0
+    for folder in dirs:
+        if not os.path.isdir(folder):
+            print(f"⚠️  {folder} não existe")
+            continue
+        for f in sorted(os.listdir(folder)):
+            path = os.path.join(folder, f)
+            if not f.lower().endswith(".pdf") or f.startswith(".") or not os.path.isfile(path):
+                continue
+            key, freed = add(path, catalog)
+            files += 1
+            saved += freed
+            if freed:
+                print(f"   🔗 {os.path.relpath(path, PROJECT_DIR)} -> blob ({freed / 1024:.0f} KB liberados)")
+    save_catalog(catalog, catalog_path)
+    blobs = {e["sha256"] for e in catalog["files"].values()}
+    return {"files": files, "entries": len(catalog["files"]), "blobs": len(blobs), "saved": saved}
+
+if __name__ == "__main__":
+    dirs = sys.argv[1:] or RAW_DIRS
+    summary = ingest(dirs)
+    print(f"✅ {summary['files']} PDFs, {summary['entries']} no catálogo, {summary['blobs']} blobs "
+          f"({summary['saved'] / 1024 / 1024:.1f} MB liberados por dedup)")
@@ -0,0 +1,159 @@
+import re
+from time import perf_counter
+
+import profiling
+
+# Padrões pré-compilados e classificador de linhas dos relatórios Scadi.
+#
+# Os parsers antes rodavam vários re.* não compilados em TODA linha
+# (re.split, re.match, re.search, re.findall) e tentavam todos os padrões
+# um após o outro. Aqui cada linha passa por UMA regex que decide o tipo
+# (classify_line) e só as linhas de dados seguem para o extrator de campos
+# do layout correspondente.
+
+# Tipos de linha
+BLANK = "blank"       # vazia / só espaços
+TOTAL = "total"       # "Totais Lavoura :", "Totais Gerais :", "Totais colheita ..."
+LAVOURA = "lavoura"   # "Lavoura : 010 - SOJA - FAZENDA CRISTALINA" (marcador de fazenda)
+HEADER = "header"     # cabeçalhos de coluna / filtros / título
+SAFRA_ROW = "safra"   # linha de dados que começa pela safra (CUSTO POR CATEGORIA)
+ROW = "row"           # demais linhas candidatas a dados
+
+_LINE_KIND = re.compile(r"""
+    \s*(?:
+        (?P<total>Totais\b)
+      | (?P<lavoura>Lavoura\s*:)
+      | (?P<header>Talh[ãa]o\b|APLICA[ÇC][ÃA]O\b|SAFRA\s|Filtros\s*:|[ÁA]reas\s|Bruto\b|Acompanhamento\b)
+      | (?P<safra>20\d{2})
+      | (?P<row>\S)
+    )""", re.X)
+
+def classify_raw(line):
+    """Tipo da linha numa única passada de regex."""
+    m = _LINE_KIND.match(line)
+    return m.lastgroup if m else BLANK
+
+def _classify_profiled(line):
+    start = perf_counter()
+    kind = classify_raw(line)
+    profiling.count_kind(kind, perf_counter() - start)
+    return kind
+
+# Com TERRA_PROFILE ligado, conta tipos e tempo de classificação por linha
+classify_line = _classify_profiled if profiling.ENABLED else classify_raw
+
+# --- Padrões de campo -------------------------------------------------------
+
+RE_COLS = re.compile(r'\s{2,}')                      # separador de colunas do -layout
+RE_DECIMAL_PAIR = re.compile(r'\d+,\d{2}\s+\d+,\d{2}')
+RE_LAVOURA = re.compile(r'Lavoura\s*:\s*\d+\s*-\s*([^-]+)\s*-\s*(.+)')
+RE_FAZENDA = re.compile(r'FAZENDA ([A-ZÁÉÍÓÚ\s]+?)(?:\s*$|(?=\d))')
+RE_BR_NUMBER = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d+|\d+,\d+)')
+RE_PLAIN_NUMBER = re.compile(r'\d+\.?\d*')
+RE_REAIS = re.compile(r'R\$\s+([\d.]+,\d+)')
+
+# CUSTO POR APLICAÇÃO: FERTILIZANTES  2024  CRISTALINA  R$ 1.607.594,33  18,81 sc/ha  R$ 783,05
+RE_CUSTO_APLICACAO = re.compile(
+    r'^\s*(\w+(?:\s+\w+)?)\s+(\d{4}/\d{4}|\d{4})\s+([A-ZÁÉÍÓÚ\s]+?)\s+R\$\s+([\d.]+,\d+)\s+'
+)
+
+# PRODUTIVIDADE (parse_all_data): TALHÃO  VARIEDADE  AREA COLHIDO 100...
+# Mesmas classes de caractere do padrão original, mas com palavras separadas
+# por espaço simples: o original ([A-Z0-9\s]+?\s{2,}) fazia backtracking
+# exponencial nas linhas longas do -layout.
+RE_PROD_TALHAO = re.compile(
+    r'^\s*([A-Z0-9]+(?: [A-Z0-9]+)*)\s{2,}([A-Z0-9]+(?: [A-Z0-9]+)*)\s{2,}([\d.]+)\s+([\d.]+)\s+100'
+)
+
+def parse_br_number(val):
+    """'1.234,56' -> 1234.56"""
+    return float(val.replace('.', '').replace(',', '.'))
+
+def split_cols(line):
+    return RE_COLS.split(line.strip())
+
+# --- Extratores por layout --------------------------------------------------
+
+def custo_categoria_fields(line):
+    """
+    Colunas de uma linha do CUSTO POR CATEGORIA:
+    2024/2025  SOJA  MÃO DE OBRA  Salários  R$ 1.078.965,88  R$ 214,46  1,7302 sc/ha
+    Retorna (safra, cultura, aplicação, item, valor_str, custo_ha_str) ou None.
+    """
+    return custo_categoria_parts(split_cols(line))
+
+def custo_categoria_parts(parts):
+    """Mesmo que custo_categoria_fields, a partir das colunas já separadas."""
+    if len(parts) < 5:
+        return None
+
+    valor_idx = -1
+    for i, p in enumerate(parts):
+        if "R$" in p:
+            valor_idx = i
+            break
+    if valor_idx == -1:
+        return None
+
+    item = " ".join(parts[3:valor_idx])
+    n = len(parts)
+    custo_ha_str = "0"
+
+    # Cenário 1: "R$ 1.000,00" (junto) -> parts[valor_idx] é o valor
+    # Cenário 2: "R$" ... "1.000,00" (separado) -> valor é a próxima coluna
+    if parts[valor_idx].strip() == "R$":
+        if n > valor_idx + 1:
+            valor_str = parts[valor_idx + 1]
+            if n > valor_idx + 2:
+                if parts[valor_idx + 2].strip() == "R$":
+                    custo_ha_str = parts[valor_idx + 3] if n > valor_idx + 3 else "0"
+                else:
+                    custo_ha_str = parts[valor_idx + 2]
+        else:
+            valor_str = None
+    else:
+        valor_str = parts[valor_idx]
+        if n > valor_idx + 1:
+            nxt = parts[valor_idx + 1]
+            if "R$" in nxt and nxt.strip() == "R$":
+                custo_ha_str = parts[valor_idx + 2] if n > valor_idx + 2 else "0"
+            else:
+                custo_ha_str = nxt
+
+    return parts[0], parts[1], parts[2], item, valor_str, custo_ha_str
+
+def custo_aplicacao_fields(line):
+    """(categoria, safra, fazenda, valor, custo_ha) de uma linha do CUSTO POR APLICAÇÃO, ou None."""
+    m = RE_CUSTO_APLICACAO.match(line)
+    if not m:
+        return None
+    valor = parse_br_number(m.group(4))
+    # custo/ha é a última coluna R$
+    valores = RE_REAIS.findall(line)
+    custo_ha = parse_br_number(valores[-1]) if len(valores) >= 2 else 0
+    return m.group(1).strip(), m.group(2), m.group(3).strip(), valor, custo_ha
+
+def custo_aplicacao_cells(cells):
+    """
+    (categoria, safra, fazenda, valor, custo_ha) das células fatiadas do
+    CUSTO POR APLICAÇÃO (layouts.iter_cells: aplicação, safra, fazenda, "R$",
+    valor, custo/ha), ou None se os valores não são números.
+    """
+    try:
+        return cells[0], cells[1], cells[2], parse_br_number(cells[4]), parse_br_number(cells[5])
+    except ValueError:
+        return None
+
+def produtividade_cols(line):
+    """Colunas de uma linha de talhão do 'Acompanhamento da Colheita' (>= 8 colunas), ou None."""
+    if not RE_DECIMAL_PAIR.search(line):
+        return None
+    parts = split_cols(line)
+    if len(parts) < 8:
+        return None
+    return parts
+
+def lavoura_name(line):
+    """'Lavoura : 010 - SOJA - FAZENDA CRISTALINA' -> 'FAZENDA CRISTALINA'"""
+    m = RE_LAVOURA.search(line)
+    return m.group(2).strip() if m else None
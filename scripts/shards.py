@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import hashlib
+from datetime import datetime
+from collections import defaultdict
+
+import assets
+import columnar
+import views as view_models
+from cube import norm_safra, build_cube, ALL, SEP
+
+# Partições do banco por (cultura, safra) para o index.html carregar só o que
+# o filtro pede.
+#
+# data/shards/
+#   manifest.json                         sempre buscado de novo (sem hash no nome)
+#   SOJA-2024-2025.<sha256[:12]>.col.json  partição no formato colunar (+ .gz/.br)
+#   views.<sha256[:12]>.json               view models por filtro (scripts/views.py)
+#
+# O nome de cada partição leva o hash do conteúdo: mudou o dado, muda o nome,
+# então as partições podem ser cacheadas como imutáveis. O manifesto lista,
+# por partição, cultura/safra, URL, sha256, bytes e nº de linhas por seção,
+# mais referencias/metadata e o cubo de agregados sem a quebra de custos por
+# categoria (KPIs/radar/timeline sem baixar partição; as células por categoria
+# a página monta das partições baixadas) e a URL do pacote de view models. A
+# primeira tela = manifesto + pacote de views + a partição do filtro inicial.
+#
+# A safra da partição é normalizada como na página ("24/25" -> "2024/2025").
+# Partições que saíram do manifesto são apagadas, exceto as do manifesto
+# anterior (página aberta com o manifesto velho ainda consegue buscá-las).
+#
+# Uso: python3 scripts/shards.py [database.json] [pasta de saída]
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+VIEWS_STEM = "views"
+SECTIONS = columnar.SECTIONS
+
+def partition_key(row):
+    return (row.get("cultura") or "", norm_safra(row.get("safra")) or "")
+
+def slug(cultura, safra):
+    raw = f"{cultura or 'SEM-CULTURA'}-{safra or 'SEM-SAFRA'}"
+    return "".join(c if c.isalnum() else "-" for c in raw)
+
+def summary_cube(cube):
+    """Cubo sem as células por categoria de custo (só o rollup "*"): o grosso do tamanho."""
+    out = dict(cube)
+    out["custos"] = {k: c for k, c in cube["custos"].items() if k.endswith(SEP + ALL)}
+    return out
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_shards(db, out_dir, url_prefix="data/shards/"):
+    """
+    Grava as partições de `db` (dict no formato do database.json) e o
+    manifesto em out_dir. Retorna o manifesto.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    parts = defaultdict(lambda: {s: [] for s in SECTIONS})
+    for section in SECTIONS:
+        for row in db.get(section) or []:
+            parts[partition_key(row)][section].append(row)
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = _load_manifest(manifest_path)
+    shards = []
+    for (cultura, safra), tables in sorted(parts.items()):
+        doc = columnar.encode({s: rows for s, rows in tables.items() if rows})
+        data = json.dumps(doc, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        # Mesmo nome = mesmo conteúdo: não reescreve (mtime/cache intactos)
+        name = assets.write_hashed(out_dir, slug(cultura, safra), data, ".col.json")
+        shards.append({
+            "cultura": cultura,
+            "safra": safra,
+            "url": url_prefix + name,
+            "sha256": sha,
+            "bytes": len(data),
+            "rows": {s: len(rows) for s, rows in tables.items()},
+        })
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "shards": shards,
+    }
+    for key, value in db.items():
+        if key not in SECTIONS:
+            manifest[key] = value
+    manifest["cube"] = summary_cube(manifest.get("cube") or build_cube(db))
+
+    bundle = view_models.build_views(db)
+    data = json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    views_name = assets.write_hashed(out_dir, VIEWS_STEM, data)
+    manifest["views"] = {"url": url_prefix + views_name, "bytes": len(data), "combinations": len(bundle["views"])}
+    print(f"📊 View models: {view_models.summary(bundle)}")
+
+    data = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    columnar.write_atomic(manifest_path, data)
+    columnar.write_compressed(manifest_path, data)
+
+    keep = {os.path.basename(s["url"]) for s in shards}
+    keep |= {os.path.basename(s["url"]) for s in (previous or {}).get("shards", [])}
+    for f in os.listdir(out_dir):
+        base = f
+        for suffix in (".gz", ".br"):
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+        if base.endswith(".col.json") and base not in keep:
+            os.remove(os.path.join(out_dir, f))
+    keep_views = {views_name} | {os.path.basename(((previous or {}).get("views") or {}).get("url", ""))}
+    assets.prune_hashed(out_dir, VIEWS_STEM, keep_views)
+    return manifest
+
+def load_shards(manifest_path, cultura=None, safra=None):
+    """Linhas (dict no formato do database.json) das partições que casam com o filtro."""
+    manifest = _load_manifest(manifest_path)
+    base = os.path.dirname(manifest_path)
+    db = {s: [] for s in SECTIONS}
+    for shard in manifest["shards"]:
+        if (cultura and shard["cultura"] != cultura) or (safra and shard["safra"] != safra):
+            continue
+        part = columnar.load(os.path.join(base, os.path.basename(shard["url"])))
+        for s in SECTIONS:
+            db[s].extend(part.get(s, []))
+    return db
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "data/database.json"
+    out = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(src), "shards")
+    db = columnar.load(src)
+    manifest = write_shards(db, out)
+    manifest_bytes = os.path.getsize(os.path.join(out, MANIFEST_NAME))
+    total = os.path.getsize(src)
+    print(f"📦 {len(manifest['shards'])} partições em {out} (manifesto: {manifest_bytes / 1024:.1f} KB)")
+    for shard in manifest["shards"]:
+        rows = ", ".join(f"{n} {s}" for s, n in shard["rows"].items() if n)
+        print(f"   {shard['cultura'] or '?'} {shard['safra'] or '?'}: {shard['bytes'] / 1024:.1f} KB ({rows})")
+    biggest = max((s["bytes"] for s in manifest["shards"]), default=0)
+    print(f"✅ 1ª tela: manifesto + 1 partição <= {(manifest_bytes + biggest) / 1024:.1f} KB "
+          f"(database.json inteiro: {total / 1024:.1f} KB)")
@@ -1,66 +1,488 @@
 import os
-import subprocess
+import sys
 import json
+import time
+import random
+import hashlib
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+
+# Sincronização da pasta 'fazenda' do Google Drive via gog CLI.
+#
+# As pastas são listadas em paralelo (cada subpasta entra no pool assim que
+# a listagem da mãe chega) e os PDFs faltantes são baixados por um pool
+# limitado de threads (cada download é um subprocesso do gog, então threads
+# bastam). Cada download:
+#   - vai para um temporário oculto na mesma pasta e só então é renomeado
+#     (os.replace é atômico): index_files/ingest_scadi nunca veem meio PDF
+#   - é repetido até RETRIES vezes, com backoff exponencial e jitter
+# No fim sai um resumo com arquivos, bytes e vazão.
+#
+# Manifesto (data/drive_manifest.json): para cada id do Drive, o caminho
+# local e o modifiedTime/size/md5 da listagem, mais size/mtime do arquivo
+# local depois do download. A cada sync a listagem é comparada com ele:
+#   - remoto igual e arquivo local intacto (stat)  -> nada a fazer
+#   - md5 igual, só metadados mudaram              -> atualiza o manifesto
+#   - mesmo id em outra pasta, conteúdo igual      -> move o arquivo local
+#   - novo, re-exportado (md5/tamanho mudou) ou arquivo local mexido -> baixa
+# Arquivos que já estavam na pasta antes do manifesto são adotados se o md5
+# local bate com o do Drive (sem baixar de novo). Os caminhos novos/alterados
+# vão para data/drive_changes.txt, que o index_files.py --changed usa para
+# re-hashear só eles.
+#
+# Com o manifesto gravado, os syncs seguintes são delta: em vez de listar a
+# árvore, pedem ao Drive só as mudanças desde o último page_token (ver
+# sync_changes). `--full` força a varredura.
+#
+# Teste sem rede: GOG_BIN=scripts/fake_gog.py FAKE_GOG_ROOT=/pasta/local
+# (ver scripts/check_sync.py).
 
 # Config
 LOCAL_DIR = "/home/jarvis/.openclaw/workspace/fazenda"
+DATA_DIR = "/home/jarvis/.openclaw/workspace/projects/terra-dashboard/data"
+MANIFEST_FILE = os.path.join(DATA_DIR, "drive_manifest.json")
+CHANGES_FILE = os.path.join(DATA_DIR, "drive_changes.txt")
 DRIVE_ROOT_ID = "1M5Zka3lEBXWrBM2T7YEYnin00oeCNBim" # ID da pasta 'fazenda'
+GOG_BIN = os.environ.get("GOG_BIN", "gog")
+WORKERS = int(os.environ.get("TERRA_SYNC_WORKERS", "8"))
+RETRIES = int(os.environ.get("TERRA_SYNC_RETRIES", "3"))
+BACKOFF = float(os.environ.get("TERRA_SYNC_BACKOFF", "1.0"))  # s antes da 2ª tentativa (dobra a cada uma)
 
-def run_gog(args):
-    """Executa comando GOG CLI e retorna JSON"""
-    cmd = ["gog", "drive"] + args + ["--json"]
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+class GogError(Exception):
+    """gog saiu com erro ou devolveu algo inesperado."""
+
+def _env():
     # Garante que a senha está no env (o shell script wrapper vai cuidar disso, mas por segurança)
     env = os.environ.copy()
     if "GOG_KEYRING_PASSWORD" not in env:
         env["GOG_KEYRING_PASSWORD"] = "starksystems2026"
-        
+    return env
+
+def gog(args, parse_json=True):
+    """Executa `gog drive <args>`; levanta GogError em falha."""
+    cmd = [GOG_BIN, "drive"] + args
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, env=_env())
+    except OSError as e:
+        raise GogError(f"{GOG_BIN}: {e}") from e
+    if result.returncode != 0:
+        raise GogError(f"gog drive {args[0]} saiu com código {result.returncode}: {result.stderr.strip()}")
+    if not parse_json:
+        return result.stdout
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True)
         return json.loads(result.stdout)
-    except Exception as e:
+    except ValueError as e:
+        raise GogError(f"gog drive {args[0]}: JSON inválido ({e})") from e
+
+def run_gog(args):
+    """Executa comando GOG CLI e retorna JSON"""
+    try:
+        return gog(args + ["--json"])
+    except GogError as e:
         print(f"Erro GOG: {e}")
         return []
 
-def sync_folder(drive_id, local_path):
-    """Recursivamente sincroniza pastas e baixa arquivos faltantes"""
-    if not os.path.exists(local_path):
-        os.makedirs(local_path)
-        
-    print(f"📂 Verificando: {local_path}...")
-    
-    # Lista arquivos remotos
+def with_retries(fn, *args, what=""):
+    """fn(*args) com até RETRIES tentativas e backoff exponencial com jitter."""
+    for attempt in range(1, RETRIES + 1):
+        try:
+            return fn(*args)
+        except GogError as e:
+            if attempt == RETRIES:
+                raise
+            delay = BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            print(f"   ↻ {what}: {e} (tentativa {attempt}/{RETRIES}, de novo em {delay:.1f}s)")
+            time.sleep(delay)
+
+def is_folder(item):
+    # 'type' field varies by version/output
+    return item.get('type') == 'folder' or item.get('mimeType') == FOLDER_MIME
+
+def local_name(item):
+    # Nome do Drive pode ter '/', que viraria subpasta aqui
+    return item.get('name', 'UNKNOWN').replace(os.sep, "_")
+
+def list_folder(drive_id):
+    """Itens de uma pasta do Drive (lista de dicts)."""
     # O comando 'ls --json' retorna uma lista de dicionários
-    # Se retornar string (erro), pode causar o problema de índices
-    
-    items = run_gog(["ls", "--parent", drive_id])
-    
+    items = gog(["ls", "--parent", drive_id, "--json"])
     if not isinstance(items, list):
-        print(f"⚠️ Erro ao listar pasta {drive_id}. Retorno inesperado.")
-        return
-
-    for item in items:
-        if not isinstance(item, dict): continue
-        
-        name = item.get('name', 'UNKNOWN')
-        fid = item.get('id')
-        
-        # 'type' field varies by version/output
-        is_folder = (item.get('type') == 'folder') or \
-                    (item.get('mimeType') == 'application/vnd.google-apps.folder')
-        
-        if is_folder:
-            # Recursão para subpastas (ex: SOJA/2025)
-            sync_folder(fid, item_local_path)
-        else:
-            # Arquivo: Baixa se não existir ou tamanho diferente (simplificado: se não existir)
-            if not os.path.exists(item_local_path) and name.lower().endswith(".pdf"):
-                print(f"⬇️ Baixando novo arquivo: {name}")
-                subprocess.run(
-                    ["gog", "drive", "download", fid, "--out", item_local_path],
-                    env=os.environ, check=False
-                )
+        raise GogError(f"retorno inesperado ao listar a pasta {drive_id}")
+    return [item for item in items if isinstance(item, dict)]
+
+def list_tree(drive_id, local_path, workers=None):
+    """
+    Lista a árvore inteira com as pastas em paralelo.
+    Retorna ([(item, caminho local)] dos arquivos, {id: caminho} das pastas, [pastas com erro]).
+    """
+    files = []
+    errors = []
+    folders = {drive_id: local_path}
+    with ThreadPoolExecutor(max_workers=workers or WORKERS) as pool:
+        pending = {pool.submit(with_retries, list_folder, drive_id, what=local_path): local_path}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    items = future.result()
+                except GogError as e:
+                    print(f"⚠️ Erro ao listar {path}: {e}")
+                    errors.append(path)
+                    continue
+                for item in items:
+                    item_local_path = os.path.join(path, local_name(item))
+                    if is_folder(item):
+                        folders[item['id']] = item_local_path
+                        # Recursão para subpastas (ex: SOJA/2025), já no pool
+                        pending[pool.submit(with_retries, list_folder, item['id'],
+                                            what=item_local_path)] = item_local_path
+                    else:
+                        files.append((item, item_local_path))
+    return files, folders, errors
+
+def file_md5(path):
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def download(file_id, path, md5=None):
+    """
+    Baixa para um temporário oculto na pasta de destino e renomeia.
+    Com `md5` (da listagem) o conteúdo é conferido antes do rename.
+    Retorna o tamanho em bytes.
+    """
+    folder, name = os.path.split(path)
+    os.makedirs(folder, exist_ok=True)
+    tmp = os.path.join(folder, f".{name}.{os.getpid()}.{threading.get_ident()}.part")
+    try:
+        gog(["download", file_id, "--out", tmp], parse_json=False)
+        if not os.path.exists(tmp):
+            raise GogError(f"download de {name} não gerou arquivo")
+        if md5 and file_md5(tmp) != md5:
+            raise GogError(f"md5 de {name} não confere com o Drive")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return os.path.getsize(path)
+
+def download_all(tasks, workers=None):
+    """
+    Baixa [(file_id, caminho, md5 ou None)] com no máximo `workers` downloads simultâneos.
+    Retorna (caminhos baixados, [(caminho, erro)], bytes).
+    """
+    done = []
+    failed = []
+    total_bytes = 0
+    if not tasks:
+        return done, failed, total_bytes
+    with ThreadPoolExecutor(max_workers=min(workers or WORKERS, len(tasks))) as pool:
+        futures = {pool.submit(with_retries, download, fid, path, md5, what=os.path.basename(path)): path
+                   for fid, path, md5 in tasks}
+        for i, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                size = future.result()
+            except GogError as e:
+                print(f"   ❌ [{i}/{len(tasks)}] {os.path.basename(path)}: {e}")
+                failed.append((path, str(e)))
+                continue
+            total_bytes += size
+            done.append(path)
+            print(f"   ⬇️ [{i}/{len(tasks)}] {os.path.basename(path)} ({size / 1024:,.0f} KB)")
+    return done, failed, total_bytes
+
+# --- Manifesto ---------------------------------------------------------------
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_manifest(manifest, path):
+    """Grava o manifesto de forma atômica (tmp + rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def remote_signature(item):
+    return {
+        "modifiedTime": item.get("modifiedTime"),
+        "size": item.get("size"),
+        "md5": item.get("md5Checksum"),
+    }
+
+def same_content(a, b):
+    """Mesmo conteúdo no Drive: pelo md5 quando há, senão por modifiedTime/size."""
+    if a.get("md5") and b.get("md5"):
+        return a["md5"] == b["md5"] and a.get("size") == b.get("size")
+    return a == b
+
+def local_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime]
+
+def plan_sync(files, manifest):
+    """
+    Compara a listagem com o manifesto (só stat no disco, sem hash, exceto
+    na adoção de arquivos sem entrada). Retorna (downloads, moves, entradas):
+    downloads [(id, caminho, md5)], moves [(de, para)] e o manifesto novo {id: entrada}.
+    """
+    known = manifest["files"]
+    downloads = []
+    moves = []
+    entries = {}
+    for item, path in files:
+        if not path.lower().endswith(".pdf"):
+            continue
+        fid = item['id']
+        remote = remote_signature(item)
+        prev = known.get(fid)
+        local = local_signature(path)
+
+        if prev and same_content(prev["remote"], remote):
+            if prev["path"] == path and local == prev["local"]:
+                entries[fid] = dict(prev, remote=remote)
+                continue
+            # Movido/renomeado no Drive: leva o arquivo local junto
+            if prev["path"] != path and local is None and local_signature(prev["path"]) == prev["local"]:
+                moves.append((prev["path"], path))
+                entries[fid] = dict(prev, path=path, remote=remote)
+                continue
+        elif prev is None and local and remote["md5"] and file_md5(path) == remote["md5"]:
+            # Já estava na pasta antes do manifesto: adota sem baixar
+            entries[fid] = {"path": path, "remote": remote, "local": local}
+            continue
+
+        downloads.append((fid, path, remote["md5"]))
+        entries[fid] = {"path": path, "remote": remote, "local": None}
+    return downloads, moves, entries
+
+def apply_plan(files, manifest, keep, local_path, workers=None):
+    """
+    Baixa/move o que plan_sync pedir para `files` e monta as entradas novas
+    do manifesto: `keep` {id: entrada} são as que continuam sem ter sido listadas.
+    Retorna (entradas, baixados, movidos, falhas, bytes).
+    """
+    tasks, moves, entries = plan_sync(files, manifest)
+    print(f"   {len(files)} arquivos para comparar; {len(tasks)} para baixar, {len(moves)} movidos")
+
+    for old, new in moves:
+        os.makedirs(os.path.dirname(new), exist_ok=True)
+        os.replace(old, new)
+        print(f"   ↪️ {os.path.relpath(old, local_path)} -> {os.path.relpath(new, local_path)}")
+
+    downloaded, failed, total_bytes = download_all(tasks, workers)
+    failed_paths = {path for path, _ in failed}
+    for fid, entry in list(entries.items()):
+        if entry["path"] in failed_paths:
+            # Falhou: mantém a entrada anterior (o próximo sync tenta de novo)
+            prev = manifest["files"].get(fid)
+            if prev:
+                entries[fid] = prev
+            else:
+                del entries[fid]
+        elif entry["local"] is None:
+            entry["local"] = local_signature(entry["path"])
+
+    for fid, entry in keep.items():
+        entries.setdefault(fid, entry)
+    return entries, downloaded, [new for _, new in moves], failed, total_bytes
+
+def _summary(mode, start, listed, folders, files, manifest, entries, downloaded, moved, failed,
+             total_bytes, list_errors):
+    removed = [e["path"] for fid, e in manifest["files"].items() if fid not in entries]
+    elapsed = time.perf_counter() - start
+    fetch = max(elapsed - listed, 1e-9)
+    print(f"📊 [{mode}] {len(downloaded)} baixados ({total_bytes / 1024 / 1024:.1f} MB) em {elapsed:.1f}s"
+          + (f" — {total_bytes / 1024 / 1024 / fetch:.1f} MB/s, {len(downloaded) / fetch:.1f} arquivos/s"
+             if downloaded else "")
+          + (f"; ❌ {len(failed)} falhas" if failed else "")
+          + (f"; ⚠️ {len(list_errors)} pastas sem listagem" if list_errors else "")
+          + (f"; 🗑️ {len(removed)} removidos do Drive (mantidos no disco)" if removed else ""))
+    return {
+        "mode": mode,
+        "folders": folders,
+        "files": files,
+        "downloaded": downloaded,
+        "changed": sorted(downloaded + moved),
+        "removed": removed,
+        "failed": failed,
+        "list_errors": list_errors,
+        "bytes": total_bytes,
+        "seconds": elapsed,
+    }
+
+def sync_folder(drive_id, local_path, workers=None, manifest_path=None):
+    """
+    Sincroniza a pasta do Drive em local_path: lista tudo e baixa só os PDFs
+    novos ou alterados segundo o manifesto.
+    Retorna o resumo (dict) com os caminhos alterados e as falhas.
+    """
+    manifest_path = manifest_path or MANIFEST_FILE
+    manifest = load_manifest(manifest_path)
+    start = time.perf_counter()
+    # Token ANTES de listar: o que mudar durante a varredura vem no próximo delta
+    token = start_page_token()
+    print(f"📂 Listando {local_path}...")
+    files, folders, list_errors = list_tree(drive_id, local_path, workers)
+    listed = time.perf_counter() - start
+    print(f"   {len(folders)} pastas listadas ({listed:.1f}s)")
+
+    # Pasta sem listagem: não dá para saber o que sumiu dela, mantém as entradas
+    keep = dict(manifest["files"]) if list_errors else {}
+    entries, downloaded, moved, failed, total_bytes = apply_plan(files, manifest, keep, local_path, workers)
+
+    save_manifest({
+        "synced_at": datetime.now().isoformat(timespec="seconds"),
+        "root": drive_id,
+        "local_dir": local_path,
+        # Com pastas sem listagem o delta não teria a árvore completa, e download que
+        # falhou não volta no feed: próxima vez é varredura
+        "page_token": None if list_errors or failed else token,
+        "folders": folders,
+        "files": entries,
+    }, manifest_path)
+    return _summary("varredura", start, listed, len(folders), len(files), manifest, entries,
+                    downloaded, moved, failed, total_bytes, list_errors)
+
+# --- Delta pelo feed de mudanças ---------------------------------------------
+#
+# Com um page_token no manifesto o sync pergunta ao Drive só o que mudou
+# desde a última execução (changes.list) em vez de listar a árvore inteira:
+# o custo passa a ser proporcional às mudanças, não ao tamanho de fazenda/.
+#   gog drive changes token --json                 -> {"startPageToken": "..."}
+#   gog drive changes list --page-token T --json   -> {"changes": [...],
+#                                                      "nextPageToken" | "newStartPageToken"}
+# Cada mudança: {"fileId", "removed", "file": {id, name, mimeType, parents,
+# trashed, modifiedTime, size, md5Checksum}}. Token expirado/inválido, pasta
+# conhecida renomeada/movida ou gog sem suporte a changes -> varredura completa.
+
+class DeltaUnavailable(Exception):
+    """O delta não resolve: precisa da varredura completa."""
+
+def start_page_token():
+    """Token do ponto atual do feed de mudanças, ou None se o gog não suporta."""
+    try:
+        return gog(["changes", "token", "--json"]).get("startPageToken")
+    except (GogError, AttributeError) as e:
+        print(f"   (feed de mudanças indisponível: {e})")
+        return None
+
+def list_changes(token):
+    """Todas as mudanças desde `token` (segue a paginação). Retorna (mudanças, token novo)."""
+    changes = []
+    while True:
+        try:
+            page = with_retries(gog, ["changes", "list", "--page-token", token, "--json"], what="changes")
+        except GogError as e:
+            raise DeltaUnavailable(f"changes.list falhou ({e})") from e
+        if not isinstance(page, dict):
+            raise DeltaUnavailable("changes.list: retorno inesperado")
+        changes += page.get("changes", [])
+        if page.get("newStartPageToken"):
+            return changes, page["newStartPageToken"]
+        token = page.get("nextPageToken")
+        if not token:
+            raise DeltaUnavailable("changes.list sem próximo token")
+
+def resolve_changes(changes, manifest):
+    """
+    Traduz as mudanças para a árvore local: ([(item, caminho)] a comparar,
+    ids removidos, pastas atualizadas). Mudanças fora de fazenda/ são ignoradas.
+    """
+    folders = dict(manifest["folders"])
+    files = {}
+    removed = set()
+    # Pastas primeiro: um arquivo pode chegar na mesma página que a pasta nova dele
+    ordered = sorted(changes, key=lambda c: not is_folder(c.get("file") or {}))
+    pending = []
+    for change in ordered:
+        fid = change.get("fileId")
+        item = change.get("file") or {}
+        gone = change.get("removed") or item.get("trashed")
+        parent = next((p for p in item.get("parents", []) if p in folders), None)
+
+        if is_folder(item) or (gone and fid in folders):
+            if fid in folders and fid != manifest["root"]:
+                new_path = None if gone or parent is None else os.path.join(folders[parent], local_name(item))
+                if new_path != folders[fid]:
+                    # Pasta conhecida renomeada/movida/removida: tudo abaixo dela muda
+                    raise DeltaUnavailable(f"pasta {folders[fid]} mudou")
+            elif parent is not None and not gone:
+                folders[fid] = os.path.join(folders[parent], local_name(item))
+            continue
+
+        if gone or parent is None:
+            if fid in manifest["files"]:
+                removed.add(fid)  # apagado ou movido para fora da árvore
+            files.pop(fid, None)
+            continue
+        item = dict(item, id=fid)
+        files[fid] = (item, os.path.join(folders[parent], local_name(item)))
+        removed.discard(fid)
+    return list(files.values()), removed, folders
+
+def sync_changes(drive_id, local_path, workers=None, manifest_path=None):
+    """
+    Delta: aplica só as mudanças desde o último sync. Sem token (1ª vez),
+    token expirado ou mudança que o delta não resolve, faz sync_folder.
+    """
+    manifest_path = manifest_path or MANIFEST_FILE
+    manifest = load_manifest(manifest_path)
+    token = manifest.get("page_token")
+    if not token or manifest.get("root") != drive_id or manifest.get("local_dir") != local_path:
+        return sync_folder(drive_id, local_path, workers, manifest_path)
+
+    start = time.perf_counter()
+    print(f"📂 Delta de {local_path} desde o último sync...")
+    try:
+        changes, new_token = list_changes(token)
+        files, removed, folders = resolve_changes(changes, manifest)
+    except DeltaUnavailable as e:
+        print(f"   ⚠️ {e}: varredura completa")
+        return sync_folder(drive_id, local_path, workers, manifest_path)
+    listed = time.perf_counter() - start
+    print(f"   {len(changes)} mudanças no Drive ({listed:.1f}s)")
+
+    keep = {fid: e for fid, e in manifest["files"].items() if fid not in removed}
+    entries, downloaded, moved, failed, total_bytes = apply_plan(files, manifest, keep, local_path, workers)
+
+    # Download que falhou: o token fica onde estava e o próximo delta traz a mudança de novo
+    # (o que já baixou confere pelo md5 e não é baixado outra vez)
+    save_manifest(dict(manifest, synced_at=datetime.now().isoformat(timespec="seconds"),
+                       page_token=token if failed else new_token, folders=folders, files=entries), manifest_path)
+    return _summary("delta", start, listed, len(folders), len(files), manifest, entries,
+                    downloaded, moved, failed, total_bytes, [])
+
+def write_changes(paths, path=CHANGES_FILE):
+    """Lista de caminhos alterados, um por linha, para o index_files.py --changed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.writelines(p + "\n" for p in paths)
 
 if __name__ == "__main__":
     print("🔄 TERRA SYNC: Iniciando sincronização com Google Drive...")
-    sync_folder(DRIVE_ROOT_ID, LOCAL_DIR)
+    # --full força a varredura completa (ignora o token do feed de mudanças)
+    if "--full" in sys.argv:
+        summary = sync_folder(DRIVE_ROOT_ID, LOCAL_DIR)
+    else:
+        summary = sync_changes(DRIVE_ROOT_ID, LOCAL_DIR)
+    write_changes(summary["changed"])
+    if summary["failed"] or summary["list_errors"]:
+        print("⚠️ Sincronização concluída com falhas.")
+        sys.exit(1)
     print("✅ Sincronização concluída.")
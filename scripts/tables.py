@@ -0,0 +1,340 @@
+import os
+import sys
+import csv
+import time
+import tempfile
+import tracemalloc
+from array import array
+from itertools import islice
+from collections.abc import Mapping
+
+# Tabelas tipadas, coluna a coluna, para custos, produtividade e contratos.
+#
+# Lido com csv.DictReader, cada linha vira um dict com as chaves e um str
+# novo por célula, mesmo quando o valor se repete em milhares de linhas
+# (cultura, safra, fazenda, categoria, item...). Aqui cada coluna é:
+#   numérica   array('d') de floats (NUMERIC[tipo]); vazio/ausente = NaN
+#   categoria  array('i') de códigos + a lista de valores distintos (cada
+#              texto guardado uma vez só); ausente = código -1
+# Colunas que não estão em NUMERIC são categorias (as mesmas regras do
+# formato colunar do columnar.py, agora em memória).
+#
+# Para quem quer registros, iterar a tabela dá Row: uma visão com __slots__
+# (tabela + índice) que se comporta como o dict da linha (r["safra"],
+# r.get(...), dict(r)) sem copiar nada. Valor ausente não vira chave, como
+# no columnar.decode_table.
+#
+# derive() recalcula uma coluna de categoria a partir de outras, chamando a
+# função uma vez por combinação distinta de códigos (normalizar safra em
+# 100 mil linhas = algumas dezenas de chamadas). Linha com alguma coluna de
+# origem ausente fica ausente no resultado (a função não recebe None).
+#
+# Uso: python3 scripts/tables.py [fator]   (memória de pico e tempo de carga vs dicts,
+#                                           com os CSVs replicados; padrão 1000x)
+
+# Config
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(PROJECT_DIR, "data")
+
+# Colunas numéricas de cada tipo (nomes dos CSVs do ETL e do database.json)
+NUMERIC = {
+    "custos": ("valor_total_brl", "custo_por_ha", "custo_por_sc", "area_aplicada_ha",
+               "valor", "custo_ha", "custo_sc_ha"),
+    "produtividade": ("area_ha", "produtividade_sc_ha", "producao_total_sc", "producao_kg",
+                      "area", "prod_sc_ha", "total_sc"),
+    "contratos": ("valor_total", "valor_total_brl", "volume_kg", "valor_unitario_brl", "provisao_holding",
+                  "quantidade_sc", "valor_saco", "valor_total_bruto", "valor_total_liquido"),
+}
+MISSING = -1
+# Linhas do CSV convertidas por vez (coluna a coluna)
+CHUNK = 8192
+NAN = float("nan")
+
+def _num_sink(col):
+    append = col.append
+
+    def sink(v):
+        append(NAN if v is None or v == "" else float(v))
+    return sink
+
+def _cat_sink(codes, values, index):
+    append = codes.append
+
+    def sink(v):
+        if v is None:
+            append(MISSING)
+            return
+        code = index.get(v)
+        if code is None:
+            code = index[v] = len(values)
+            values.append(v)
+        append(code)
+    return sink
+
+class Row(Mapping):
+    """Visão de uma linha da Table (não copia os valores)."""
+
+    __slots__ = ("table", "i")
+
+    def __init__(self, table, i):
+        self.table = table
+        self.i = i
+
+    def __getitem__(self, name):
+        value = self.table.value(name, self.i)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        return (name for name, _ in self.items())
+
+    def __len__(self):
+        return sum(1 for _ in self.items())
+
+    def items(self):
+        i = self.i
+        value = self.table.value
+        for name in self.table.names:
+            v = value(name, i)
+            if v is not None:
+                yield name, v
+
+    def __repr__(self):
+        return f"Row({dict(self.items())!r})"
+
+class Table:
+    """Tabela colunar de um tipo (custos, produtividade ou contratos)."""
+
+    def __init__(self, kind, columns=()):
+        if kind not in NUMERIC:
+            raise ValueError(f"tipo desconhecido: {kind} (use {', '.join(NUMERIC)})")
+        self.kind = kind
+        self.n = 0
+        self.names = []
+        self.nums = {}   # nome -> array('d')
+        self.cats = {}   # nome -> (array('i') de códigos, valores distintos, {valor: código})
+        self.sinks = {}  # nome -> função que acrescenta um valor cru (str do CSV ou valor do dict)
+        for name in columns:
+            self._add_column(name)
+
+    def _add_column(self, name):
+        self.names.append(name)
+        if name in NUMERIC[self.kind]:
+            self.nums[name] = array("d", [NAN]) * self.n
+            self.sinks[name] = _num_sink(self.nums[name])
+        else:
+            self.cats[name] = (array("i", [MISSING]) * self.n, [], {})
+            self.sinks[name] = _cat_sink(*self.cats[name])
+
+    @classmethod
+    def from_csv(cls, path, kind):
+        """Lê o CSV direto para as colunas (sem dict por linha), CHUNK linhas por vez."""
+        with open(path, "r", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            table = cls(kind, header)
+            width = len(header)
+            for chunk in iter(lambda: list(islice(reader, CHUNK)), []):
+                lines = [line for line in chunk if line]
+                if not lines:
+                    continue
+                # Linha curta: o que falta fica ausente (como o restval do DictReader)
+                lines = [line if len(line) >= width else line + [None] * (width - len(line)) for line in lines]
+                for name, values in zip(header, zip(*lines)):
+                    table._extend_column(name, values)
+                table.n += len(lines)
+        return table
+
+    def _extend_column(self, name, values):
+        """Acrescenta uma fatia de valores crus a uma coluna (sem chamada por célula)."""
+        col = self.nums.get(name)
+        if col is not None:
+            try:
+                col.fromlist(list(map(float, values)))
+            except (ValueError, TypeError):
+                # Vazio/None no meio: valor a valor (float inválido continua dando erro)
+                col.extend(NAN if v is None or v == "" else float(v) for v in values)
+            return
+        codes, distinct, index = self.cats[name]
+        for v in dict.fromkeys(values):
+            if v is not None and v not in index:
+                index[v] = len(distinct)
+                distinct.append(v)
+        try:
+            codes.fromlist(list(map(index.__getitem__, values)))
+        except KeyError:
+            # None (linha curta) no meio
+            codes.fromlist([MISSING if v is None else index[v] for v in values])
+
+    @classmethod
+    def from_records(cls, kind, records):
+        table = cls(kind)
+        table.extend(records)
+        return table
+
+    def append(self, record):
+        """Acrescenta um registro (dict ou Row); chaves novas viram colunas."""
+        for name in record:
+            if name not in self.sinks:
+                self._add_column(name)
+        for name, sink in self.sinks.items():
+            sink(record.get(name))
+        self.n += 1
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return (Row(self, i) for i in range(self.n))
+
+    def __getitem__(self, i):
+        if not -self.n <= i < self.n:
+            raise IndexError(i)
+        return Row(self, i % self.n)
+
+    def value(self, name, i):
+        """Valor da coluna na linha i (None se ausente)."""
+        col = self.nums.get(name)
+        if col is not None:
+            v = col[i]
+            return None if v != v else v
+        codes, values, _ = self.cats[name]
+        code = codes[i]
+        return None if code < 0 else values[code]
+
+    def column(self, name):
+        """Lista com os valores da coluna (None se ausente)."""
+        if name in self.nums:
+            return [None if v != v else v for v in self.nums[name]]
+        codes, values, _ = self.cats[name]
+        return [None if c < 0 else values[c] for c in codes]
+
+    def codes(self, name):
+        """(códigos, valores distintos) de uma coluna de categoria."""
+        codes, values, _ = self.cats[name]
+        return codes, values
+
+    def derive(self, name, fn, *sources):
+        """
+        Coluna de categoria `name` = fn(valores das colunas `sources`), uma chamada por combinação.
+        Se alguma origem está ausente na linha, o resultado é ausente (sem chamar fn).
+        """
+        if name in self.nums:
+            raise ValueError(f"{name} é numérica")
+        cols = [self.cats[s] for s in sources]
+        column = (array("i"), [], {})
+        sink = _cat_sink(*column)
+        memo = {}
+        for key in zip(*(codes for codes, _, _ in cols)):
+            result = memo.get(key, memo)
+            if result is memo:
+                if MISSING in key:
+                    result = memo[key] = None
+                else:
+                    result = memo[key] = fn(*(values[c] for c, (_, values, _) in zip(key, cols)))
+            sink(result)
+        if name not in self.cats:
+            self.names.append(name)
+        self.cats[name] = column
+        self.sinks[name] = sink
+        return self
+
+    def total(self, name, **where):
+        """Soma da coluna numérica nas linhas em que as categorias batem com `where`."""
+        col = self.nums[name]
+        if not where:
+            return sum(v for v in col if v == v)
+        tests = []
+        for cat, wanted in where.items():
+            codes, _, index = self.cats[cat]
+            if wanted not in index:
+                return 0.0
+            tests.append((codes, index[wanted]))
+        return sum(v for i, v in enumerate(col) if v == v and all(codes[i] == c for codes, c in tests))
+
+    def to_dicts(self):
+        """Lista de dicts (para gravar JSON); ausente não vira chave."""
+        rows = [{} for _ in range(self.n)]
+        for name in self.names:
+            if name in self.nums:
+                for r, v in zip(rows, self.nums[name]):
+                    if v == v:
+                        r[name] = v
+            else:
+                codes, values, _ = self.cats[name]
+                for r, c in zip(rows, codes):
+                    if c >= 0:
+                        r[name] = values[c]
+        return rows
+
+    def nbytes(self):
+        """Bytes das colunas (arrays + textos distintos), aproximado."""
+        total = sum(col.itemsize * len(col) for col in self.nums.values())
+        for codes, values, _ in self.cats.values():
+            total += codes.itemsize * len(codes) + sum(sys.getsizeof(v) for v in values)
+        return total
+
+def read_csv(path, kind):
+    """Table do CSV; sem o arquivo, tabela vazia."""
+    if not os.path.exists(path):
+        return Table(kind)
+    return Table.from_csv(path, kind)
+
+def _dict_load(path, kind):
+    """O jeito antigo: um dict por linha, com os números convertidos."""
+    rows = []
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            rows.append(dict(row, **{k: float(row[k]) for k in NUMERIC[kind] if row.get(k)}))
+    return rows
+
+def _measure(load, path, kind, repeat=3):
+    """(melhor tempo em s, pico MB, retido MB) de uma carga."""
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load(path, kind)
+        seconds = min(seconds, time.perf_counter() - start)
+    tracemalloc.start()
+    result = load(path, kind)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, peak / 2 ** 20, current / 2 ** 20
+
+def bench(factor):
+    tmp = tempfile.mkdtemp(prefix="terra_tables_")
+    try:
+        for name, kind in (("custos_operacionais.csv", "custos"), ("produtividade.csv", "produtividade")):
+            src = os.path.join(DATA_DIR, name)
+            if not os.path.exists(src):
+                continue
+            with open(src, "r", newline="") as f:
+                header, *lines = list(csv.reader(f))
+            big = os.path.join(tmp, name)
+            with open(big, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                for _ in range(factor):
+                    writer.writerows(lines)
+            n = len(lines) * factor
+            if Table.from_csv(big, kind).to_dicts() != _dict_load(big, kind):
+                print(f"❌ {name}: Table diferente dos dicts")
+                sys.exit(1)
+            d = _measure(_dict_load, big, kind)
+            t = _measure(read_csv, big, kind)
+            print(f"📋 {name} x{factor} ({n} linhas, {os.path.getsize(big) / 2 ** 20:.1f} MB)")
+            print(f"   dicts: {d[0]:.2f}s, pico {d[1]:.1f} MB, retido {d[2]:.1f} MB")
+            print(f"   Table: {t[0]:.2f}s, pico {t[1]:.1f} MB, retido {t[2]:.1f} MB "
+                  f"({d[0] / t[0]:.1f}x mais rápido, {d[2] / t[2]:.0f}x menos memória retida)")
+            os.remove(big)
+    finally:
+        os.rmdir(tmp)
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
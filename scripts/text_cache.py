@@ -0,0 +1,178 @@
+import os
+import gzip
+import time
+import hashlib
+import tempfile
+import subprocess
+
+# Cache endereçado por conteúdo da saída do extrator de texto (pdftotext ou pdf_native).
+# Chave = SHA-256 do PDF + flags do extrator (-layout, páginas) + versão da ferramenta,
+# então renomear/mover o PDF não invalida nada e um PDF re-exportado gera chave nova.
+# Cada entrada é um .txt.gz em data/cache/text/<2 primeiros hex>/<chave>.txt.gz
+
+# Config
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get("TERRA_TEXT_CACHE_DIR", os.path.join(PROJECT_DIR, "data", "cache", "text"))
+MAX_BYTES = int(os.environ.get("TERRA_TEXT_CACHE_MB", "256")) * 1024 * 1024
+MAX_AGE_DAYS = int(os.environ.get("TERRA_TEXT_CACHE_DAYS", "90"))
+ENABLED = os.environ.get("TERRA_TEXT_CACHE", "1") != "0"
+# .tmp parado há mais que isso é de um worker que morreu no meio da escrita
+TMP_MAX_AGE = 24 * 3600
+
+_tool_versions = {}
+
+def file_sha256(path):
+    """SHA-256 do arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def tool_version(tool="pdftotext"):
+    """Versão do extrator (ex: 'pdftotext version 22.02.0'), memorizada por processo."""
+    if tool not in _tool_versions:
+        try:
+            result = subprocess.run([tool, "-v"], capture_output=True, text=True)
+            # poppler escreve a versão no stderr
+            out = (result.stderr or result.stdout).strip().splitlines()
+            _tool_versions[tool] = out[0] if out else "desconhecida"
+        except OSError:
+            _tool_versions[tool] = "ausente"
+    return _tool_versions[tool]
+
+def cache_key(pdf_sha256, flags, tool="pdftotext", version=None):
+    """`version` dispensa o `<tool> -v` (extratores em Python informam a própria versão)."""
+    raw = "|".join([pdf_sha256, " ".join(flags), version or tool_version(tool)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key + ".txt.gz")
+
+def _touch(path):
+    # Marca uso recente (a eviction por tamanho remove os menos usados primeiro)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def get(key):
+    """Texto em cache ou None."""
+    path = _entry_path(key)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            text = f.read()
+    except (OSError, EOFError):
+        return None
+    _touch(path)
+    return text
+
+def open_entry(key):
+    """Arquivo de texto (gzip) da entrada para leitura linha a linha, ou None."""
+    path = _entry_path(key)
+    try:
+        # Sem exists() antes: o evict() de outro processo pode apagar no meio
+        f = gzip.open(path, "rt", encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    _touch(path)
+    return f
+
+class EntryWriter:
+    """
+    Escrita incremental de uma entrada (modo streaming): as linhas vão
+    sendo comprimidas num .tmp e só viram entrada no commit().
+    """
+    def __init__(self, key):
+        self.path = _entry_path(key)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Nome único por escrita (processos e threads gravando a mesma chave)
+        fd, self.tmp = tempfile.mkstemp(dir=os.path.dirname(self.path),
+                                        prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        self.raw = os.fdopen(fd, "wb")
+        self.fh = gzip.open(self.raw, "wt", encoding="utf-8", compresslevel=6)
+
+    def write(self, chunk):
+        self.fh.write(chunk)
+
+    def _close(self):
+        # gzip.open(fileobj) não fecha o arquivo que recebeu
+        try:
+            self.fh.close()
+        finally:
+            self.raw.close()
+
+    def commit(self):
+        self._close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        self._close()
+        try:
+            os.remove(self.tmp)
+        except OSError:
+            pass
+
+def put(key, text):
+    """Grava a entrada de forma atômica (tmp + rename), segura entre workers."""
+    writer = EntryWriter(key)
+    writer.write(text)
+    writer.commit()
+
+def _remove(path):
+    """Apaga o arquivo; False se outro processo (evict concorrente) já apagou."""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def evict(max_bytes=MAX_BYTES, max_age_days=MAX_AGE_DAYS):
+    """
+    Remove entradas sem uso há mais de max_age_days e, se o cache ainda
+    passar de max_bytes, remove as menos usadas recentemente.
+    .tmp de escrita em andamento não entram nessa conta: só saem depois de
+    TMP_MAX_AGE parados (órfãos de worker morto).
+    Retorna (entradas removidas, bytes restantes).
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return 0, 0
+
+    entries = []
+    tmps = []
+    for root, dirs, files in os.walk(CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            (tmps if name.endswith(".tmp") else entries).append((st.st_mtime, st.st_size, path))
+
+    now = time.time()
+    removed = 0
+    for mtime, _, path in tmps:
+        if mtime < now - TMP_MAX_AGE:
+            removed += _remove(path)
+
+    cutoff = now - max_age_days * 86400
+    kept = []
+    for mtime, size, path in entries:
+        if mtime < cutoff:
+            removed += _remove(path)
+        else:
+            kept.append((mtime, size, path))
+
+    total = sum(size for _, size, _ in kept)
+    kept.sort()  # mais antigos primeiro
+    for mtime, size, path in kept:
+        if total <= max_bytes:
+            break
+        removed += _remove(path)
+        total -= size
+
+    return removed, total
+
+if __name__ == "__main__":
+    removed, total = evict()
+    print(f"🧹 Cache de texto: {removed} entradas removidas, {total / 1024 / 1024:.1f} MB em {CACHE_DIR}")
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+from collections import defaultdict
+
+import columnar
+import cube as kpi_cube
+from cube import norm_safra, cube_key
+
+# View models do dashboard pré-calculados no build, um por combinação de
+# filtro que a página alcança (cultura × safra × fazenda). Trocar o filtro no
+# index.html vira uma leitura por chave (a mesma de cube_key) em vez de
+# .filter() encadeado sobre as linhas + varredura de novo em cada gráfico.
+#
+# Combinações: cultura "" ou cada cultura de qualquer seção (produtividade,
+# custos ou contratos, como no buildViews); safra "" ou cada safra com
+# produtividade da cultura (as opções do select, safrasFor); fazenda "" ou
+# uma das FAZENDAS.
+#
+# Pacote (scripts/shards.py grava como data/shards/views.<hash>.json e aponta
+# no manifesto):
+#   talhoes   [[fazenda, talhao, variedade, prod_sc_ha, area], ...] uma vez só;
+#             as views guardam índices aqui (heatmap/scatter)
+#   timeline  {cultura: {"labels": safras, "series": [sc/ha por safra, por fazenda]}}
+#             (o gráfico só depende da cultura)
+#   views     {chave: view}, view =
+#     kpi         n, area, total_sc, custo (KPIs/simulador; o preço vem do slider)
+#     contratos   célula de contratos do cubo (cultura × safra)
+#     radar       5 eixos normalizados (0-100) por fazenda, na ordem de FAZENDAS
+#     custos      [[categoria, valor], ...] do maior para o menor
+#     talhoes     índices em talhoes, na ordem das linhas
+#     avg         média de sc/ha dos talhões (cor do heatmap)
+#     variedades  top 10 [[variedade, sc/ha médio, nº talhões, cultura], ...]
+#
+# O index.html tem o mesmo cálculo em JS (buildViews) para quando os dados
+# vêm do Supabase ou de um database.json sem partições.
+#
+# Uso: python3 scripts/views.py [database.json] [--all]   (tamanho por combinação)
+
+VIEWS_VERSION = 1
+FAZENDAS = ("Cristalina", "São Cristóvão", "Califórnia")
+# Preço de referência do radar (R$/sc), o mesmo fixo do gráfico
+RADAR_PRECO = 125
+TOP_VARIEDADES = 10
+
+def _num(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def safras_for(prod, cultura):
+    """Safras com produtividade (da cultura, se houver), mais recente primeiro."""
+    safras = {norm_safra(r.get("safra")) for r in prod if not cultura or r.get("cultura") == cultura}
+    return sorted((s for s in safras if s), reverse=True)
+
+def combinations(db):
+    """(cultura, safra, fazenda) alcançáveis pelos filtros da página ("" = todas)."""
+    prod = db.get("produtividade") or []
+    # Mesmas culturas do buildViews: a página filtra por cultura com custo/contrato e sem produtividade
+    culturas = sorted({r.get("cultura") for section in ("produtividade", "custos", "contratos")
+                       for r in db.get(section) or [] if r.get("cultura")})
+    for cultura in [""] + culturas:
+        for safra in [""] + safras_for(prod, cultura):
+            for fazenda in ("",) + FAZENDAS:
+                yield cultura, safra, fazenda
+
+def _cell(cube, section, *values):
+    return cube[section].get(cube_key(*values)) or dict.fromkeys(("n",) + kpi_cube.MEASURES[section], 0)
+
+def _norm(values, invert=False):
+    top = max((v for v in values if v > 0), default=0)
+    if top <= 0:
+        return [0] * len(values)
+    return [round((1 - v / top) * 100 if invert else v / top * 100, 2) for v in values]
+
+def _radar(cube, cultura, safra, fazenda):
+    raw = []
+    for f in FAZENDAS:
+        # Com filtro de fazenda, as outras ficam zeradas
+        if fazenda and fazenda != f:
+            area = total_sc = custo = 0
+        else:
+            p = _cell(cube, "prod", cultura, safra, f)
+            area, total_sc = p["area"], p["total_sc"]
+            custo = _cell(cube, "custos", cultura, safra, f, "")["valor"]
+        receita = total_sc * RADAR_PRECO
+        lucro = receita - custo
+        raw.append({
+            "prod": total_sc / area if area > 0 else 0,
+            "custo_ha": custo / area if area > 0 else 0,
+            "roi": max(0, lucro / custo * 100 if custo > 0 else 0),
+            "area": area,
+            "margem": max(0, lucro / receita * 100 if receita > 0 else 0),
+        })
+    axes = [_norm([d["prod"] for d in raw]), _norm([d["custo_ha"] for d in raw], invert=True),
+            _norm([d["roi"] for d in raw]), _norm([d["area"] for d in raw]), _norm([d["margem"] for d in raw])]
+    return [[axis[i] for axis in axes] for i in range(len(FAZENDAS))]
+
+def _custos_index(cube):
+    """
+    {cultura|safra|fazenda: [(categoria, valor), ...]} das células por categoria,
+    numa passada só pelo cubo (em vez de varrer todas as chaves a cada combinação).
+    """
+    index = defaultdict(list)
+    for k, c in cube["custos"].items():
+        prefix, _, cat = k.rpartition(kpi_cube.SEP)
+        if cat != kpi_cube.ALL:
+            index[prefix].append((cat, c["valor"]))
+    return index
+
+def _custos(by_prefix, cultura, safra, fazenda):
+    cats = by_prefix.get(cube_key(cultura, safra, fazenda), [])
+    return [[cat, valor] for cat, valor in sorted(cats, key=lambda c: -c[1])]
+
+def _variedades(rows):
+    by_var = {}
+    for r in rows:
+        name = r.get("variedade") or "Desconhecida"
+        v = by_var.setdefault(name, {"total": 0.0, "count": 0, "cultura": r.get("cultura")})
+        v["total"] += _num(r.get("prod_sc_ha"))
+        v["count"] += 1
+    top = sorted(by_var.items(), key=lambda kv: -(kv[1]["total"] / kv[1]["count"]))[:TOP_VARIEDADES]
+    return [[name, round(v["total"] / v["count"], 4), v["count"], v["cultura"]] for name, v in top]
+
+def _timeline(cube, prod, cultura):
+    labels = sorted(safras_for(prod, ""))
+    series = []
+    for f in FAZENDAS:
+        points = []
+        for s in labels:
+            c = _cell(cube, "prod", cultura, s, f)
+            points.append(round(c["total_sc"] / c["area"], 4) if c["n"] and c["area"] > 0 else None)
+        series.append(points)
+    return {"labels": labels, "series": series}
+
+def build_views(db, cube=None):
+    """Pacote de view models (ver o topo do arquivo) a partir do dict do database.json."""
+    cube = cube or db.get("cube") or kpi_cube.build_cube(db)
+    prod = db.get("produtividade") or []
+    talhoes = [[r.get("fazenda"), r.get("talhao"), r.get("variedade"), _num(r.get("prod_sc_ha")), _num(r.get("area"))]
+               for r in prod]
+
+    # Índices dos talhões por chave (a linha entra em todos os rollups, como no cubo)
+    index = defaultdict(list)
+    for i, r in enumerate(prod):
+        c, s, f = r.get("cultura") or "", norm_safra(r.get("safra")) or "", r.get("fazenda") or ""
+        for key in {cube_key(cc, ss, ff) for cc in (c, "") for ss in (s, "") for ff in (f, "")}:
+            index[key].append(i)
+
+    by_prefix = _custos_index(cube)
+    views = {}
+    timeline = {}
+    for cultura, safra, fazenda in combinations(db):
+        key = cube_key(cultura, safra, fazenda)
+        rows_idx = index.get(key, [])
+        rows = [prod[i] for i in rows_idx]
+        p = _cell(cube, "prod", cultura, safra, fazenda)
+        views[key] = {
+            "kpi": {"n": p["n"], "area": p["area"], "total_sc": p["total_sc"],
+                    "custo": _cell(cube, "custos", cultura, safra, fazenda, "")["valor"]},
+            "contratos": _cell(cube, "contratos", cultura, safra),
+            "radar": _radar(cube, cultura, safra, fazenda),
+            "custos": _custos(by_prefix, cultura, safra, fazenda),
+            "talhoes": rows_idx,
+            "avg": round(sum(_num(r.get("prod_sc_ha")) for r in rows) / len(rows), 4) if rows else 0,
+            "variedades": _variedades(rows),
+        }
+        timeline.setdefault(cube_key(cultura), _timeline(cube, prod, cultura))
+    return {"version": VIEWS_VERSION, "fazendas": list(FAZENDAS), "talhoes": talhoes,
+            "timeline": timeline, "views": views}
+
+def _size(obj):
+    return len(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def sizes(bundle):
+    """Bytes (JSON compacto) por combinação e das partes compartilhadas."""
+    per_view = {key: _size(view) for key, view in bundle["views"].items()}
+    shared = {name: _size(bundle[name]) for name in ("talhoes", "timeline")}
+    return per_view, shared
+
+def summary(bundle):
+    """Uma linha com o tamanho do pacote (para o log do build)."""
+    per_view, shared = sizes(bundle)
+    total = _size(bundle)
+    biggest = max(per_view, key=per_view.get) if per_view else "-"
+    return (f"{len(per_view)} combinações, {total / 1024:.1f} KB "
+            f"(média {sum(per_view.values()) / max(len(per_view), 1):.0f} B/combinação, "
+            f"maior {per_view.get(biggest, 0)} B em {biggest}, compartilhado {sum(shared.values()) / 1024:.1f} KB)")
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = args[0] if args else "data/database.json"
+    db = columnar.load(path)
+    bundle = build_views(db)
+    per_view, shared = sizes(bundle)
+    print(f"📊 View models de {path}: {summary(bundle)}")
+    for name, size in shared.items():
+        print(f"   {name}: {size / 1024:.1f} KB")
+    ranked = sorted(per_view.items(), key=lambda kv: -kv[1])
+    for key, size in ranked if "--all" in sys.argv else ranked[:10]:
+        print(f"   {key}: {size} B")
+    total = _size(bundle)
+    print(f"✅ {total / 1024:.1f} KB para {len(per_view)} combinações "
+          f"({total / os.path.getsize(path):.2f}x o {os.path.basename(path)})")
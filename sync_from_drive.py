@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 import os
-import json
-import subprocess
+import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from sync_drive import download_all
+import raw_store
+
 # PDFs to download from Google Drive
 FILES_TO_DOWNLOAD = {
     "CUSTO SOJA - SAFRA 2023.2024.pdf": "1X8AkK-reAIbWS_YVm4DssF8mW9xIp9gH",
@@ -12,20 +15,24 @@ FILES_TO_DOWNLOAD = {
     "CUSTO MILHO - SAFRINHA 2025.pdf": "1MfQ-8kCDFkKSpIHFEVfOTolQPuTgp1oA",
 }
 
-def download_from_drive(file_id, filename):
-    """Download PDF from Google Drive using gog"""
-    print(f"Downloading {filename}...")
-    os.system(f'export GOG_KEYRING_PASSWORD="starksystems2026" && gog drive download {file_id} --out ./data/raw/{filename}')
-
 def main():
     Path("./data/raw").mkdir(parents=True, exist_ok=True)
-    
+
+    tasks = []
     for filename, file_id in FILES_TO_DOWNLOAD.items():
         filepath = f"./data/raw/{filename}"
         if not Path(filepath).exists():
-            download_from_drive(file_id, filename)
+            tasks.append((file_id, filepath, None))
         else:
             print(f"✅ {filename} already exists")
 
+    # Downloads em paralelo, com retry e escrita atômica (ver scripts/sync_drive.py)
+    downloaded, failed, _ = download_all(tasks)
+
+    # Cataloga no store (cópias iguais às de data/raw/drive viram hard link)
+    raw_store.ingest(raw_store.RAW_DIRS)
+    if failed:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()